@@ -1,6 +1,7 @@
 # backend/__init__.py
 
 import os
+import importlib
 from flask import Flask, jsonify # Removed unused template/redirect imports here
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
@@ -33,19 +34,28 @@ def create_app(config_class=Config):
     login_manager.init_app(app)
 
     # Initialize CORS - allowing credentials needed for Flask-Login sessions
-    cors.init_app(app, supports_credentials=True)
+    cors.init_app(app, supports_credentials=True, expose_headers=['X-SQL-Query-Count', 'X-SQL-Time-Ms', 'X-SQL-Slowest-Ms'])
     # In production, restrict origins:
     # origins = ["https://your-frontend-domain.com", "http://localhost:3000"] # Example
     # cors.init_app(app, origins=origins, supports_credentials=True)
 
 
+    # --- SQL Instrumentation (per-request query stats, slow-query log) ---
+    from .instrumentation import init_sql_instrumentation
+    init_sql_instrumentation(app, db)
+
+    # --- Metrics (Prometheus text at /api/metrics) ---
+    from .metrics import init_metrics
+    init_metrics(app, db)
+
+
     @login_manager.user_loader
     def load_user(user_id):
         # Import here to avoid circular imports
-        from .models.user import User
+        from .services.auth_service import load_user as load_cached_user
         try:
-            # Flask-Login passes user_id as string
-            return User.query.get(int(user_id))
+            # Flask-Login passes user_id as string; served from the per-worker user cache when fresh
+            return load_cached_user(int(user_id))
         except Exception as e:
             # Log error in production
             # app.logger.error(f"Error loading user {user_id}: {e}")
@@ -62,9 +72,25 @@ def create_app(config_class=Config):
         print("WARNING: Could not import or register views blueprint from routes.views.")
         pass
 
+    # 'import' is a Python keyword, so the module cannot be imported with a plain import statement
+    import_bp = importlib.import_module('.routes.import', __name__).import_bp
+    app.register_blueprint(import_bp, url_prefix='/api/import')
+
+    from .routes.portfolio import portfolio_bp
+    app.register_blueprint(portfolio_bp, url_prefix='/api/portfolio')
+
+    from .routes.assets import assets_bp
+    app.register_blueprint(assets_bp, url_prefix='/api/assets')
+
     # Add other blueprints here when created
-    # from .routes.portfolio import portfolio_bp
-    # app.register_blueprint(portfolio_bp, url_prefix='/api/portfolio')
+
+    # --- CLI Commands ---
+    from .commands import positions_cli, market_data_cli, nav_cli, synthetic_cli, bench_cli
+    app.cli.add_command(positions_cli)
+    app.cli.add_command(market_data_cli)
+    app.cli.add_command(nav_cli)
+    app.cli.add_command(synthetic_cli)
+    app.cli.add_command(bench_cli)
 
 
     # --- Optional: Basic Error Handling ---
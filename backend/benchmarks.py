@@ -0,0 +1,413 @@
+# backend/benchmarks.py
+# Performance benchmarks over a synthetic dataset (`flask synthetic generate`),
+# run as `flask bench run`. They use whatever database the app is configured
+# for, so the same suite covers SQLite and Postgres (set DATABASE_URI).
+import io
+import json
+import platform
+import statistics
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+from flask import current_app
+from sqlalchemy import delete, event, func, select
+
+from . import db
+
+DEFAULT_REPEAT = 5
+DEFAULT_IMPORT_ROWS = 20000
+LOT_MATCH_GROUPS = 200      # (account, asset) pairs with the most open lots, one SELL each
+TRANSACTION_PAGES = 10      # Pages followed by cursor in the transaction listing case
+HIGHER_IS_BETTER = frozenset({'rows_per_second'})
+# Baseline differences smaller than this are run-to-run noise, whatever the percentage
+NOISE_FLOOR = {'median_ms': 1.0, 'peak_memory_kb': 256.0, 'rows_per_second': 0.0}
+
+
+class BenchmarkError(RuntimeError):
+    """Raised when the dataset is missing or a benchmarked call fails."""
+
+
+@dataclass
+class Case:
+    """One benchmark. setup/teardown run around every pass and are not timed; run returns extra metrics."""
+    name: str
+    run: Callable[[], Optional[dict]]
+    setup: Callable[[], None] = lambda: None
+    teardown: Callable[[], None] = lambda: None
+
+
+@dataclass
+class _Target:
+    user_id: int
+    username: str
+    password: str
+    portfolio_id: int
+    symbols: List[str] = field(default_factory=list)
+
+
+class _QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, *args):
+        self.count += 1
+
+
+# ---------------------------
+# Dataset
+# ---------------------------
+def _find_target(prefix: str) -> _Target:
+    """The synthetic user whose portfolio holds the most positions, plus symbols to import against."""
+    from .models.account import Account
+    from .models.asset import Stock
+    from .models.portfolio import Portfolio
+    from .models.position import Position
+    from .models.user import User
+
+    row = db.session.execute(
+        select(User.id, User.username, Portfolio.id)
+        .join(Portfolio, Portfolio.user_id == User.id)
+        .join(Account, Account.portfolio_id == Portfolio.id)
+        .join(Position, Position.account_id == Account.id)
+        .where(User.username.like(f'{prefix}\\_%', escape='\\'), Position.quantity != 0)
+        .group_by(User.id, User.username, Portfolio.id)
+        .order_by(func.count().desc(), Portfolio.id)
+        .limit(1)
+    ).first()
+    if row is None:
+        raise BenchmarkError(f"No synthetic dataset with prefix {prefix!r}; run 'flask synthetic generate' first")
+    symbols = list(db.session.execute(
+        select(Stock.symbol).where(Stock.currency == 'USD').order_by(Stock.id).limit(50)
+    ).scalars())
+    return _Target(row[0], row[1], f'{prefix}-password', row[2], symbols)
+
+
+def dataset_counts() -> Dict[str, int]:
+    from .models.account import Account
+    from .models.asset import Asset
+    from .models.lot import Lot
+    from .models.transaction import Transaction
+    from .models.user import User
+
+    return {
+        model.__tablename__: db.session.execute(select(func.count()).select_from(model)).scalar_one()
+        for model in (User, Account, Asset, Transaction, Lot)
+    }
+
+
+def _scratch_account(target: _Target):
+    """A throwaway portfolio and account owned by the target user, so its data never skews the other cases."""
+    from .models.account import Account
+    from .models.portfolio import Portfolio
+
+    portfolio = Portfolio(name='Benchmark scratch', base_currency='USD', user_id=target.user_id)
+    account = Account(name='Benchmark scratch', account_type='BROKERAGE', currency='USD', portfolio=portfolio)
+    db.session.add_all([portfolio, account])
+    db.session.commit()
+    return account
+
+
+def _drop_account(account_id: int, portfolio_id: int) -> None:
+    from .models.account import Account
+    from .models.lot import Lot
+    from .models.lot_disposal import LotDisposal
+    from .models.portfolio import Portfolio
+    from .models.position import Position
+    from .models.transaction import Transaction
+
+    db.session.rollback()
+    for model in (LotDisposal, Lot, Position, Transaction):
+        db.session.execute(delete(model).where(model.account_id == account_id))
+    db.session.execute(delete(Account).where(Account.id == account_id))
+    db.session.execute(delete(Portfolio).where(Portfolio.id == portfolio_id))
+    db.session.commit()
+
+
+# ---------------------------
+# Cases
+# ---------------------------
+def _import_case(target: _Target, rows: int, seed: int) -> Case:
+    """CSV import through stream_import into a fresh account: parsing, dedup, lots, matching, positions."""
+    from .services.import_service import stream_import
+
+    rng = np.random.default_rng(seed)
+    start = datetime(2020, 1, 1, tzinfo=timezone.utc)
+    held: Dict[str, int] = {}
+    lines = ['date,type,symbol,quantity,price,commission']
+    for i in range(rows):
+        symbol = target.symbols[int(rng.integers(len(target.symbols)))]
+        moment = start + timedelta(seconds=60 * i)
+        if held.get(symbol, 0) > 0 and rng.random() < 0.4:
+            quantity = int(max(1, held[symbol] // 2))
+            kind = 'SELL'
+            held[symbol] -= quantity
+        else:
+            quantity = int(rng.integers(1, 200))
+            kind = 'BUY'
+            held[symbol] = held.get(symbol, 0) + quantity
+        lines.append(f'{moment:%Y-%m-%d %H:%M:%S},{kind},{symbol},{quantity},{rng.uniform(5, 500):.4f},1.00')
+    csv_text = '\n'.join(lines) + '\n'
+    state = {}
+
+    def setup():
+        state['account'] = _scratch_account(target)
+
+    def run():
+        batch_size = current_app.config.get('IMPORT_BATCH_SIZE')
+        for progress in stream_import(state['account'], io.StringIO(csv_text), batch_size):
+            if progress['event'] == 'error' or progress.get('status') == 'failed':
+                raise BenchmarkError(f'Import failed: {progress}')
+        return {'rows': progress['rows_imported']}
+
+    def teardown():
+        account = state.pop('account')
+        _drop_account(account.id, account.portfolio_id)
+
+    return Case('import', run, setup, teardown)
+
+
+def _lot_matching_case(target: _Target) -> Case:
+    """
+    FIFO matching of one SELL for 90% of the open quantity in each of the
+    LOT_MATCH_GROUPS most fragmented holdings. The sells are inserted untimed
+    and everything is rolled back afterwards, so passes are identical.
+    """
+    from .models.lot import Lot
+    from .models.transaction import TransactionTypeEnum
+    from .services.import_service import build_transaction_row, insert_transactions
+    from .services.portfolio_service import POSITION_QUANTUM, SellOrder, match_sells
+
+    state = {}
+
+    def setup():
+        groups = db.session.execute(
+            select(Lot.account_id, Lot.asset_id, func.sum(Lot.quantity_remaining))
+            .where(Lot.is_open.is_(True), Lot.asset_id.is_not(None))
+            .group_by(Lot.account_id, Lot.asset_id)
+            .order_by(func.count().desc(), Lot.account_id, Lot.asset_id)
+            .limit(LOT_MATCH_GROUPS)
+        ).all()
+        if not groups:
+            raise BenchmarkError('The dataset has no open lots')
+        moment = datetime.now(timezone.utc)
+        rows = [
+            build_transaction_row(account_id, asset_id, {
+                'transaction_time': moment, 'transaction_type': TransactionTypeEnum.SELL,
+                'quantity': (Decimal(open_quantity) * Decimal('0.9')).quantize(POSITION_QUANTUM),
+                'price_per_unit': Decimal('1'), 'commission': None, 'fees': None, 'currency': None,
+                'strategy_tag': None, 'description': 'Benchmark sell',
+            }, 'USD')
+            for account_id, asset_id, open_quantity in groups
+        ]
+        state['sells'] = [
+            SellOrder(transaction_id=transaction_id, account_id=row['account_id'], asset_id=row['asset_id'],
+                      quantity=row['quantity'], price_per_unit=row['price_per_unit'],
+                      transaction_time=row['transaction_time'])
+            for transaction_id, row in insert_transactions(db.session, rows)
+        ]
+
+    def run():
+        result = match_sells(state['sells'])
+        return {'sells': len(state['sells']), 'lots_matched': len(result.matches)}
+
+    def teardown():
+        db.session.rollback()
+
+    return Case('lot_matching', run, setup, teardown)
+
+
+def _logged_in_client(app, target: _Target):
+    client = app.test_client()
+    response = client.post('/api/auth/login', json={'username': target.username, 'password': target.password})
+    if response.status_code != 200:
+        raise BenchmarkError(f'Login as {target.username} failed with {response.status_code}')
+    return client
+
+
+def _get(client, url: str) -> dict:
+    response = client.get(url)
+    if response.status_code != 200:
+        raise BenchmarkError(f'GET {url} returned {response.status_code}')
+    return response.get_json()
+
+
+def _valuation_case(app, target: _Target) -> Case:
+    state = {}
+
+    def setup():
+        state['client'] = state.get('client') or _logged_in_client(app, target)
+
+    def run():
+        body = _get(state['client'], f'/api/portfolio/{target.portfolio_id}/valuation')
+        return {'positions': len(body.get('positions', []))}
+
+    return Case('valuation', run, setup)
+
+
+def _transaction_pages_case(app, target: _Target) -> Case:
+    state = {}
+
+    def setup():
+        state['client'] = state.get('client') or _logged_in_client(app, target)
+
+    def run():
+        url = f'/api/portfolio/{target.portfolio_id}/transactions'
+        cursor, pages = None, 0
+        while pages < TRANSACTION_PAGES:
+            body = _get(state['client'], url + (f'?cursor={cursor}' if cursor else ''))
+            pages += 1
+            cursor = body.get('next_cursor')
+            if not cursor:
+                break
+        return {'pages': pages}
+
+    return Case('transaction_pages', run, setup)
+
+
+def _login_case(app, target: _Target) -> Case:
+    def run():
+        _logged_in_client(app, target)
+
+    return Case('login', run)
+
+
+def build_cases(app, prefix: str, import_rows: int = DEFAULT_IMPORT_ROWS, seed: int = 42) -> List[Case]:
+    target = _find_target(prefix)
+    return [
+        _import_case(target, import_rows, seed),
+        _lot_matching_case(target),
+        _valuation_case(app, target),
+        _transaction_pages_case(app, target),
+        _login_case(app, target),
+    ]
+
+
+# ---------------------------
+# Runner
+# ---------------------------
+def measure(case: Case, repeat: int, counter: _QueryCounter) -> dict:
+    """
+    One untimed warm-up pass under tracemalloc (peak Python memory; tracing
+    slows allocation-heavy code too much to time it), then `repeat` timed
+    passes. Query count is from the last timed pass.
+    """
+    timings, queries, extra, peak = [], 0, {}, 0
+    for attempt in range(repeat + 1):
+        db.session.remove()
+        case.setup()
+        traced = attempt == 0
+        if traced:
+            tracemalloc.start()
+        counter.count = 0
+        started = time.perf_counter()
+        try:
+            extra = case.run() or {}
+        finally:
+            elapsed = time.perf_counter() - started
+            if traced:
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            case.teardown()
+        if not traced:
+            timings.append(elapsed)
+            queries = counter.count
+
+    median = statistics.median(timings)
+    result = {
+        'repeat': repeat,
+        'median_ms': round(median * 1000, 3),
+        'min_ms': round(min(timings) * 1000, 3),
+        'max_ms': round(max(timings) * 1000, 3),
+        'queries': queries,
+        'peak_memory_kb': round(peak / 1024, 1),
+    }
+    if 'rows' in extra and median > 0:
+        result['rows_per_second'] = round(extra['rows'] / median, 1)
+    result.update(extra)
+    return result
+
+
+def run_benchmarks(app, prefix: str = 'synth', repeat: int = DEFAULT_REPEAT, only: Optional[List[str]] = None,
+                   import_rows: int = DEFAULT_IMPORT_ROWS, progress: Callable[[str], None] = lambda message: None) -> dict:
+    """Runs every case (or those named in `only`) and returns the JSON-ready report."""
+    cases = [case for case in build_cases(app, prefix, import_rows) if not only or case.name in only]
+    engine = db.engine
+    counter = _QueryCounter()
+    event.listen(engine, 'after_cursor_execute', counter)
+    results = {}
+    try:
+        for case in cases:
+            results[case.name] = measure(case, repeat, counter)
+            progress(f"{case.name}: median {results[case.name]['median_ms']} ms, "
+                     f"{results[case.name]['queries']} queries")
+    finally:
+        event.remove(engine, 'after_cursor_execute', counter)
+
+    return {
+        'started_at': datetime.now(timezone.utc).isoformat(),
+        'database': engine.url.render_as_string(hide_password=True),
+        'dialect': engine.dialect.name,
+        'python': platform.python_version(),
+        'dataset': dataset_counts(),
+        'results': results,
+    }
+
+
+# ---------------------------
+# Regression Checks
+# ---------------------------
+def check_thresholds(report: dict, thresholds: dict) -> List[str]:
+    """
+    Absolute limits, e.g. {"valuation": {"median_ms": {"max": 250}, "queries": {"max": 8}},
+    "import": {"rows_per_second": {"min": 5000}}}. Returns one message per breach.
+    """
+    breaches = []
+    for name, metrics in thresholds.items():
+        result = report['results'].get(name)
+        if result is None:
+            continue
+        for metric, limits in metrics.items():
+            value = result.get(metric)
+            if value is None:
+                continue
+            if 'max' in limits and value > limits['max']:
+                breaches.append(f'{name}.{metric} = {value} exceeds max {limits["max"]}')
+            if 'min' in limits and value < limits['min']:
+                breaches.append(f'{name}.{metric} = {value} is below min {limits["min"]}')
+    return breaches
+
+
+def compare_to_baseline(report: dict, baseline: dict, tolerance: float) -> List[str]:
+    """
+    Regressions against a previous report: median time, peak memory or
+    throughput worse by more than `tolerance` (0.25 = 25%) and by more than
+    NOISE_FLOOR, or any extra query.
+    """
+    breaches = []
+    for name, result in report['results'].items():
+        before = baseline.get('results', {}).get(name)
+        if before is None:
+            continue
+        for metric in ('median_ms', 'peak_memory_kb', 'rows_per_second'):
+            if metric not in result or not before.get(metric):
+                continue
+            if abs(result[metric] - before[metric]) <= NOISE_FLOOR[metric]:
+                continue
+            change = result[metric] / before[metric] - 1
+            if metric in HIGHER_IS_BETTER:
+                change = -change
+            if change > tolerance:
+                breaches.append(f'{name}.{metric} regressed {change:.0%}: {before[metric]} -> {result[metric]}')
+        if result['queries'] > before.get('queries', result['queries']):
+            breaches.append(f"{name}.queries increased: {before['queries']} -> {result['queries']}")
+    return breaches
+
+
+def load_json(path: str) -> dict:
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
@@ -0,0 +1,248 @@
+# backend/commands.py
+# Flask CLI commands, registered on the app in create_app (run as `flask <group> <command>`).
+import csv
+import json
+from collections import defaultdict
+
+import click
+from flask.cli import AppGroup
+
+from . import db
+
+positions_cli = AppGroup('positions', help='Maintain the incrementally updated positions table.')
+
+
+@positions_cli.command('rebuild')
+@click.option('--account-id', 'account_ids', type=int, multiple=True, help='Limit to these accounts (repeatable).')
+@click.option('--check-only', is_flag=True, help='Report drift without rewriting positions.')
+def rebuild_positions_command(account_ids, check_only):
+    """Recompute positions from transactions and lots, reporting any drift."""
+    from .services.portfolio_service import rebuild_positions
+
+    drift = rebuild_positions(account_ids or None, apply=not check_only)
+    for entry in drift:
+        click.echo(
+            f"account={entry['account_id']} asset={entry['asset_id']} "
+            f"stored={entry['stored']} expected={entry['expected']}"
+        )
+    if check_only:
+        db.session.rollback()
+        click.echo(f'{len(drift)} drifted position(s) found.')
+    else:
+        db.session.commit()
+        click.echo(f'Positions rebuilt; {len(drift)} drifted position(s) corrected.')
+
+
+@positions_cli.command('corporate-action')
+@click.argument('symbol')
+@click.option('--type', 'action_type', type=click.Choice(['split', 'stock-dividend']), required=True)
+@click.option('--ratio', type=str, required=True, help='Shares after per share before: 2 for 2-for-1, 0.1 for 1-for-10, 1.05 for a 5% stock dividend.')
+@click.option('--date', 'effective_date', type=click.DateTime(formats=['%Y-%m-%d']), required=True, help='Ex-date of the action.')
+@click.option('--exchange', help='Exchange of SYMBOL; required when it is listed on several.')
+def corporate_action_command(symbol, action_type, ratio, effective_date, exchange):
+    """Apply a stock split or stock dividend to every holding of SYMBOL (safe to re-run)."""
+    from decimal import Decimal, InvalidOperation
+
+    from sqlalchemy import func
+
+    from .models.asset import Asset
+    from .models.transaction import TransactionTypeEnum
+    from .services.corporate_action_service import CorporateActionError, apply_corporate_action
+
+    query = Asset.query.filter_by(symbol=symbol.upper())
+    if exchange is not None:
+        query = query.filter(func.upper(Asset.exchange) == exchange.upper())
+    assets = query.limit(2).all()
+    if not assets:
+        raise click.ClickException(f'Unknown symbol: {symbol}' + (f' on {exchange}' if exchange else ''))
+    if len(assets) > 1:
+        raise click.ClickException(f'Ambiguous symbol {symbol}: listed on several exchanges; pass --exchange')
+    asset = assets[0]
+    try:
+        ratio = Decimal(ratio)
+    except InvalidOperation:
+        raise click.ClickException(f'Invalid ratio: {ratio}')
+    transaction_type = TransactionTypeEnum.STOCK_SPLIT if action_type == 'split' else TransactionTypeEnum.DIVIDEND_STOCK
+
+    try:
+        result = apply_corporate_action(asset.id, transaction_type, ratio, effective_date.date())
+    except CorporateActionError as e:
+        db.session.rollback()
+        raise click.ClickException(str(e))
+    db.session.commit()
+    if not result.applied:
+        click.echo(f'Already applied (corporate action #{result.action_id}); nothing changed.')
+        return
+    click.echo(f'{result.positions_affected} position(s) and {result.lots_affected} lot(s) adjusted.')
+
+
+market_data_cli = AppGroup('market-data', help='Fetch quotes from the configured market data providers.')
+
+
+@market_data_cli.command('refresh')
+@click.option('--asset-type', 'asset_types', multiple=True, help='Limit to these Asset.asset_type values (repeatable).')
+@click.option('--held-only', is_flag=True, help='Only refresh assets that appear in a non-zero position.')
+def refresh_quotes_command(asset_types, held_only):
+    """Refresh Asset.last_price for every asset a provider covers."""
+    from .services.market_data_service import refresh_quotes
+
+    result = refresh_quotes(asset_types or None, held_only=held_only)
+    for error in result.errors:
+        click.echo(f'ERROR {error}', err=True)
+    click.echo(f'{result.updated}/{result.requested} quotes updated, {len(result.missing)} missing.')
+
+
+@market_data_cli.command('import-history')
+@click.argument('csv_file', type=click.File('r', encoding='utf-8-sig'))
+def import_history_command(csv_file):
+    """
+    Bulk-load daily bars from a CSV with columns asset_id,date,open,high,low,close,volume
+    (dates as YYYY-MM-DD; empty values are stored as missing).
+    """
+    from .services.price_history import VALUE_COLUMNS, get_price_store
+
+    bars = defaultdict(lambda: defaultdict(list))
+    for row in csv.DictReader(csv_file):
+        columns = bars[int(row['asset_id'])]
+        columns['dates'].append(row['date'])
+        for name in VALUE_COLUMNS:
+            value = (row.get(name) or '').strip()
+            columns[name].append(float(value) if value else float('nan'))
+
+    written = get_price_store().append_many(bars)
+    click.echo(f'{written} bar(s) written for {len(bars)} asset(s).')
+
+
+@market_data_cli.command('greeks')
+@click.option('--as-of', type=click.DateTime(formats=['%Y-%m-%d']), help='Valuation date (default: today).')
+@click.option('--rate', type=float, help='Risk-free rate override (default: OPTIONS_RISK_FREE_RATE).')
+def refresh_greeks_command(as_of, rate):
+    """Recompute implied volatility and greeks for every unexpired option contract."""
+    from .services.greeks_service import refresh_greeks
+
+    result = refresh_greeks(as_of and as_of.date(), rate)
+    db.session.commit()
+    click.echo(
+        f'{result.updated}/{result.requested} contracts updated, '
+        f'{len(result.missing_prices)} missing prices, {len(result.unsolved)} unsolved.'
+    )
+
+
+nav_cli = AppGroup('nav', help='Maintain stored daily portfolio NAV snapshots.')
+
+
+@nav_cli.command('refresh')
+@click.option('--portfolio-id', 'portfolio_ids', type=int, multiple=True, help='Limit to these portfolios (repeatable).')
+@click.option('--from-date', type=click.DateTime(formats=['%Y-%m-%d']), help='Recompute from this date even if snapshots exist.')
+def refresh_nav_command(portfolio_ids, from_date):
+    """Bring every portfolio's NAV series up to today."""
+    from .models.portfolio import Portfolio
+    from .services.nav_service import invalidate_nav, refresh_nav
+
+    query = Portfolio.query.order_by(Portfolio.id)
+    if portfolio_ids:
+        query = query.filter(Portfolio.id.in_(portfolio_ids))
+    for portfolio in query:
+        if from_date:
+            invalidate_nav(portfolio.id, from_date.date())
+        days = refresh_nav(portfolio)
+        db.session.commit()
+        click.echo(f'portfolio={portfolio.id} {days} day(s) written')
+
+
+@nav_cli.command('analytics')
+@click.option('--portfolio-id', 'portfolio_ids', type=int, multiple=True, help='Limit to these portfolios (repeatable).')
+@click.option('--start', type=click.DateTime(formats=['%Y-%m-%d']), help='First day of the measurement window.')
+@click.option('--end', type=click.DateTime(formats=['%Y-%m-%d']), help='Last day of the measurement window.')
+def nav_analytics_command(portfolio_ids, start, end):
+    """Print performance metrics for every portfolio as JSON lines, computed in one batch."""
+    from .models.portfolio import Portfolio
+    from .services.analytics_service import compute_analytics
+
+    query = Portfolio.query.order_by(Portfolio.id)
+    if portfolio_ids:
+        query = query.filter(Portfolio.id.in_(portfolio_ids))
+    stats = compute_analytics(query.all(), start and start.date(), end and end.date())
+    for entry in stats.to_dicts():
+        click.echo(json.dumps(entry))
+
+
+synthetic_cli = AppGroup('synthetic', help='Generate synthetic datasets for performance work.')
+
+
+@synthetic_cli.command('generate')
+@click.option('--seed', type=int, default=42, show_default=True, help='Random seed; the same options give the same data.')
+@click.option('--users', type=int, default=100, show_default=True)
+@click.option('--transactions', type=int, default=1_000_000, show_default=True, help='Total transactions across all accounts.')
+@click.option('--stocks', type=int, default=4000, show_default=True)
+@click.option('--etfs', type=int, default=400, show_default=True)
+@click.option('--cryptos', type=int, default=150, show_default=True)
+@click.option('--bonds', type=int, default=800, show_default=True)
+@click.option('--option-underlyings', type=int, default=50, show_default=True, help='Stocks that get an option chain.')
+@click.option('--years', type=int, default=5, show_default=True, help='Length of the transaction history.')
+@click.option('--end-date', type=click.DateTime(formats=['%Y-%m-%d']), help='Last day of the history (default: today).')
+@click.option('--prefix', default='synth', show_default=True, help='Username/email prefix of the generated users.')
+@click.option('--batch-size', type=int, help='Transactions per committed batch (default: IMPORT_BATCH_SIZE).')
+def generate_synthetic_command(end_date, **options):
+    """
+    Populate the database with users, portfolios, accounts, every asset type,
+    FX rates and a transaction history with its lots and positions. Meant for a
+    dedicated database: FX rates for the generated dates are overwritten.
+    Every user's password is '<prefix>-password'.
+    """
+    from .services.synthetic_data import SyntheticDataError, SyntheticSpec, generate_dataset
+
+    spec = SyntheticSpec(end_date=end_date and end_date.date(), **options)
+    try:
+        summary = generate_dataset(spec, progress=click.echo)
+    except SyntheticDataError as e:
+        db.session.rollback()
+        raise click.ClickException(str(e))
+    click.echo(json.dumps(summary.counts, sort_keys=True))
+
+
+bench_cli = AppGroup('bench', help='Performance benchmarks against a synthetic dataset.')
+
+
+@bench_cli.command('run')
+@click.option('--output', type=click.Path(dir_okay=False), default='benchmark-results.json', show_default=True)
+@click.option('--prefix', default='synth', show_default=True, help='Prefix the dataset was generated with.')
+@click.option('--repeat', type=int, default=5, show_default=True, help='Timed passes per case.')
+@click.option('--case', 'cases', multiple=True,
+              type=click.Choice(['import', 'lot_matching', 'valuation', 'transaction_pages', 'login']),
+              help='Only run these cases (repeatable).')
+@click.option('--import-rows', type=int, default=20000, show_default=True, help='CSV rows in the import case.')
+@click.option('--thresholds', type=click.Path(exists=True, dir_okay=False), help='JSON file of absolute limits.')
+@click.option('--baseline', type=click.Path(exists=True, dir_okay=False), help='Previous results to compare against.')
+@click.option('--tolerance', type=float, default=0.25, show_default=True, help='Allowed regression vs the baseline.')
+def run_benchmarks_command(output, prefix, repeat, cases, import_rows, thresholds, baseline, tolerance):
+    """
+    Time import, lot matching, valuation, transaction listing and login on the
+    configured database (point DATABASE_URI at SQLite or Postgres), record
+    query counts and peak memory, and write the report to OUTPUT. Exits
+    non-zero when a threshold or the baseline comparison is breached.
+    """
+    from flask import current_app
+
+    from .benchmarks import BenchmarkError, check_thresholds, compare_to_baseline, load_json, run_benchmarks
+
+    try:
+        report = run_benchmarks(current_app._get_current_object(), prefix, repeat, list(cases), import_rows,
+                                progress=click.echo)
+    except BenchmarkError as e:
+        db.session.rollback()
+        raise click.ClickException(str(e))
+
+    breaches = []
+    if thresholds:
+        breaches += check_thresholds(report, load_json(thresholds))
+    if baseline:
+        breaches += compare_to_baseline(report, load_json(baseline), tolerance)
+    report['breaches'] = breaches
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    click.echo(f'Results written to {output}')
+    if breaches:
+        for breach in breaches:
+            click.echo(f'BREACH {breach}', err=True)
+        raise click.ClickException(f'{len(breaches)} benchmark threshold(s) breached')
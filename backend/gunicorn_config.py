@@ -0,0 +1,26 @@
+# backend/gunicorn_config.py
+# Gunicorn settings and server hooks: gunicorn -c python:backend.gunicorn_config "backend:create_app()"
+# Run with PROMETHEUS_MULTIPROC_DIR pointing at an empty directory so /api/metrics
+# aggregates every worker (see backend/metrics.py).
+from backend.config import Config
+
+# Threaded workers: a login waiting on the password-hashing pool, or a long-lived
+# valuation stream, holds one request thread rather than a whole worker process.
+# The app reads the same GUNICORN_THREADS setting to budget them: streams may take
+# VALUATION_STREAM_THREAD_SHARE of the threads (valuation_stream.stream_capacity)
+# and pending hashes stay below what is left (auth_service.max_pending_hashes),
+# so stream and login bursts are answered 503 while the API still has threads.
+worker_class = 'gthread'
+threads = Config.GUNICORN_THREADS
+
+
+def child_exit(server, worker):
+    from backend.metrics import mark_worker_dead
+    mark_worker_dead(worker.pid)
+
+
+def post_worker_init(worker):
+    from backend.services.asset_search import warm_asset_search
+    from backend.services.username_filter import warm_username_filter
+    warm_username_filter(worker.wsgi)
+    warm_asset_search(worker.wsgi)
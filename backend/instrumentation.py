@@ -0,0 +1,147 @@
+# backend/instrumentation.py
+# Per-request SQL statistics and the slow-query log, wired up in create_app.
+import heapq
+import itertools
+import json
+import logging
+import random
+import re
+import time
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+slow_query_logger = logging.getLogger('tradewonk.sql.slow')
+request_sql_logger = logging.getLogger('tradewonk.sql.requests')
+
+_WHITESPACE = re.compile(r'\s+')
+MAX_STATEMENT_LENGTH = 1000
+
+
+def param_shape(parameters, executemany=False):
+    """Types of the bound parameters (never their values), e.g. {'id_1': 'int'} or {'rows': 500, 'shape': [...]}."""
+    if executemany:
+        rows = list(parameters or [])
+        return {'rows': len(rows), 'shape': param_shape(rows[0]) if rows else None}
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [type(value).__name__ for value in parameters]
+    return None
+
+
+def _clean_statement(statement):
+    statement = _WHITESPACE.sub(' ', statement).strip()
+    return statement if len(statement) <= MAX_STATEMENT_LENGTH else statement[:MAX_STATEMENT_LENGTH] + '...'
+
+
+class RequestSqlStats:
+    """Counters for one request. Statement text and parameter shapes are only kept for the top-N slowest."""
+    __slots__ = ('count', 'total', 'slowest', 'top_n', '_sequence')
+
+    def __init__(self, top_n):
+        self.count = 0
+        self.total = 0.0
+        self.slowest = []  # Min-heap of (elapsed, sequence, statement, parameters, executemany)
+        self.top_n = top_n
+        self._sequence = itertools.count()
+
+    def record(self, elapsed, statement, parameters, executemany):
+        self.count += 1
+        self.total += elapsed
+        if self.top_n <= 0:
+            return
+        entry = (elapsed, next(self._sequence), statement, parameters, executemany)
+        if len(self.slowest) < self.top_n:
+            heapq.heappush(self.slowest, entry)
+        elif elapsed > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, entry)
+
+    def slowest_statements(self):
+        return [
+            {
+                'duration_ms': round(elapsed * 1000, 3),
+                'statement': _clean_statement(statement),
+                'params': param_shape(parameters, executemany),
+            }
+            for elapsed, _, statement, parameters, executemany in sorted(self.slowest, reverse=True)
+        ]
+
+
+def init_sql_instrumentation(app, db):
+    """
+    Times every statement on the app's engines. Always: statements slower than
+    SQL_SLOW_QUERY_MS go to the 'tradewonk.sql.slow' logger as one JSON object.
+    For debug mode (or SQL_STATS_HEADERS) and a SQL_STATS_SAMPLE_RATE fraction of
+    requests: count, total time and the slowest statements are collected, returned
+    as X-SQL-* / Server-Timing headers and logged as a per-request summary line.
+    Unsampled requests pay only two perf_counter() calls per statement.
+    """
+    slow_seconds = app.config.get('SQL_SLOW_QUERY_MS', 200) / 1000.0
+    sample_rate = app.config.get('SQL_STATS_SAMPLE_RATE', 0.01)
+    top_n = app.config.get('SQL_STATS_TOP_N', 5)
+    headers_enabled = app.debug or app.config.get('SQL_STATS_HEADERS', False)
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_start_time'].pop()
+        in_request = has_request_context()
+        stats = g.get('sql_stats') if in_request else None
+        if stats is not None:
+            stats.record(elapsed, statement, parameters, executemany)
+        if elapsed >= slow_seconds:
+            slow_query_logger.warning(json.dumps({
+                'event': 'slow_query',
+                'duration_ms': round(elapsed * 1000, 3),
+                'statement': _clean_statement(statement),
+                'params': param_shape(parameters, executemany),
+                'method': request.method if in_request else None,
+                'path': request.path if in_request else None,
+                'endpoint': request.endpoint if in_request else None,
+            }))
+
+    def handle_error(exception_context):
+        # A failed statement never reaches after_cursor_execute; drop its start time
+        starts = exception_context.connection.info.get('query_start_time') if exception_context.connection else None
+        if starts:
+            starts.pop()
+
+    with app.app_context():
+        for engine in db.engines.values():
+            event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', after_cursor_execute)
+            event.listen(engine, 'handle_error', handle_error)
+
+    @app.before_request
+    def start_sql_stats():
+        sampled = random.random() < sample_rate
+        if headers_enabled or sampled:
+            g.sql_stats = RequestSqlStats(top_n)
+            g.sql_stats_sampled = sampled
+
+    @app.after_request
+    def finish_sql_stats(response):
+        stats = g.get('sql_stats')
+        if stats is None:
+            return response
+        total_ms = round(stats.total * 1000, 3)
+        if headers_enabled:
+            response.headers['X-SQL-Query-Count'] = str(stats.count)
+            response.headers['X-SQL-Time-Ms'] = str(total_ms)
+            if stats.slowest:
+                response.headers['X-SQL-Slowest-Ms'] = str(round(max(stats.slowest)[0] * 1000, 3))
+            response.headers.add('Server-Timing', f'db;desc="{stats.count} queries";dur={total_ms}')
+        if g.get('sql_stats_sampled'):
+            request_sql_logger.info(json.dumps({
+                'event': 'request_sql',
+                'method': request.method,
+                'path': request.path,
+                'endpoint': request.endpoint,
+                'status': response.status_code,
+                'query_count': stats.count,
+                'db_time_ms': total_ms,
+                'slowest': stats.slowest_statements(),
+            }))
+        return response
@@ -0,0 +1,131 @@
+# backend/metrics.py
+# Prometheus metrics for every route, the DB pool and in-process caches, served at /api/metrics.
+#
+# Under gunicorn, set PROMETHEUS_MULTIPROC_DIR to an empty directory before the
+# workers start: each worker then writes its samples to memory-mapped files there
+# and /api/metrics aggregates all of them. Use backend/gunicorn_config.py
+# (`gunicorn -c python:backend.gunicorn_config ...`) so files of dead workers are cleaned up.
+#
+# The endpoint exposes route names, traffic and cache internals, so it is not
+# public: scrapers send `Authorization: Bearer <METRICS_TOKEN>`, and without a
+# configured token only loopback clients are answered.
+import hmac
+import os
+import time
+
+from flask import Response, g, jsonify, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess,
+)
+from sqlalchemy import event
+
+LOOPBACK_ADDRESSES = ('127.0.0.1', '::1')
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0, 30.0)
+POOL_WAIT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0, 30.0)
+
+REQUESTS = Counter(
+    'tradewonk_http_requests_total', 'HTTP requests by route and status.',
+    ['method', 'endpoint', 'status'],
+)
+REQUEST_LATENCY = Histogram(
+    'tradewonk_http_request_duration_seconds', 'HTTP request latency by route (p50/p95/p99 via histogram_quantile).',
+    ['method', 'endpoint'], buckets=LATENCY_BUCKETS,
+)
+POOL_CHECKOUT_WAIT = Histogram(
+    'tradewonk_db_pool_checkout_wait_seconds', 'Time spent waiting for a pooled DB connection.',
+    buckets=POOL_WAIT_BUCKETS,
+)
+POOL_CHECKED_OUT = Gauge(
+    'tradewonk_db_pool_checked_out', 'DB connections currently checked out of the pool.',
+    multiprocess_mode='livesum',
+)
+CACHE_REQUESTS = Counter(
+    'tradewonk_cache_requests_total', 'Cache lookups by cache and result (hit ratio = hit / total).',
+    ['cache', 'result'],
+)
+PASSWORD_HASH_REJECTED = Counter(
+    'tradewonk_password_hash_rejected_total', 'Password hashes refused by admission control or timed out.',
+)
+
+
+def record_cache_lookup(cache: str, hits: int = 0, misses: int = 0) -> None:
+    """Called by in-process caches (quote cache, FX matrices) after each lookup."""
+    if hits:
+        CACHE_REQUESTS.labels(cache, 'hit').inc(hits)
+    if misses:
+        CACHE_REQUESTS.labels(cache, 'miss').inc(misses)
+
+
+def record_password_hash_rejected() -> None:
+    PASSWORD_HASH_REJECTED.inc()
+
+
+def collect() -> bytes:
+    """Prometheus text for this process, or for every worker when running in multiprocess mode."""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+def mark_worker_dead(pid: int) -> None:
+    """Drops the live-gauge files of a worker that exited (counters and histograms keep their totals)."""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        multiprocess.mark_process_dead(pid)
+
+
+def scrape_allowed(token: str) -> bool:
+    """True when the current request may read /api/metrics (see the module comment)."""
+    if not token:
+        return request.remote_addr in LOOPBACK_ADDRESSES
+    supplied = request.headers.get('Authorization', '')
+    return hmac.compare_digest(supplied.encode('utf-8'), f'Bearer {token}'.encode('utf-8'))
+
+
+def _instrument_engine(engine) -> None:
+    # The pool has no "before checkout" event, so time the call that blocks on it
+    raw_connection = engine.raw_connection
+
+    def timed_raw_connection(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return raw_connection(*args, **kwargs)
+        finally:
+            POOL_CHECKOUT_WAIT.observe(time.perf_counter() - start)
+
+    engine.raw_connection = timed_raw_connection
+    event.listen(engine, 'checkout', lambda *args: POOL_CHECKED_OUT.inc())
+    event.listen(engine, 'checkin', lambda *args: POOL_CHECKED_OUT.dec())
+
+
+def init_metrics(app, db) -> None:
+    """Records every request, instruments the app's engines and registers /api/metrics."""
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+
+    with app.app_context():
+        for engine in db.engines.values():
+            _instrument_engine(engine)
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_start = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        start = g.pop('metrics_start', None)
+        if start is not None:
+            # Label by route template, not raw path, to keep label cardinality bounded
+            endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+            REQUESTS.labels(request.method, endpoint, str(response.status_code)).inc()
+            REQUEST_LATENCY.labels(request.method, endpoint).observe(time.perf_counter() - start)
+        return response
+
+    token = app.config.get('METRICS_TOKEN') or ''
+
+    @app.route('/api/metrics')
+    def metrics():
+        if not scrape_allowed(token):
+            return jsonify({'error': 'Unauthorized'}), 401
+        return Response(collect(), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,29 @@
+"""Add fingerprint dedup column to transactions
+
+Revision ID: 3c5e8f2a91d4
+Revises: 1956ac26d26d
+Create Date: 2026-10-18 10:12:44.381205
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c5e8f2a91d4'
+down_revision = '1956ac26d26d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing rows keep a NULL fingerprint; NULLs never collide in the unique index
+    with op.batch_alter_table('transactions', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('fingerprint', sa.String(length=64), nullable=True))
+        batch_op.create_index(batch_op.f('ix_transactions_fingerprint'), ['fingerprint'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('transactions', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_transactions_fingerprint'))
+        batch_op.drop_column('fingerprint')
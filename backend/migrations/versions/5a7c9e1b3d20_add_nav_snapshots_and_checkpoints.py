@@ -0,0 +1,65 @@
+"""Add portfolio NAV snapshots and holding checkpoints
+
+Revision ID: 5a7c9e1b3d20
+Revises: e8f1a2b3c4d5
+Create Date: 2026-10-18 14:05:12.418306
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5a7c9e1b3d20'
+down_revision = 'e8f1a2b3c4d5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('portfolio_nav',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('portfolio_id', sa.Integer(), nullable=False),
+    sa.Column('nav_date', sa.Date(), nullable=False),
+    sa.Column('market_value', sa.Numeric(precision=24, scale=8), nullable=False),
+    sa.Column('cash', sa.Numeric(precision=24, scale=8), nullable=False),
+    sa.Column('net_flow', sa.Numeric(precision=24, scale=8), nullable=False),
+    sa.Column('nav', sa.Numeric(precision=24, scale=8), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.ForeignKeyConstraint(['portfolio_id'], ['portfolios.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('portfolio_id', 'nav_date', name='uq_portfolio_nav_portfolio_date')
+    )
+    with op.batch_alter_table('portfolio_nav', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_portfolio_nav_portfolio_id'), ['portfolio_id'], unique=False)
+
+    op.create_table('holding_checkpoints',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('account_id', sa.Integer(), nullable=False),
+    sa.Column('checkpoint_date', sa.Date(), nullable=False),
+    sa.Column('asset_id', sa.Integer(), nullable=True),
+    sa.Column('currency', sa.String(length=3), nullable=True),
+    sa.Column('quantity', sa.Numeric(precision=24, scale=8), nullable=False),
+    sa.ForeignKeyConstraint(['account_id'], ['accounts.id'], ),
+    sa.ForeignKeyConstraint(['asset_id'], ['assets.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('holding_checkpoints', schema=None) as batch_op:
+        batch_op.create_index('ix_holding_checkpoints_account_date', ['account_id', 'checkpoint_date'], unique=False)
+
+    with op.batch_alter_table('portfolios', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('nav_watermark_id', sa.Integer(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('portfolios', schema=None) as batch_op:
+        batch_op.drop_column('nav_watermark_id')
+
+    with op.batch_alter_table('holding_checkpoints', schema=None) as batch_op:
+        batch_op.drop_index('ix_holding_checkpoints_account_date')
+
+    op.drop_table('holding_checkpoints')
+    with op.batch_alter_table('portfolio_nav', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_portfolio_nav_portfolio_id'))
+
+    op.drop_table('portfolio_nav')
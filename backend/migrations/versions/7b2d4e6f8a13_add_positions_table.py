@@ -0,0 +1,45 @@
+"""Add positions table
+
+Revision ID: 7b2d4e6f8a13
+Revises: 3c5e8f2a91d4
+Create Date: 2026-10-18 11:02:17.554630
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7b2d4e6f8a13'
+down_revision = '3c5e8f2a91d4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('positions',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('account_id', sa.Integer(), nullable=False),
+    sa.Column('asset_id', sa.Integer(), nullable=False),
+    sa.Column('quantity', sa.Numeric(precision=24, scale=8), nullable=False),
+    sa.Column('total_cost', sa.Numeric(precision=24, scale=8), nullable=False),
+    sa.Column('realized_pnl', sa.Numeric(precision=24, scale=8), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False),
+    sa.ForeignKeyConstraint(['account_id'], ['accounts.id'], ),
+    sa.ForeignKeyConstraint(['asset_id'], ['assets.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('account_id', 'asset_id', name='uq_positions_account_asset')
+    )
+    with op.batch_alter_table('positions', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_positions_account_id'), ['account_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_positions_asset_id'), ['asset_id'], unique=False)
+
+    # Populate from existing history with: flask positions rebuild
+
+
+def downgrade():
+    with op.batch_alter_table('positions', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_positions_asset_id'))
+        batch_op.drop_index(batch_op.f('ix_positions_account_id'))
+
+    op.drop_table('positions')
@@ -0,0 +1,26 @@
+"""Add composite (account_id, transaction_time, id) index on transactions
+
+Revision ID: 9d4f6b8a2c17
+Revises: 5a7c9e1b3d20
+Create Date: 2026-10-18 15:32:47.106529
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d4f6b8a2c17'
+down_revision = '5a7c9e1b3d20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('transactions', schema=None) as batch_op:
+        batch_op.create_index('ix_transactions_account_time_id', ['account_id', 'transaction_time', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('transactions', schema=None) as batch_op:
+        batch_op.drop_index('ix_transactions_account_time_id')
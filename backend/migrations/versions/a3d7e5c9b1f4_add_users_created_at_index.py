@@ -0,0 +1,26 @@
+"""Index users.created_at for username filter catch-ups
+
+Revision ID: a3d7e5c9b1f4
+Revises: f2b6c8d0e4a7
+Create Date: 2026-10-18 19:41:27.503318
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3d7e5c9b1f4'
+down_revision = 'f2b6c8d0e4a7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_users_created_at'), ['created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_users_created_at'))
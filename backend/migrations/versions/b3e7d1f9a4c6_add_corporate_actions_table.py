@@ -0,0 +1,49 @@
+"""Add corporate_actions table
+
+Revision ID: b3e7d1f9a4c6
+Revises: 9d4f6b8a2c17
+Create Date: 2026-10-18 16:48:03.571920
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3e7d1f9a4c6'
+down_revision = '9d4f6b8a2c17'
+branch_labels = None
+depends_on = None
+
+# The enum type already exists (created with the transactions table)
+transaction_type_enum = postgresql.ENUM(
+    'BUY', 'SELL', 'DIVIDEND_CASH', 'DIVIDEND_STOCK', 'INTEREST', 'FEE', 'COMMISSION', 'DEPOSIT', 'WITHDRAWAL',
+    'STOCK_SPLIT', 'OPTION_BUY', 'OPTION_SELL', 'OPTION_EXPIRE', 'OPTION_ASSIGN', 'BOND_COUPON', 'BOND_MATURITY',
+    name='transaction_type_enum', create_type=False,
+)
+
+
+def upgrade():
+    op.create_table('corporate_actions',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('asset_id', sa.Integer(), nullable=False),
+    sa.Column('action_type', transaction_type_enum, nullable=False),
+    sa.Column('effective_date', sa.Date(), nullable=False),
+    sa.Column('ratio', sa.Numeric(precision=18, scale=8), nullable=False),
+    sa.Column('positions_affected', sa.Integer(), nullable=False),
+    sa.Column('lots_affected', sa.Integer(), nullable=False),
+    sa.Column('applied_at', sa.DateTime(timezone=True), nullable=False),
+    sa.ForeignKeyConstraint(['asset_id'], ['assets.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('asset_id', 'action_type', 'effective_date', name='uq_corporate_actions_asset_type_date')
+    )
+    with op.batch_alter_table('corporate_actions', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_corporate_actions_asset_id'), ['asset_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('corporate_actions', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_corporate_actions_asset_id'))
+
+    op.drop_table('corporate_actions')
@@ -0,0 +1,28 @@
+"""Add last_price and last_price_at to assets
+
+Revision ID: c4a9e1d7b352
+Revises: 7b2d4e6f8a13
+Create Date: 2026-10-18 11:48:05.120934
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4a9e1d7b352'
+down_revision = '7b2d4e6f8a13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('assets', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('last_price', sa.Numeric(precision=18, scale=8), nullable=True))
+        batch_op.add_column(sa.Column('last_price_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('assets', schema=None) as batch_op:
+        batch_op.drop_column('last_price_at')
+        batch_op.drop_column('last_price')
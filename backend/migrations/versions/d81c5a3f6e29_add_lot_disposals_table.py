@@ -0,0 +1,48 @@
+"""Add lot_disposals table
+
+Revision ID: d81c5a3f6e29
+Revises: b3e7d1f9a4c6
+Create Date: 2026-10-18 17:26:40.902311
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd81c5a3f6e29'
+down_revision = 'b3e7d1f9a4c6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('lot_disposals',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('lot_id', sa.Integer(), nullable=False),
+    sa.Column('sell_transaction_id', sa.Integer(), nullable=False),
+    sa.Column('account_id', sa.Integer(), nullable=False),
+    sa.Column('asset_id', sa.Integer(), nullable=False),
+    sa.Column('quantity', sa.Numeric(precision=24, scale=8), nullable=False),
+    sa.Column('cost_basis_per_unit', sa.Numeric(precision=18, scale=8), nullable=False),
+    sa.Column('purchase_date', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('sale_date', sa.DateTime(timezone=True), nullable=False),
+    sa.ForeignKeyConstraint(['account_id'], ['accounts.id'], ),
+    sa.ForeignKeyConstraint(['asset_id'], ['assets.id'], ),
+    sa.ForeignKeyConstraint(['lot_id'], ['lots.id'], ),
+    sa.ForeignKeyConstraint(['sell_transaction_id'], ['transactions.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('lot_disposals', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_lot_disposals_lot_id'), ['lot_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_lot_disposals_sell_transaction_id'), ['sell_transaction_id'], unique=False)
+        batch_op.create_index('ix_lot_disposals_account_sale_date', ['account_id', 'sale_date'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('lot_disposals', schema=None) as batch_op:
+        batch_op.drop_index('ix_lot_disposals_account_sale_date')
+        batch_op.drop_index(batch_op.f('ix_lot_disposals_sell_transaction_id'))
+        batch_op.drop_index(batch_op.f('ix_lot_disposals_lot_id'))
+
+    op.drop_table('lot_disposals')
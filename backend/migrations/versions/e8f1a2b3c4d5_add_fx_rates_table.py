@@ -0,0 +1,38 @@
+"""Add fx_rates table
+
+Revision ID: e8f1a2b3c4d5
+Revises: c4a9e1d7b352
+Create Date: 2026-10-18 12:20:41.903117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8f1a2b3c4d5'
+down_revision = 'c4a9e1d7b352'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('fx_rates',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('rate_date', sa.Date(), nullable=False),
+    sa.Column('base_currency', sa.String(length=3), nullable=False),
+    sa.Column('quote_currency', sa.String(length=3), nullable=False),
+    sa.Column('rate', sa.Numeric(precision=20, scale=10), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('rate_date', 'base_currency', 'quote_currency', name='uq_fx_rates_date_pair')
+    )
+    with op.batch_alter_table('fx_rates', schema=None) as batch_op:
+        batch_op.create_index('ix_fx_rates_rate_date', ['rate_date'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('fx_rates', schema=None) as batch_op:
+        batch_op.drop_index('ix_fx_rates_rate_date')
+
+    op.drop_table('fx_rates')
@@ -0,0 +1,26 @@
+"""Add missing_prices to portfolio NAV snapshots
+
+Revision ID: f2b6c8d0e4a7
+Revises: d81c5a3f6e29
+Create Date: 2026-10-18 18:12:09.117204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2b6c8d0e4a7'
+down_revision = 'd81c5a3f6e29'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('portfolio_nav', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('missing_prices', sa.JSON(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('portfolio_nav', schema=None) as batch_op:
+        batch_op.drop_column('missing_prices')
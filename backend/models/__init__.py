@@ -15,6 +15,12 @@ from .asset import (
 # Import Transaction model and its specific Enum
 from .transaction import Transaction, TransactionTypeEnum
 from .lot import Lot
+from .lot_disposal import LotDisposal
+from .position import Position
+from .fx_rate import FxRate
+from .portfolio_nav import PortfolioNav
+from .holding_checkpoint import HoldingCheckpoint
+from .corporate_action import CorporateAction
 
 # Optional: Define __all__ to control what 'from .models import *' imports
 __all__ = [
@@ -31,6 +37,12 @@ __all__ = [
     'CashCurrency',
     'Transaction',
     'TransactionTypeEnum',
-    'Lot'
+    'Lot',
+    'LotDisposal',
+    'Position',
+    'FxRate',
+    'PortfolioNav',
+    'HoldingCheckpoint',
+    'CorporateAction'
 ]
 
@@ -15,6 +15,7 @@ from sqlalchemy import String, Text, Integer, DateTime, ForeignKey, Boolean, Num
 if TYPE_CHECKING:
     from .portfolio import Portfolio
     from .transaction import Transaction
+    from .position import Position
 
 class Account(db.Model):
     """
@@ -40,21 +41,21 @@ class Account(db.Model):
     # --- Relationships ---
     # Use back_populates for explicit bidirectional linking
     portfolio: Mapped["Portfolio"] = relationship(back_populates='accounts')
+    # Unbounded history: stays a query (never eager-loaded); read paths page it via portfolio_service.list_transactions
     transactions: Mapped[List["Transaction"]] = relationship(back_populates='account', lazy='dynamic', cascade='all, delete-orphan')
+    # One row per held asset, small enough to eager-load with the account
+    positions: Mapped[List["Position"]] = relationship(back_populates='account', cascade='all, delete-orphan')
 
     def __repr__(self):
         return f'<Account id={self.id} name={self.name} type={self.account_type} portfolio_id={self.portfolio_id}>'
 
-    # --- Optional: Add methods later ---
+    # --- Methods ---
     def get_total_value(self, target_currency: str) -> Decimal:
-        # Placeholder implementation
-        total_value = self.cash_balance
-        print(f"WARN: get_total_value for Account {self.id} not fully implemented.")
-        if self.currency == target_currency:
-            return total_value
-        else:
-            print(f"WARN: Forex conversion needed but not implemented in get_total_value for Account {self.id}.")
-            return total_value # Return unconverted cash for now
+        """Cash plus market value of all positions, converted to target_currency."""
+        # Import here to avoid circular imports
+        from ..services.valuation_service import value_accounts
+        valuation = value_accounts([self.id], target_currency)
+        return Decimal(str(round(valuation.total_value, 8)))
 
     def update_cash_balance(self, amount: Decimal):
         # Basic implementation
@@ -0,0 +1,35 @@
+# backend/models/corporate_action.py
+from __future__ import annotations  # Ensure forward references work smoothly
+
+from .. import db
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from sqlalchemy import Enum as SQLAlchemyEnum, Numeric, ForeignKey, Date, DateTime, Integer, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .transaction import TransactionTypeEnum
+
+class CorporateAction(db.Model):
+    """
+    One applied STOCK_SPLIT or DIVIDEND_STOCK on an asset. The unique key makes
+    services.corporate_action_service idempotent: a retried action finds its row
+    and changes nothing.
+    """
+    __tablename__ = 'corporate_actions'
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    asset_id: Mapped[int] = mapped_column(ForeignKey('assets.id'), nullable=False, index=True)
+    action_type: Mapped[TransactionTypeEnum] = mapped_column(SQLAlchemyEnum(TransactionTypeEnum, name="transaction_type_enum"), nullable=False)
+    effective_date: Mapped[date] = mapped_column(Date, nullable=False)
+    ratio: Mapped[Decimal] = mapped_column(Numeric(18, 8), nullable=False)  # Shares held after per share held before
+    positions_affected: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    lots_affected: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    applied_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), nullable=False)
+
+    # --- Constraints ---
+    __table_args__ = (
+        UniqueConstraint('asset_id', 'action_type', 'effective_date', name='uq_corporate_actions_asset_type_date'),
+    )
+
+    def __repr__(self):
+        return f'<CorporateAction {self.action_type.name} asset_id={self.asset_id} date={self.effective_date} ratio={self.ratio}>'
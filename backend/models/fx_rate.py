@@ -0,0 +1,28 @@
+# backend/models/fx_rate.py
+from __future__ import annotations  # Ensure forward references work smoothly
+
+from .. import db
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from sqlalchemy import Numeric, Date, DateTime, String, UniqueConstraint, Index
+from sqlalchemy.orm import Mapped, mapped_column
+
+class FxRate(db.Model):
+    """Daily exchange rate: 1 unit of base_currency = rate units of quote_currency."""
+    __tablename__ = 'fx_rates'
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    rate_date: Mapped[date] = mapped_column(Date, nullable=False)
+    base_currency: Mapped[str] = mapped_column(String(3), nullable=False)
+    quote_currency: Mapped[str] = mapped_column(String(3), nullable=False)
+    rate: Mapped[Decimal] = mapped_column(Numeric(20, 10), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), nullable=False)
+
+    # --- Constraints ---
+    __table_args__ = (
+        UniqueConstraint('rate_date', 'base_currency', 'quote_currency', name='uq_fx_rates_date_pair'),
+        Index('ix_fx_rates_rate_date', 'rate_date'),
+    )
+
+    def __repr__(self):
+        return f'<FxRate {self.rate_date} {self.base_currency}/{self.quote_currency}={self.rate}>'
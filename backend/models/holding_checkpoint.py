@@ -0,0 +1,33 @@
+# backend/models/holding_checkpoint.py
+from __future__ import annotations  # Ensure forward references work smoothly
+
+from .. import db
+from datetime import date
+from decimal import Decimal
+from typing import Optional
+from sqlalchemy import Numeric, ForeignKey, Date, String, Index
+from sqlalchemy.orm import Mapped, mapped_column
+
+class HoldingCheckpoint(db.Model):
+    """
+    Quantity of one asset (or, with asset_id NULL, the cash balance in one
+    currency) held by an account at the end of checkpoint_date. Point-in-time
+    holdings start from the nearest checkpoint and replay only later transactions.
+    """
+    __tablename__ = 'holding_checkpoints'
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    account_id: Mapped[int] = mapped_column(ForeignKey('accounts.id'), nullable=False)
+    checkpoint_date: Mapped[date] = mapped_column(Date, nullable=False)
+    asset_id: Mapped[Optional[int]] = mapped_column(ForeignKey('assets.id'), nullable=True)  # NULL for cash rows
+    currency: Mapped[Optional[str]] = mapped_column(String(3), nullable=True)  # Set for cash rows only
+    quantity: Mapped[Decimal] = mapped_column(Numeric(24, 8), nullable=False)
+
+    # --- Constraints ---
+    __table_args__ = (
+        Index('ix_holding_checkpoints_account_date', 'account_id', 'checkpoint_date'),
+    )
+
+    def __repr__(self):
+        held = f'asset_id={self.asset_id}' if self.asset_id is not None else f'cash={self.currency}'
+        return f'<HoldingCheckpoint account_id={self.account_id} date={self.checkpoint_date} {held} qty={self.quantity}>'
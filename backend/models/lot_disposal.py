@@ -0,0 +1,37 @@
+# backend/models/lot_disposal.py
+from __future__ import annotations  # Ensure forward references work smoothly
+
+from .. import db
+from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import Numeric, ForeignKey, DateTime, Index
+from sqlalchemy.orm import Mapped, mapped_column
+
+class LotDisposal(db.Model):
+    """
+    Quantity of one lot consumed by one sell, written by
+    services.portfolio_service.match_sells. Cost basis and dates are copied
+    from the lot at match time, so later lot adjustments (splits) never
+    rewrite realized history. Source of the realized-gains report.
+    """
+    __tablename__ = 'lot_disposals'
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    lot_id: Mapped[int] = mapped_column(ForeignKey('lots.id'), nullable=False, index=True)
+    sell_transaction_id: Mapped[int] = mapped_column(ForeignKey('transactions.id'), nullable=False, index=True)
+    account_id: Mapped[int] = mapped_column(ForeignKey('accounts.id'), nullable=False)
+    asset_id: Mapped[int] = mapped_column(ForeignKey('assets.id'), nullable=False)
+
+    quantity: Mapped[Decimal] = mapped_column(Numeric(24, 8), nullable=False)
+    cost_basis_per_unit: Mapped[Decimal] = mapped_column(Numeric(18, 8), nullable=False)
+    purchase_date: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    sale_date: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+
+    # --- Indexes ---
+    __table_args__ = (
+        # Year-end reports scan one account's disposals by sale date
+        Index('ix_lot_disposals_account_sale_date', 'account_id', 'sale_date'),
+    )
+
+    def __repr__(self):
+        return f'<LotDisposal lot_id={self.lot_id} sell={self.sell_transaction_id} qty={self.quantity} sold={self.sale_date}>'
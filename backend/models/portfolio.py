@@ -19,12 +19,15 @@ class Portfolio(db.Model):
     base_currency: Mapped[str] = mapped_column(String(3), nullable=False, default='USD', index=True)
     benchmark_ticker: Mapped[Optional[str]] = mapped_column(String(20), nullable=True, index=True)  # Use Optional here
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), nullable=False)
+    # Highest transaction id already reflected in the stored NAV series; anything newer triggers a recompute from its date
+    nav_watermark_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
 
     user_id: Mapped[int] = mapped_column(ForeignKey('users.id'), nullable=False, index=True)
 
     # --- Relationships ---
     user: Mapped["User"] = relationship(back_populates='portfolios')
-    accounts: Mapped[List["Account"]] = relationship(back_populates='portfolio', lazy='dynamic', cascade='all, delete-orphan')
+    # Plain collection so read paths can eager-load it (selectinload); see portfolio_service.load_portfolio
+    accounts: Mapped[List["Account"]] = relationship(back_populates='portfolio', cascade='all, delete-orphan')
 
     def __repr__(self):
         return f'<Portfolio id={self.id} name={self.name} user_id={self.user_id}>'
@@ -0,0 +1,35 @@
+# backend/models/portfolio_nav.py
+from __future__ import annotations  # Ensure forward references work smoothly
+
+from .. import db
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from sqlalchemy import JSON, Numeric, ForeignKey, Date, DateTime, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+
+class PortfolioNav(db.Model):
+    """
+    End-of-day snapshot of a portfolio in its base currency, written by
+    services.nav_service so equity curves never replay the full history.
+    """
+    __tablename__ = 'portfolio_nav'
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    portfolio_id: Mapped[int] = mapped_column(ForeignKey('portfolios.id'), nullable=False, index=True)
+    nav_date: Mapped[date] = mapped_column(Date, nullable=False)
+
+    market_value: Mapped[Decimal] = mapped_column(Numeric(24, 8), nullable=False)
+    cash: Mapped[Decimal] = mapped_column(Numeric(24, 8), nullable=False)
+    net_flow: Mapped[Decimal] = mapped_column(Numeric(24, 8), nullable=False)  # Deposits minus withdrawals on the day
+    nav: Mapped[Decimal] = mapped_column(Numeric(24, 8), nullable=False)  # market_value + cash
+    # Asset ids held that day with no price or FX rate; they count as 0 in market_value
+    missing_prices: Mapped[list[int] | None] = mapped_column(JSON, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), nullable=False)
+
+    # --- Constraints ---
+    __table_args__ = (
+        UniqueConstraint('portfolio_id', 'nav_date', name='uq_portfolio_nav_portfolio_date'),
+    )
+
+    def __repr__(self):
+        return f'<PortfolioNav portfolio_id={self.portfolio_id} date={self.nav_date} nav={self.nav}>'
@@ -0,0 +1,48 @@
+# backend/models/position.py
+from __future__ import annotations  # Ensure forward references work smoothly
+
+from .. import db
+from datetime import datetime, timezone
+from decimal import Decimal
+from sqlalchemy import Numeric, ForeignKey, DateTime, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .account import Account
+    from .asset import Asset
+
+class Position(db.Model):
+    """
+    Current holding of one asset in one account, maintained incrementally as
+    transactions are written (see services.portfolio_service.apply_position_deltas)
+    so holdings views never have to replay the transaction history.
+    """
+    __tablename__ = 'positions'
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    account_id: Mapped[int] = mapped_column(ForeignKey('accounts.id'), nullable=False, index=True)
+    asset_id: Mapped[int] = mapped_column(ForeignKey('assets.id'), nullable=False, index=True)
+
+    quantity: Mapped[Decimal] = mapped_column(Numeric(24, 8), default=Decimal('0.0'), nullable=False)
+    total_cost: Mapped[Decimal] = mapped_column(Numeric(24, 8), default=Decimal('0.0'), nullable=False)  # Cost basis of the open quantity
+    realized_pnl: Mapped[Decimal] = mapped_column(Numeric(24, 8), default=Decimal('0.0'), nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc), nullable=False)
+
+    # --- Relationships ---
+    account: Mapped["Account"] = relationship(back_populates='positions')
+    asset: Mapped["Asset"] = relationship()
+
+    # --- Constraints ---
+    __table_args__ = (
+        UniqueConstraint('account_id', 'asset_id', name='uq_positions_account_asset'),
+    )
+
+    @property
+    def average_cost(self) -> Decimal | None:
+        if not self.quantity:
+            return None
+        return self.total_cost / self.quantity
+
+    def __repr__(self):
+        return f'<Position account_id={self.account_id} asset_id={self.asset_id} qty={self.quantity} cost={self.total_cost} realized={self.realized_pnl}>'
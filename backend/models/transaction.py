@@ -1,10 +1,11 @@
 from __future__ import annotations  # Ensure forward references work smoothly
 
 import enum
+import hashlib
 from .. import db
 from datetime import datetime, timezone
 from decimal import Decimal
-from sqlalchemy import Enum as SQLAlchemyEnum, Numeric, ForeignKey, String, Text, Integer, DateTime
+from sqlalchemy import Enum as SQLAlchemyEnum, Numeric, ForeignKey, String, Text, Integer, DateTime, Index, inspect
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from typing import TYPE_CHECKING, Optional  # Import Optional
 
@@ -47,6 +48,8 @@ class Transaction(db.Model):
     currency: Mapped[str] = mapped_column(String(3), nullable=False)
     strategy_tag: Mapped[Optional[str]] = mapped_column(String(50), nullable=True, index=True)  # Use Optional
     description: Mapped[Optional[str]] = mapped_column(Text, nullable=True)  # Use Optional
+    # Content hash used to skip rows that were already imported (see compute_fingerprint)
+    fingerprint: Mapped[Optional[str]] = mapped_column(String(64), nullable=True, unique=True, index=True)
 
     # --- Relationships ---
     account: Mapped["Account"] = relationship(back_populates='transactions')
@@ -54,6 +57,45 @@ class Transaction(db.Model):
 
     lot_created: Mapped[Optional["Lot"]] = relationship("Lot", back_populates='buy_transaction')
 
+    # --- Indexes ---
+    __table_args__ = (
+        # Keyset pagination: every page of an account's history is one bounded range scan
+        Index('ix_transactions_account_time_id', 'account_id', 'transaction_time', 'id'),
+    )
+
+    @staticmethod
+    def compute_fingerprint(account_id: int, transaction_time: datetime, transaction_type: TransactionTypeEnum,
+                            asset_id: Optional[int], quantity: Optional[Decimal], price_per_unit: Optional[Decimal],
+                            occurrence: int = 0) -> str:
+        """
+        Deterministic SHA-256 of the fields that identify a broker statement line.
+        Times are normalized to UTC and decimals to their canonical form, so the same
+        line re-imported from an overlapping statement always hashes identically.
+        `occurrence` numbers repeats of an identical line within one statement (two
+        identical fills are two trades); the first occurrence hashes as it always has.
+        """
+        if transaction_time.tzinfo is not None:
+            transaction_time = transaction_time.astimezone(timezone.utc).replace(tzinfo=None)
+
+        def _decimal(value):
+            return '' if value is None else format(Decimal(value).normalize(), 'f')
+
+        key = '|'.join((
+            str(account_id),
+            transaction_time.isoformat(),
+            transaction_type.name,
+            '' if asset_id is None else str(asset_id),
+            _decimal(quantity),
+            _decimal(price_per_unit),
+        ))
+        if occurrence:
+            key = f'{key}|{occurrence}'
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
     def __repr__(self):
-        asset_symbol = self.asset.symbol if self.asset else 'N/A'
+        # Never lazy-load the asset just to print a row; use it only if it is already loaded
+        if 'asset' not in inspect(self).unloaded:
+            asset_symbol = self.asset.symbol if self.asset else 'N/A'
+        else:
+            asset_symbol = f'#{self.asset_id}' if self.asset_id is not None else 'N/A'
         return f'<Transaction id={self.id} type={self.transaction_type.name} account={self.account_id} asset={asset_symbol} qty={self.quantity} time={self.transaction_time}>'
@@ -16,13 +16,13 @@ class User(UserMixin, db.Model):
     username: Mapped[str] = mapped_column(db.String(64), index=True, unique=True, nullable=False)
     email: Mapped[str] = mapped_column(db.String(120), index=True, unique=True, nullable=False)
     password_hash: Mapped[str] = mapped_column(db.String(256), nullable=False)
-    created_at: Mapped[datetime] = mapped_column(default=lambda: datetime.now(timezone.utc), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(default=lambda: datetime.now(timezone.utc), nullable=False, index=True)
     email_verified: Mapped[bool] = mapped_column(default=False, nullable=False)
     last_login_at: Mapped[datetime | None] = mapped_column(nullable=True)
 
     # --- Relationships ---
     # Use Mapped for relationship type hint
-    portfolios: Mapped[List["Portfolio"]] = relationship("Portfolio", back_populates="user", lazy="dynamic", cascade="all, delete-orphan")
+    portfolios: Mapped[List["Portfolio"]] = relationship("Portfolio", back_populates="user", cascade="all, delete-orphan")
 
     def __repr__(self):
         return f'<User id={self.id} username={self.username} email={self.email}>'
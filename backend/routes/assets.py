@@ -0,0 +1,24 @@
+# backend/routes/assets.py
+from flask import Blueprint, jsonify, request
+from flask_login import login_required
+from ..services.asset_search import DEFAULT_LIMIT, MAX_LIMIT, get_asset_search
+
+assets_bp = Blueprint('assets', __name__)
+
+# ---------------------------
+# 🔎 Asset Autocomplete
+# ---------------------------
+@assets_bp.route('/search')
+@login_required
+def search_assets():
+    """
+    Autocomplete over symbol, name and exchange: ?q=<text>&limit=10&type=STOCK.
+    Answered from the in-process index; exact symbol matches rank first.
+    `ready` is false (and results empty) while a worker is still building its index.
+    """
+    query = request.args.get('q', '')
+    limit = min(max(request.args.get('limit', DEFAULT_LIMIT, type=int), 1), MAX_LIMIT)
+    asset_type = (request.args.get('type') or '').strip().upper() or None
+    search = get_asset_search()
+    results = search.search(query, limit, asset_type)
+    return jsonify({'results': results, 'ready': search.ready}), 200
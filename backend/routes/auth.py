@@ -3,6 +3,8 @@ import re
 from flask import Blueprint, jsonify, request
 from .. import db
 from ..models.user import User
+from ..services.auth_service import PasswordHasherBusy, get_password_hasher, invalidate_user
+from ..services.username_filter import get_username_filter
 from flask_login import login_user, logout_user, login_required, current_user
 from datetime import datetime, timezone # Ensure timezone is imported
 
@@ -28,6 +30,11 @@ def is_valid_email_format(email):
     pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
     return re.match(pattern, email) is not None
 
+def _busy_response():
+    response = jsonify({'error': 'Server busy, please retry shortly'})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
 # ---------------------------
 # 🔐 Registration Route
 # ---------------------------
@@ -61,7 +68,10 @@ def register():
 
     # Use normalized values for creation
     new_user = User(username=username, email=email)
-    new_user.set_password(password) # Hashes the password
+    try:
+        get_password_hasher().set_password(new_user, password) # Hashes the password on the worker's hashing pool
+    except PasswordHasherBusy:
+        return _busy_response()
     db.session.add(new_user)
     db.session.commit()
 
@@ -99,7 +109,12 @@ def login():
         user = User.query.filter(User.username == login_identifier_for_query).first()
 
 
-    if user and user.check_password(password):
+    try:
+        valid = get_password_hasher().check(user, password)
+    except PasswordHasherBusy:
+        return _busy_response()
+
+    if valid:
         login_user(user, remember=remember) # Pass remember status
 
         # Track last login time
@@ -121,6 +136,7 @@ def login():
 @auth_bp.route('/logout', methods=['POST'])
 @login_required
 def logout():
+    invalidate_user(current_user.id)
     logout_user()
     return jsonify({'message': 'Logged out successfully'}), 200
 
@@ -138,16 +154,31 @@ def status():
 # ---------------------------
 @auth_bp.route('/check-username', methods=['POST'])
 def check_username():
+    """
+    {"username": ...} or {"email": ...} -> {"exists": bool}. The worker's Bloom
+    filter answers "available" without a query; only possible matches are looked up.
+    """
     data = request.get_json()
-    if not data or 'username' not in data:
+    if not data or ('username' not in data and 'email' not in data):
         return jsonify({"error": "Username not provided"}), 400
 
+    names = get_username_filter()
+    if 'username' not in data:
+        email = (data['email'] or '').strip().lower()
+        if not is_valid_email_format(email):
+            return jsonify({"error": "Invalid email format"}), 400
+        if not names.might_have_email(email):
+            return jsonify({"exists": False}), 200
+        return jsonify({"exists": User.query.filter_by(email=email).first() is not None}), 200
+
     username = data['username'].strip()
 
     if not is_valid_username(username):
         # Consistent error format might be better
         return jsonify({"error": "Username format invalid (too short)"}), 400
 
+    if not names.might_have_username(username):
+        return jsonify({"exists": False}), 200
     user = User.query.filter_by(username=username).first()
     # Return boolean directly in the expected format
     return jsonify({"exists": bool(user)}), 200
\ No newline at end of file
@@ -0,0 +1,51 @@
+# backend/routes/import.py
+# NOTE: 'import' is a keyword, so create_app loads this module via importlib.
+import io
+import json
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
+from flask_login import login_required, current_user
+from ..services.import_service import ImportFormatError, stream_import
+from ..services.portfolio_service import LotMatchingMethod, get_owned_account
+
+import_bp = Blueprint('import', __name__)
+
+# ---------------------------
+# 📥 Transaction CSV Import
+# ---------------------------
+@import_bp.route('/transactions', methods=['POST'])
+@login_required
+def import_transactions():
+    """
+    Streams a broker CSV export into the given account.
+    Responds with newline-delimited JSON progress/error events as batches are written.
+    """
+    account_id = request.form.get('account_id', type=int)
+    upload = request.files.get('file')
+    if account_id is None or upload is None:
+        return jsonify({'error': 'account_id and file are required'}), 400
+
+    try:
+        lot_method = LotMatchingMethod(request.form.get('lot_method', 'FIFO').upper())
+    except ValueError:
+        return jsonify({'error': 'Invalid lot_method'}), 400
+
+    account = get_owned_account(current_user.id, account_id)
+    if account is None:
+        return jsonify({'error': 'Account not found'}), 404
+
+    # Werkzeug spools large uploads to disk; wrap it so rows are decoded lazily
+    stream = io.TextIOWrapper(upload.stream, encoding='utf-8-sig', newline='')
+    try:
+        events = stream_import(
+            account, stream,
+            batch_size=current_app.config.get('IMPORT_BATCH_SIZE'),
+            lot_method=lot_method,
+        )
+    except ImportFormatError as e:
+        return jsonify({'error': str(e)}), 400
+
+    def generate():
+        for event in events:
+            yield json.dumps(event) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
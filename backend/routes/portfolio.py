@@ -0,0 +1,352 @@
+# backend/routes/portfolio.py
+import enum
+from datetime import date, datetime, time, timedelta, timezone
+from decimal import Decimal
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
+from sqlalchemy import inspect
+from flask_login import login_required, current_user
+from .. import db
+from ..services.analytics_service import compute_analytics
+from ..services.bond_service import compute_bond_analytics, project_bond_cash_flows
+from ..services.nav_service import ensure_nav_current, get_nav_series, holdings_as_of
+from ..services.tax_report_service import iter_realized_gains, render_csv, render_jsonl
+from ..models.account import Account
+from ..models.portfolio import Portfolio
+from ..models.position import Position
+from ..models.transaction import TransactionTypeEnum
+from ..services.portfolio_service import (
+    DEFAULT_PAGE_SIZE, InvalidCursorError, get_owned_portfolio, get_portfolio_positions, list_transactions,
+    load_portfolio,
+)
+from ..services.valuation_service import value_portfolio
+from ..services.valuation_stream import StreamCapacityError, get_valuation_hub, stream_events
+
+portfolio_bp = Blueprint('portfolio', __name__)
+
+
+def _decimal_str(value):
+    # Plain notation keeps Decimal('0E-8') from reaching the client as '0E-8'
+    return format(value, 'f') if value is not None else None
+
+
+def _json_value(value):
+    if isinstance(value, Decimal):
+        return _decimal_str(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, enum.Enum):
+        return value.name
+    return value
+
+
+def _asset_details(asset):
+    """Columns of the asset's subclass table (sector, strike, maturity...), already loaded with the asset."""
+    table = inspect(type(asset)).local_table
+    if table is inspect(type(asset)).base_mapper.local_table:
+        return {}
+    return {column.key: _json_value(getattr(asset, column.key)) for column in table.columns if column.key != 'id'}
+
+
+def _date_arg(name):
+    """Optional YYYY-MM-DD query parameter; raises ValueError on a malformed date."""
+    value = request.args.get(name)
+    return date.fromisoformat(value) if value else None
+
+
+# ---------------------------
+# 📊 Portfolio Overview
+# ---------------------------
+@portfolio_bp.route('/<int:portfolio_id>/overview')
+@login_required
+def overview(portfolio_id):
+    """
+    Accounts and current holdings of a portfolio. Three queries regardless of size:
+    the portfolio, its accounts, and positions joined to every asset subclass table.
+    """
+    portfolio = load_portfolio(current_user.id, portfolio_id)
+    if portfolio is None:
+        return jsonify({'error': 'Portfolio not found'}), 404
+
+    holdings = []
+    for position, asset in get_portfolio_positions(portfolio.id):
+        holdings.append({
+            'account_id': position.account_id,
+            'asset_id': asset.id,
+            'symbol': asset.symbol,
+            'name': asset.name,
+            'asset_type': asset.asset_type,
+            'currency': asset.currency,
+            'quantity': _decimal_str(position.quantity),
+            'total_cost': _decimal_str(position.total_cost),
+            'average_cost': _decimal_str(position.average_cost),
+            'realized_pnl': _decimal_str(position.realized_pnl),
+            'details': _asset_details(asset),
+        })
+
+    return jsonify({
+        'portfolio': {'id': portfolio.id, 'name': portfolio.name, 'base_currency': portfolio.base_currency},
+        'accounts': [
+            {
+                'id': account.id,
+                'name': account.name,
+                'account_type': account.account_type,
+                'currency': account.currency,
+                'cash_balance': _decimal_str(account.cash_balance),
+            }
+            for account in portfolio.accounts
+        ],
+        'holdings': holdings,
+    }), 200
+
+
+# ---------------------------
+# 💰 Portfolio Valuation
+# ---------------------------
+@portfolio_bp.route('/<int:portfolio_id>/valuation')
+@login_required
+def valuation(portfolio_id):
+    """
+    Market value, unrealized P&L and weights of every position, in the portfolio's base currency.
+    ?live=1 prices positions from the shared quote cache instead of the stored last prices.
+    """
+    portfolio = get_owned_portfolio(current_user.id, portfolio_id)
+    if portfolio is None:
+        return jsonify({'error': 'Portfolio not found'}), 404
+
+    live = request.args.get('live', '0').lower() in ('1', 'true')
+    return jsonify(value_portfolio(portfolio, live=live).to_dict()), 200
+
+
+@portfolio_bp.route('/<int:portfolio_id>/valuation/stream')
+@login_required
+def valuation_stream(portfolio_id):
+    """
+    Server-Sent Events: a 'snapshot' event with the full live valuation, then a 'delta'
+    event with only the changed totals and positions whenever a tick changes them.
+    A client that falls behind gets a 'dropped' event and the stream ends.
+    """
+    portfolio = get_owned_portfolio(current_user.id, portfolio_id)
+    if portfolio is None:
+        return jsonify({'error': 'Portfolio not found'}), 404
+
+    hub = get_valuation_hub()
+    try:
+        subscriber = hub.subscribe(portfolio.id)
+    except StreamCapacityError:
+        response = jsonify({'error': 'Too many live streams, please retry shortly'})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+    # Not stream_with_context: the request context (and its DB session) is released while the stream stays open
+    body = stream_events(hub, subscriber, current_app.config.get('VALUATION_STREAM_HEARTBEAT_SECONDS', 15))
+    return Response(body, mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+# ---------------------------
+# 📈 NAV History
+# ---------------------------
+@portfolio_bp.route('/<int:portfolio_id>/nav')
+@login_required
+def nav_history(portfolio_id):
+    """Daily market value, cash, net flows and NAV; ?start=&end= (YYYY-MM-DD) bound the range."""
+    portfolio = get_owned_portfolio(current_user.id, portfolio_id)
+    if portfolio is None:
+        return jsonify({'error': 'Portfolio not found'}), 404
+    try:
+        start, end = _date_arg('start'), _date_arg('end')
+    except ValueError:
+        return jsonify({'error': 'Dates must be YYYY-MM-DD'}), 400
+
+    # Only the days after the last snapshot (or after a backdated transaction) are computed here
+    ensure_nav_current(portfolio)
+    return jsonify(get_nav_series(portfolio, start, end).to_dict()), 200
+
+
+@portfolio_bp.route('/<int:portfolio_id>/analytics')
+@login_required
+def analytics(portfolio_id):
+    """TWR, money-weighted return, volatility, drawdown and beta/alpha against the benchmark over ?start=&end=."""
+    portfolio = get_owned_portfolio(current_user.id, portfolio_id)
+    if portfolio is None:
+        return jsonify({'error': 'Portfolio not found'}), 404
+    try:
+        start, end = _date_arg('start'), _date_arg('end')
+    except ValueError:
+        return jsonify({'error': 'Dates must be YYYY-MM-DD'}), 400
+
+    ensure_nav_current(portfolio)
+    stats = compute_analytics([portfolio], start, end).to_dicts()[0]
+    stats['benchmark_ticker'] = portfolio.benchmark_ticker
+    return jsonify(stats), 200
+
+
+@portfolio_bp.route('/<int:portfolio_id>/holdings')
+@login_required
+def holdings(portfolio_id):
+    """Quantities and cash balances at the end of ?as_of=YYYY-MM-DD (default today)."""
+    portfolio = get_owned_portfolio(current_user.id, portfolio_id)
+    if portfolio is None:
+        return jsonify({'error': 'Portfolio not found'}), 404
+    try:
+        as_of = _date_arg('as_of') or datetime.now(timezone.utc).date()
+    except ValueError:
+        return jsonify({'error': 'Dates must be YYYY-MM-DD'}), 400
+
+    # Month-end checkpoints written before a backdated transaction are rebuilt before they are read
+    ensure_nav_current(portfolio)
+    return jsonify(holdings_as_of(portfolio.id, as_of).to_dict()), 200
+
+
+# ---------------------------
+# 🏦 Bond Analytics
+# ---------------------------
+@portfolio_bp.route('/<int:portfolio_id>/bonds')
+@login_required
+def bond_analytics(portfolio_id):
+    """Yield to maturity, duration and convexity of every bond held in the portfolio at ?as_of= (default today)."""
+    portfolio = get_owned_portfolio(current_user.id, portfolio_id)
+    if portfolio is None:
+        return jsonify({'error': 'Portfolio not found'}), 404
+    try:
+        as_of = _date_arg('as_of')
+    except ValueError:
+        return jsonify({'error': 'Dates must be YYYY-MM-DD'}), 400
+
+    bond_ids = [
+        asset_id for (asset_id,) in db.session.query(Position.asset_id.distinct())
+        .join(Account, Position.account_id == Account.id)
+        .filter(Account.portfolio_id == portfolio.id, Position.quantity != 0)
+    ]
+    stats = compute_bond_analytics(bond_ids, as_of)
+    return jsonify({'as_of': stats.as_of.isoformat(), 'bonds': stats.to_dicts()}), 200
+
+
+@portfolio_bp.route('/<int:portfolio_id>/bond-cash-flows')
+@login_required
+def bond_cash_flows(portfolio_id):
+    """Projected coupon and maturity payments between ?start= (default today) and ?end= (default a year later)."""
+    portfolio = get_owned_portfolio(current_user.id, portfolio_id)
+    if portfolio is None:
+        return jsonify({'error': 'Portfolio not found'}), 404
+    try:
+        start = _date_arg('start') or datetime.now(timezone.utc).date()
+        end = _date_arg('end') or start + timedelta(days=365)
+    except ValueError:
+        return jsonify({'error': 'Dates must be YYYY-MM-DD'}), 400
+
+    flows = project_bond_cash_flows(portfolio.id, start, end)
+    return jsonify({'cash_flows': [flow.to_dict() for flow in flows]}), 200
+
+
+# ---------------------------
+# 🧾 Transaction History
+# ---------------------------
+@portfolio_bp.route('/<int:portfolio_id>/transactions')
+@login_required
+def transactions(portfolio_id):
+    """
+    Newest-first transactions across the portfolio's accounts, paginated by cursor.
+    Filters: account_id, type (repeatable or comma-separated), asset_id, strategy_tag,
+    start/end (YYYY-MM-DD, inclusive); pass the returned next_cursor to get the next page.
+    """
+    portfolio = get_owned_portfolio(current_user.id, portfolio_id)
+    if portfolio is None:
+        return jsonify({'error': 'Portfolio not found'}), 404
+
+    account_ids = [account_id for (account_id,) in db.session.query(Account.id).filter(Account.portfolio_id == portfolio.id)]
+    requested_account = request.args.get('account_id', type=int)
+    if requested_account is not None:
+        if requested_account not in account_ids:
+            return jsonify({'error': 'Account not found'}), 404
+        account_ids = [requested_account]
+
+    try:
+        type_names = [name.strip().upper() for value in request.args.getlist('type') for name in value.split(',') if name.strip()]
+        transaction_types = [TransactionTypeEnum[name] for name in type_names]
+    except KeyError as e:
+        return jsonify({'error': f'Unknown transaction type: {e.args[0]}'}), 400
+    try:
+        start, end = _date_arg('start'), _date_arg('end')
+    except ValueError:
+        return jsonify({'error': 'Dates must be YYYY-MM-DD'}), 400
+
+    try:
+        page = list_transactions(
+            account_ids,
+            cursor=request.args.get('cursor'),
+            limit=request.args.get('limit', DEFAULT_PAGE_SIZE, type=int),
+            transaction_types=transaction_types,
+            asset_id=request.args.get('asset_id', type=int),
+            strategy_tag=request.args.get('strategy_tag'),
+            start=datetime.combine(start, time.min, tzinfo=timezone.utc) if start else None,
+            end=datetime.combine(end + timedelta(days=1), time.min, tzinfo=timezone.utc) if end else None,
+        )
+    except InvalidCursorError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({
+        'transactions': [
+            {
+                'id': transaction.id,
+                'account_id': transaction.account_id,
+                'asset_id': transaction.asset_id,
+                'symbol': symbol,
+                'transaction_type': transaction.transaction_type.name,
+                'transaction_time': transaction.transaction_time.isoformat(),
+                'quantity': _decimal_str(transaction.quantity),
+                'price_per_unit': _decimal_str(transaction.price_per_unit),
+                'commission': _decimal_str(transaction.commission),
+                'fees': _decimal_str(transaction.fees),
+                'currency': transaction.currency,
+                'strategy_tag': transaction.strategy_tag,
+                'description': transaction.description,
+            }
+            for transaction, symbol in page.rows
+        ],
+        'next_cursor': page.next_cursor,
+    }), 200
+
+
+# ---------------------------
+# 🧮 Realized Gains Report
+# ---------------------------
+@portfolio_bp.route('/<int:portfolio_id>/realized-gains')
+@login_required
+def realized_gains(portfolio_id):
+    """
+    Every lot disposal sold in ?year= (or ?start=&end=, inclusive), streamed as CSV
+    (default) or JSON lines with ?format=jsonl. Rows are ordered by asset, then sale
+    date; wash sales are checked against purchases in all of the user's accounts.
+    """
+    portfolio = get_owned_portfolio(current_user.id, portfolio_id)
+    if portfolio is None:
+        return jsonify({'error': 'Portfolio not found'}), 404
+    try:
+        year = request.args.get('year', type=int)
+        start = _date_arg('start') or date(year or datetime.now(timezone.utc).year, 1, 1)
+        end = _date_arg('end') or date(start.year, 12, 31)
+    except ValueError:
+        return jsonify({'error': 'Dates must be YYYY-MM-DD'}), 400
+    output = request.args.get('format', 'csv').lower()
+    if output not in ('csv', 'jsonl'):
+        return jsonify({'error': 'format must be csv or jsonl'}), 400
+
+    account_ids = [account_id for (account_id,) in db.session.query(Account.id).filter(Account.portfolio_id == portfolio.id)]
+    user_account_ids = [
+        account_id for (account_id,) in db.session.query(Account.id)
+        .join(Portfolio, Account.portfolio_id == Portfolio.id)
+        .filter(Portfolio.user_id == current_user.id)
+    ]
+    rows = iter_realized_gains(
+        account_ids,
+        start=datetime.combine(start, time.min, tzinfo=timezone.utc),
+        end=datetime.combine(end + timedelta(days=1), time.min, tzinfo=timezone.utc),
+        wash_sale_account_ids=user_account_ids,
+    )
+    filename = f'realized-gains-{portfolio.id}-{start.isoformat()}-{end.isoformat()}.{output}'
+    if output == 'jsonl':
+        body, mimetype = render_jsonl(rows), 'application/x-ndjson'
+    else:
+        body, mimetype = render_csv(rows), 'text/csv'
+    return Response(stream_with_context(body), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
@@ -0,0 +1,264 @@
+# backend/services/analytics_service.py
+from __future__ import annotations
+
+import warnings
+from dataclasses import dataclass
+from datetime import date
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import select
+
+from .. import db
+from ..models.asset import Asset
+from ..models.portfolio import Portfolio
+from ..models.portfolio_nav import PortfolioNav
+from .price_history import get_price_store
+
+# NAV snapshots are calendar-daily (weekends included), so annualize over calendar days
+PERIODS_PER_YEAR = 365
+XIRR_MAX_ITERATIONS = 100
+XIRR_TOLERANCE = 1e-10
+XIRR_GUESS = 0.1
+
+
+@dataclass
+class PerformanceStats:
+    """Metrics for a batch of portfolios; every array is indexed like portfolio_ids (NaN when undefined)."""
+    portfolio_ids: List[int]
+    start: Optional[np.datetime64]
+    end: Optional[np.datetime64]
+    twr: np.ndarray
+    twr_annualized: np.ndarray
+    mwr: np.ndarray             # Annualized XIRR
+    volatility: np.ndarray      # Annualized standard deviation of daily returns
+    max_drawdown: np.ndarray    # Most negative peak-to-trough move of the TWR wealth index
+    current_drawdown: np.ndarray
+    beta: np.ndarray
+    alpha: np.ndarray           # Annualized, versus the benchmark (no risk-free rate)
+    benchmark_return: np.ndarray
+
+    def to_dicts(self) -> List[dict]:
+        def _num(value):
+            return None if np.isnan(value) else round(float(value), 10)
+
+        metrics = ('twr', 'twr_annualized', 'mwr', 'volatility', 'max_drawdown', 'current_drawdown',
+                   'beta', 'alpha', 'benchmark_return')
+        return [
+            dict(
+                {'portfolio_id': portfolio_id,
+                 'start': None if self.start is None else str(self.start),
+                 'end': None if self.end is None else str(self.end)},
+                **{name: _num(getattr(self, name)[i]) for name in metrics},
+            )
+            for i, portfolio_id in enumerate(self.portfolio_ids)
+        ]
+
+
+# ---------------------------
+# Array Kernels
+# ---------------------------
+# All kernels take (portfolios x days) float arrays on a shared date axis, NaN
+# where a portfolio has no snapshot. Flows are external cash flows (deposits
+# positive) and are assumed to arrive at the start of their day.
+def daily_returns(nav: np.ndarray, flows: np.ndarray) -> np.ndarray:
+    """r[t] = nav[t] / (nav[t-1] + flow[t]) - 1; NaN in column 0 and wherever undefined."""
+    nav = np.atleast_2d(nav)
+    flows = np.nan_to_num(np.atleast_2d(flows))
+    returns = np.full(nav.shape, np.nan)
+    base = nav[:, :-1] + flows[:, 1:]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns[:, 1:] = np.where(base > 0, nav[:, 1:] / base - 1, np.nan)
+    return returns
+
+
+def time_weighted_return(returns: np.ndarray) -> np.ndarray:
+    return np.where(np.isnan(returns).all(axis=1), np.nan, np.nanprod(1 + returns, axis=1) - 1)
+
+
+def annualize(total_return: np.ndarray, periods: np.ndarray) -> np.ndarray:
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(periods > 0, (1 + total_return) ** (PERIODS_PER_YEAR / periods) - 1, np.nan)
+
+
+def volatility(returns: np.ndarray) -> np.ndarray:
+    counts = np.sum(~np.isnan(returns), axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'), warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)  # Rows with fewer than two returns are NaN by design
+        std = np.nanstd(np.where(counts[:, None] > 1, returns, np.nan), axis=1, ddof=1)
+    return std * np.sqrt(PERIODS_PER_YEAR)
+
+
+def drawdowns(returns: np.ndarray) -> np.ndarray:
+    """Drawdown of the wealth index built from returns (flow-neutral, unlike raw NAV)."""
+    wealth = np.cumprod(1 + np.nan_to_num(returns), axis=1)
+    return wealth / np.maximum.accumulate(wealth, axis=1) - 1
+
+
+def beta_alpha(returns: np.ndarray, benchmark_returns: np.ndarray):
+    """Regression beta and annualized alpha of each row against its benchmark row, over days both have."""
+    mask = ~np.isnan(returns) & ~np.isnan(benchmark_returns)
+    counts = mask.sum(axis=1)
+    r = np.where(mask, returns, 0.0)
+    b = np.where(mask, benchmark_returns, 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_r = r.sum(axis=1) / counts
+        mean_b = b.sum(axis=1) / counts
+        dev_r = np.where(mask, r - mean_r[:, None], 0.0)
+        dev_b = np.where(mask, b - mean_b[:, None], 0.0)
+        covariance = (dev_r * dev_b).sum(axis=1) / (counts - 1)
+        variance = (dev_b * dev_b).sum(axis=1) / (counts - 1)
+        beta = np.where((counts > 1) & (variance > 0), covariance / variance, np.nan)
+    alpha = (mean_r - beta * mean_b) * PERIODS_PER_YEAR
+    return beta, alpha
+
+
+def xirr(cash_flows: np.ndarray, years: np.ndarray) -> np.ndarray:
+    """
+    Annual rate solving sum(cf * (1 + rate) ** -t) = 0 for every row at once.
+    Newton steps run on the whole batch; rows drop out as they converge, and
+    rows that never converge (or have flows of one sign only) come back NaN.
+    """
+    cash_flows = np.atleast_2d(np.nan_to_num(cash_flows))
+    years = np.broadcast_to(years, cash_flows.shape)
+    has_both_signs = (cash_flows > 0).any(axis=1) & (cash_flows < 0).any(axis=1)
+    rate = np.full(len(cash_flows), XIRR_GUESS)
+    done = ~has_both_signs
+    result = np.full(len(cash_flows), np.nan)
+
+    for _ in range(XIRR_MAX_ITERATIONS):
+        active = ~done
+        if not active.any():
+            break
+        r = rate[active][:, None]
+        cf, t = cash_flows[active], years[active]
+        discount = (1 + r) ** -t
+        value = (cf * discount).sum(axis=1)
+        derivative = (-t * cf * discount / (1 + r)).sum(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            step = np.where(derivative != 0, value / derivative, np.nan)
+        new_rate = np.maximum(rate[active] - step, -0.999999)
+
+        converged = np.abs(step) < XIRR_TOLERANCE
+        failed = ~np.isfinite(new_rate)
+        indices = np.flatnonzero(active)
+        result[indices[converged]] = new_rate[converged]
+        rate[indices] = np.where(failed, rate[indices], new_rate)
+        done[indices[converged | failed]] = True
+    return result
+
+
+# ---------------------------
+# Batch Entry Point
+# ---------------------------
+def compute_analytics(portfolios: Sequence[Portfolio], start: Optional[date] = None,
+                      end: Optional[date] = None) -> PerformanceStats:
+    """
+    Metrics for many portfolios from their stored NAV snapshots (see nav_service):
+    one query for every snapshot, one price-store pass per distinct benchmark,
+    then array kernels over the whole batch.
+    """
+    portfolio_ids = [p.id for p in portfolios]
+    days, nav, flows = load_nav_matrix(portfolio_ids, start, end)
+    count = len(portfolio_ids)
+    if not len(days):
+        empty = np.full(count, np.nan)
+        return PerformanceStats(portfolio_ids, None, None, *([empty] * 9))
+
+    returns = daily_returns(nav, flows)
+    periods = np.sum(~np.isnan(returns), axis=1)
+    twr = time_weighted_return(returns)
+    drawdown = drawdowns(returns)
+    has_data = ~np.isnan(nav).all(axis=1)
+
+    benchmark_returns = _benchmark_returns(portfolios, days)
+    beta, alpha = beta_alpha(returns, benchmark_returns)
+    benchmark_return = time_weighted_return(benchmark_returns)
+
+    return PerformanceStats(
+        portfolio_ids=portfolio_ids,
+        start=days[0],
+        end=days[-1],
+        twr=twr,
+        twr_annualized=annualize(twr, periods),
+        mwr=xirr(*_xirr_inputs(days, nav, flows)),
+        volatility=volatility(returns),
+        max_drawdown=np.where(has_data, drawdown.min(axis=1), np.nan),
+        current_drawdown=np.where(has_data, drawdown[:, -1], np.nan),
+        beta=beta,
+        alpha=alpha,
+        benchmark_return=benchmark_return,
+    )
+
+
+def load_nav_matrix(portfolio_ids: Sequence[int], start: Optional[date] = None, end: Optional[date] = None):
+    """(days, nav, flows): a shared datetime64[D] axis and (portfolios x days) arrays, NaN-padded."""
+    stmt = (
+        select(PortfolioNav.portfolio_id, PortfolioNav.nav_date, PortfolioNav.nav, PortfolioNav.net_flow)
+        .where(PortfolioNav.portfolio_id.in_(list(portfolio_ids)))
+    )
+    if start is not None:
+        stmt = stmt.where(PortfolioNav.nav_date >= start)
+    if end is not None:
+        stmt = stmt.where(PortfolioNav.nav_date <= end)
+    rows = db.session.execute(stmt).all()
+
+    row_of = {portfolio_id: i for i, portfolio_id in enumerate(portfolio_ids)}
+    dates = np.array([row[1] for row in rows], dtype='datetime64[D]')
+    days, columns = np.unique(dates, return_inverse=True)
+    rows_index = np.fromiter((row_of[row[0]] for row in rows), dtype=np.int64, count=len(rows))
+
+    nav = np.full((len(portfolio_ids), len(days)), np.nan)
+    flows = np.zeros((len(portfolio_ids), len(days)))
+    nav[rows_index, columns] = np.fromiter((row[2] for row in rows), dtype=float, count=len(rows))
+    flows[rows_index, columns] = np.fromiter((row[3] for row in rows), dtype=float, count=len(rows))
+    return days, nav, flows
+
+
+def _xirr_inputs(days: np.ndarray, nav: np.ndarray, flows: np.ndarray):
+    """
+    Investor-side cash flows per row: the value held before the first day goes
+    in, external flows go in (deposits negative), the final NAV comes out.
+    """
+    valid = ~np.isnan(nav)
+    has_data = valid.any(axis=1)
+    first = np.argmax(valid, axis=1)
+    last = nav.shape[1] - 1 - np.argmax(valid[:, ::-1], axis=1)
+    rows = np.arange(len(nav))
+
+    cash_flows = -np.where(valid, flows, 0.0)
+    opening = np.where(has_data, np.nan_to_num(nav[rows, first] - flows[rows, first]), 0.0)
+    cash_flows[rows, first] -= opening
+    cash_flows[rows, last] += np.where(has_data, np.nan_to_num(nav[rows, last]), 0.0)
+
+    offsets = (days - days[0]).astype(np.int64)
+    years = (offsets[None, :] - offsets[first][:, None]) / PERIODS_PER_YEAR
+    return cash_flows, years
+
+
+def _benchmark_returns(portfolios: Sequence[Portfolio], days: np.ndarray) -> np.ndarray:
+    """Daily benchmark returns per portfolio row, from the price store; NaN rows where there is no benchmark."""
+    returns = np.full((len(portfolios), len(days)), np.nan)
+    tickers = sorted({p.benchmark_ticker.upper() for p in portfolios if p.benchmark_ticker})
+    if not tickers:
+        return returns
+
+    asset_ids: Dict[str, int] = {}
+    for asset_id, symbol in db.session.execute(
+        select(Asset.id, Asset.symbol).where(Asset.symbol.in_(tickers)).order_by(Asset.id)
+    ):
+        asset_ids.setdefault(symbol.upper(), asset_id)
+    known = [ticker for ticker in tickers if ticker in asset_ids]
+    if not known:
+        return returns
+
+    closes = get_price_store().closes_asof([asset_ids[ticker] for ticker in known], days)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ticker_returns = np.full(closes.shape, np.nan)
+        ticker_returns[:, 1:] = closes[:, 1:] / closes[:, :-1] - 1
+    ticker_row = {ticker: i for i, ticker in enumerate(known)}
+    for i, portfolio in enumerate(portfolios):
+        ticker = (portfolio.benchmark_ticker or '').upper()
+        if ticker in ticker_row:
+            returns[i] = ticker_returns[ticker_row[ticker]]
+    return returns
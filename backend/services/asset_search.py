@@ -0,0 +1,428 @@
+# backend/services/asset_search.py
+# In-process asset search for autocomplete. Each worker keeps an immutable
+# snapshot (sorted symbol keys, sorted name/exchange words and a trigram
+# posting array) plus a small overlay of assets changed since it was built.
+# Commits that touch assets update this worker's overlay immediately; other
+# workers pick changes up on their next periodic rebuild.
+from __future__ import annotations
+
+import itertools
+import logging
+import re
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from flask import current_app, has_app_context
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+
+from .. import db
+from ..models.asset import Asset
+from ..models.position import Position
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+OVERLAY_REBUILD_THRESHOLD = 1000  # Changed assets before the snapshot is rebuilt in memory
+TRIGRAM_VERIFY_LIMIT = 5000       # Most popular trigram candidates checked for a real substring match
+LOAD_BATCH_SIZE = 10000
+
+# Ranking tiers, best first
+EXACT_SYMBOL, SYMBOL_PREFIX, WORD_PREFIX, SUBSTRING = range(4)
+
+_WORD = re.compile(r'\w+')
+_PREFIX_END = '\uffff'  # Sorts after any character a key can contain
+
+# (id, symbol, name, exchange, asset_type, currency, popularity)
+AssetRow = Tuple[int, str, Optional[str], Optional[str], str, str, int]
+
+
+def _search_text(symbol: str, name: Optional[str]) -> str:
+    return f'{symbol} {name or ""}'.lower()
+
+
+def _trigram_codes(data: bytes) -> np.ndarray:
+    """Integer code of every 3-byte window of data (ASCII, lowercased by the caller)."""
+    array = np.frombuffer(data, dtype=np.uint8).astype(np.int32)
+    return (array[:-2] << 16) | (array[1:-1] << 8) | array[2:]
+
+
+class AssetSearchIndex:
+    """One immutable snapshot plus an overlay of changes; see search() for ranking."""
+
+    def __init__(self, rows: List[AssetRow]):
+        self.built_at = time.monotonic()
+        count = len(rows)
+        self.ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=count)
+        self.symbols = [row[1] for row in rows]
+        self.names = [row[2] for row in rows]
+        self.exchanges = [row[3] for row in rows]
+        self.types = np.array([row[4] for row in rows], dtype=object)
+        self.currencies = [row[5] for row in rows]
+        self.popularity = np.fromiter((row[6] for row in rows), dtype=np.int64, count=count)
+        self._entry_of = {asset_id: i for i, asset_id in enumerate(self.ids.tolist())}
+        self._stale = np.zeros(count, dtype=bool)
+        self._overlay: Dict[int, Optional[AssetRow]] = {}
+        self._lock = threading.Lock()
+
+        symbol_keys = np.array([symbol.upper() for symbol in self.symbols], dtype=str)
+        order = np.argsort(symbol_keys, kind='stable')
+        self._symbol_keys = symbol_keys[order].tolist()
+        self._symbol_entries = order.astype(np.int64)
+
+        # Distinct name/exchange words in order; each word's postings are most popular first
+        tokens = [set(_WORD.findall(f'{name or ""} {exchange or ""}'.lower())) for name, exchange in zip(self.names, self.exchanges)]
+        words = np.array(list(itertools.chain.from_iterable(tokens)), dtype=str)
+        entries = np.repeat(np.arange(count, dtype=np.int64), [len(entry_words) for entry_words in tokens])
+        order = np.lexsort((-self.popularity[entries], words))
+        words = words[order]
+        starts = np.flatnonzero(np.concatenate(([True], words[1:] != words[:-1]))) if len(words) else np.empty(0, np.int64)
+        self._word_keys = words[starts].tolist()
+        self._word_starts = np.append(starts, len(order)).astype(np.int64)
+        self._word_postings = entries[order]
+
+        # Trigram postings sorted by (code, entry); entries are separated by NUL bytes
+        self._texts = [_search_text(self.symbols[i], self.names[i]) for i in range(count)]
+        data = '\x00'.join(self._texts).encode('ascii', 'replace')
+        if len(data) >= 3:
+            separators = np.frombuffer(data, dtype=np.uint8) == 0
+            entry_at = np.concatenate(([0], np.cumsum(separators)[:-1]))
+            valid = ~(separators[:-2] | separators[1:-1] | separators[2:])
+            postings = np.sort((_trigram_codes(data)[valid].astype(np.int64) << 32) | entry_at[:-2][valid])
+            postings = postings[np.concatenate(([True], postings[1:] != postings[:-1]))]
+            self._trigram_codes = (postings >> 32).astype(np.int32)
+            self._trigram_entries = (postings & 0xFFFFFFFF).astype(np.int64)
+        else:
+            self._trigram_codes = np.empty(0, dtype=np.int32)
+            self._trigram_entries = np.empty(0, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.ids) - int(self._stale.sum()) + sum(1 for row in self._overlay.values() if row is not None)
+
+    # ---------------------------
+    # Changes
+    # ---------------------------
+    def apply_changes(self, changes: Dict[int, Optional[AssetRow]]) -> None:
+        """Upserts changed assets (None = deleted) into the overlay; snapshot rows for them are hidden."""
+        with self._lock:
+            overlay = dict(self._overlay)
+            for asset_id, row in changes.items():
+                entry = self._entry_of.get(asset_id)
+                if entry is not None:
+                    self._stale[entry] = True
+                if row is not None and row[6] is None:
+                    # Popularity is only counted on full rebuilds; keep what we knew
+                    previous = overlay.get(asset_id)
+                    known = previous[6] if previous else (int(self.popularity[entry]) if entry is not None else 0)
+                    row = row[:6] + (known,)
+                overlay[asset_id] = row
+            self._overlay = overlay  # Swapped, never mutated in place, so readers need no lock
+
+    @property
+    def overlay_size(self) -> int:
+        return len(self._overlay)
+
+    def rows(self) -> List[AssetRow]:
+        """Current contents (snapshot minus stale rows, plus overlay), for an in-memory rebuild."""
+        rows = [
+            (int(self.ids[i]), self.symbols[i], self.names[i], self.exchanges[i], self.types[i], self.currencies[i],
+             int(self.popularity[i]))
+            for i in np.flatnonzero(~self._stale)
+        ]
+        rows.extend(row for row in self._overlay.values() if row is not None)
+        return rows
+
+    # ---------------------------
+    # Queries
+    # ---------------------------
+    def search(self, query: str, limit: int = DEFAULT_LIMIT, asset_type: Optional[str] = None) -> List[dict]:
+        """
+        Ranks exact symbol matches first, then symbol prefixes, then assets with a
+        name/exchange word starting with the query, then (for 3+ characters) any
+        symbol/name containing it. Within a tier, more widely held assets come first,
+        then shorter symbols. Only tiers that can still contribute are searched.
+        """
+        query = query.strip()
+        if not query or limit <= 0:
+            return []
+        upper, lower = query.upper(), query.lower()
+        overlay = self._overlay
+        ranked: List[Tuple[int, int, int, str, int]] = []  # (tier, -popularity, len(symbol), symbol, entry or -id)
+
+        lo = bisect_left(self._symbol_keys, upper)
+        exact = bisect_right(self._symbol_keys, upper, lo)
+        hi = bisect_left(self._symbol_keys, upper + _PREFIX_END, exact)
+        taken = set()
+
+        def add(tier, entries):
+            for entry in entries.tolist():
+                if entry not in taken:
+                    taken.add(entry)
+                    ranked.append((tier, -int(self.popularity[entry]), len(self.symbols[entry]), self.symbols[entry], entry))
+
+        add(EXACT_SYMBOL, self._top(self._symbol_entries[lo:exact], limit, asset_type))
+        if len(taken) < limit:
+            add(SYMBOL_PREFIX, self._top(self._symbol_entries[exact:hi], limit, asset_type))
+        if len(taken) < limit:
+            add(WORD_PREFIX, self._word_prefix(lower, limit, asset_type))
+        if len(taken) < limit and len(lower) >= 3:
+            add(SUBSTRING, self._substring(lower, limit, asset_type))
+
+        for asset_id, row in overlay.items():
+            if row is None or (asset_type and row[4] != asset_type):
+                continue
+            tier = self._tier_of(row, upper, lower)
+            if tier is not None:
+                ranked.append((tier, -row[6], len(row[1]), row[1], -asset_id - 1))
+
+        ranked.sort()
+        results, seen = [], set()
+        for _, _, _, _, key in ranked:
+            result = self._row_dict(overlay[-key - 1]) if key < 0 else self._entry_dict(key)
+            if result['id'] in seen:
+                continue
+            seen.add(result['id'])
+            results.append(result)
+            if len(results) == limit:
+                break
+        return results
+
+    def _top(self, entries: np.ndarray, limit: int, asset_type: Optional[str]) -> np.ndarray:
+        if not len(entries):
+            return entries
+        entries = entries[~self._stale[entries]]
+        if asset_type:
+            entries = entries[self.types[entries] == asset_type]
+        if len(entries) > limit:
+            entries = entries[np.argpartition(-self.popularity[entries], limit - 1)[:limit]]
+        return entries
+
+    def _word_prefix(self, lower: str, limit: int, asset_type: Optional[str]) -> np.ndarray:
+        """
+        Most popular entries with a word starting with `lower`. Only the head of each
+        word's posting list is read, widened while filters leave too few results.
+        """
+        lo = bisect_left(self._word_keys, lower)
+        hi = bisect_left(self._word_keys, lower + _PREFIX_END, lo)
+        if lo == hi:
+            return np.empty(0, dtype=np.int64)
+        starts = self._word_starts[lo:hi]
+        lengths = self._word_starts[lo + 1:hi + 1] - starts
+        take = limit * 4
+        while True:
+            heads = np.minimum(lengths, take)
+            # Flat indexes of the first heads[k] postings of every word k
+            offsets = np.repeat(starts - np.cumsum(heads) + heads, heads) + np.arange(heads.sum())
+            top = self._top(np.unique(self._word_postings[offsets]), limit, asset_type)
+            if len(top) >= limit or not (lengths > take).any():
+                return top
+            take *= 4
+
+    def _substring(self, lower: str, limit: int, asset_type: Optional[str]) -> np.ndarray:
+        """
+        Most popular entries whose symbol/name contains `lower`: intersect the two
+        rarest trigram posting lists, then check candidates in popularity order.
+        """
+        codes = np.unique(_trigram_codes(lower.encode('ascii', 'replace')))
+        ranges = sorted(
+            (hi - lo, lo, hi)
+            for lo, hi in zip(np.searchsorted(self._trigram_codes, codes, side='left'),
+                              np.searchsorted(self._trigram_codes, codes, side='right'))
+        )
+        if not ranges or ranges[0][0] == 0:
+            return np.empty(0, dtype=np.int64)
+        candidates = self._trigram_entries[ranges[0][1]:ranges[0][2]]
+        if len(ranges) > 1:
+            member = np.zeros(len(self.ids), dtype=bool)
+            member[self._trigram_entries[ranges[1][1]:ranges[1][2]]] = True
+            candidates = candidates[member[candidates]]
+        candidates = self._top(candidates, TRIGRAM_VERIFY_LIMIT, asset_type)
+        candidates = candidates[np.argsort(-self.popularity[candidates], kind='stable')]
+        matches = []
+        for entry in candidates.tolist():
+            if lower in self._texts[entry]:
+                matches.append(entry)
+                if len(matches) == limit:
+                    break
+        return np.array(matches, dtype=np.int64)
+
+    @staticmethod
+    def _tier_of(row: AssetRow, upper: str, lower: str) -> Optional[int]:
+        symbol = row[1].upper()
+        if symbol == upper:
+            return EXACT_SYMBOL
+        if symbol.startswith(upper):
+            return SYMBOL_PREFIX
+        if any(word.startswith(lower) for word in _WORD.findall(f'{row[2] or ""} {row[3] or ""}'.lower())):
+            return WORD_PREFIX
+        if len(lower) >= 3 and lower in _search_text(row[1], row[2]):
+            return SUBSTRING
+        return None
+
+    def _entry_dict(self, entry: int) -> dict:
+        return {
+            'id': int(self.ids[entry]), 'symbol': self.symbols[entry], 'name': self.names[entry],
+            'exchange': self.exchanges[entry], 'asset_type': self.types[entry], 'currency': self.currencies[entry],
+        }
+
+    @staticmethod
+    def _row_dict(row: AssetRow) -> dict:
+        return {'id': row[0], 'symbol': row[1], 'name': row[2], 'exchange': row[3], 'asset_type': row[4], 'currency': row[5]}
+
+
+def load_asset_rows() -> List[AssetRow]:
+    """Every asset with its popularity (number of open positions), streamed in batches."""
+    holders = (
+        select(Position.asset_id, func.count().label('holders'))
+        .where(Position.quantity != 0)
+        .group_by(Position.asset_id)
+        .subquery()
+    )
+    stmt = (
+        select(Asset.id, Asset.symbol, Asset.name, Asset.exchange, Asset.asset_type, Asset.currency,
+               func.coalesce(holders.c.holders, 0))
+        .outerjoin(holders, holders.c.asset_id == Asset.id)
+        .execution_options(yield_per=LOAD_BATCH_SIZE)
+    )
+    return [tuple(row) for row in db.session.execute(stmt)]
+
+
+class AssetSearch:
+    """
+    Owns the current AssetSearchIndex of one app. Queries never touch the
+    database: the index is built at worker start (warm_asset_search from gunicorn's
+    post_worker_init) or, failing that, on a background thread started by the
+    first query; until it is ready queries answer empty. Later rebuilds also run
+    in the background and swap in when done. A rebuild from the database (fresh
+    popularity, changes made by other workers) happens every
+    ASSET_SEARCH_REFRESH_SECONDS; when the overlay grows past
+    OVERLAY_REBUILD_THRESHOLD the snapshot is rebuilt from memory instead.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.refresh_seconds = app.config.get('ASSET_SEARCH_REFRESH_SECONDS', 600)
+        self.index: Optional[AssetSearchIndex] = None
+        self._lock = threading.Lock()
+        self._rebuilding = False
+        self._missed: Dict[int, Optional[AssetRow]] = {}  # Changes that arrive while a rebuild runs
+
+    @property
+    def ready(self) -> bool:
+        return self.index is not None
+
+    def warm(self) -> None:
+        """Builds the index in the calling thread unless it already exists."""
+        if self.index is not None:
+            return
+        index = AssetSearchIndex(load_asset_rows())
+        with self._lock:
+            if self.index is None:
+                self.index = index
+
+    def search(self, query: str, limit: int = DEFAULT_LIMIT, asset_type: Optional[str] = None) -> List[dict]:
+        index = self.index
+        if index is None:
+            self._rebuild_in_background(from_database=True)
+            return []
+        if time.monotonic() - index.built_at > self.refresh_seconds:
+            self._rebuild_in_background(from_database=True)
+        return index.search(query, limit, asset_type)
+
+    def apply_changes(self, changes: Dict[int, Optional[AssetRow]]) -> None:
+        with self._lock:
+            if self._rebuilding:
+                self._missed.update(changes)
+        index = self.index
+        if index is None:
+            return
+        index.apply_changes(changes)
+        if index.overlay_size > OVERLAY_REBUILD_THRESHOLD:
+            self._rebuild_in_background(from_database=False)
+
+    def _rebuild_in_background(self, from_database: bool) -> None:
+        with self._lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+            self._missed = {}
+        threading.Thread(target=self._rebuild, args=(from_database,), daemon=True, name='asset-search-rebuild').start()
+
+    def _rebuild(self, from_database: bool) -> None:
+        try:
+            if from_database:
+                with self.app.app_context():
+                    try:
+                        rows = load_asset_rows()
+                    finally:
+                        db.session.remove()
+            else:
+                rows = self.index.rows()
+            index = AssetSearchIndex(rows)
+            with self._lock:
+                if self._missed:
+                    index.apply_changes(self._missed)
+                self.index = index
+        except Exception:
+            logger.exception('Asset search index rebuild failed; keeping the previous index')
+            if self.index is not None:
+                self.index.built_at = time.monotonic()  # Don't retry on every query
+        finally:
+            with self._lock:
+                self._rebuilding = False
+                self._missed = {}
+
+
+def get_asset_search() -> AssetSearch:
+    """The app's AssetSearch; see AssetSearch for when its index is built."""
+    search = current_app.extensions.get('asset_search')
+    if search is None:
+        search = current_app.extensions['asset_search'] = AssetSearch(current_app._get_current_object())
+    return search
+
+
+def warm_asset_search(app) -> None:
+    """Builds the index up front (gunicorn post_worker_init), so no query waits for or misses it."""
+    with app.app_context():
+        try:
+            get_asset_search().warm()
+        except Exception:
+            logger.exception('Asset search warm-up failed; it will be built in the background on first use')
+        finally:
+            db.session.remove()
+
+
+# ---------------------------
+# Change Tracking
+# ---------------------------
+# Asset rows flushed in a session are remembered in session.info and handed to
+# the index only once the transaction commits; a rollback discards them.
+@event.listens_for(Session, 'after_flush')
+def _collect_asset_changes(session, flush_context):
+    changes = session.info.setdefault('asset_search_changes', {})
+    for instance in session.new | session.dirty:
+        if isinstance(instance, Asset) and instance.id is not None:
+            changes[instance.id] = (instance.id, instance.symbol, instance.name, instance.exchange,
+                                    instance.asset_type, instance.currency, None)
+    for instance in session.deleted:
+        if isinstance(instance, Asset) and instance.id is not None:
+            changes[instance.id] = None
+
+
+@event.listens_for(Session, 'after_commit')
+def _publish_asset_changes(session):
+    changes = session.info.pop('asset_search_changes', None)
+    if changes and has_app_context():
+        search = current_app.extensions.get('asset_search')
+        if search is not None:
+            search.apply_changes(changes)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_asset_changes(session, previous_transaction):
+    if not session.in_transaction():
+        session.info.pop('asset_search_changes', None)
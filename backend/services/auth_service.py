@@ -0,0 +1,202 @@
+# backend/services/auth_service.py
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Dict, Optional, Tuple
+
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session, make_transient_to_detached
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from .. import db
+from ..metrics import record_cache_lookup, record_password_hash_rejected
+from ..models.user import User
+from .valuation_stream import stream_capacity
+
+_init_lock = threading.Lock()
+
+
+# ---------------------------
+# Password Hashing Pool
+# ---------------------------
+class PasswordHasherBusy(RuntimeError):
+    """Raised when the hashing pool is saturated or a hash does not finish in time; answer 503 and retry."""
+
+
+class PasswordHasher:
+    """
+    Runs werkzeug's PBKDF2/scrypt hashing on a small per-worker thread pool.
+    hashlib releases the GIL while it hashes, so request threads stay free
+    to serve other routes. Admission control caps the hashes queued or
+    running at max_pending: past that, callers are rejected immediately
+    instead of queueing behind a login burst.
+    """
+
+    def __init__(self, workers: int = 2, max_pending: int = 16, timeout: float = 5.0):
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+        self._slots = threading.BoundedSemaphore(max_pending)
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            record_password_hash_rejected()
+            raise PasswordHasherBusy('Too many password checks in progress')
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        # The slot is held until the hash really finishes, even if the caller stops waiting
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            record_password_hash_rejected()
+            raise PasswordHasherBusy('Password check timed out')
+
+    def check(self, user: Optional[User], password: str) -> bool:
+        if user is None or user.password_hash is None:
+            return False
+        return self._run(check_password_hash, user.password_hash, password)
+
+    def set_password(self, user: User, password: str) -> None:
+        user.password_hash = self._run(generate_password_hash, password)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def max_pending_hashes(config) -> int:
+    """
+    PASSWORD_HASH_MAX_PENDING, kept below the worker's request threads: every
+    pending hash holds a request thread while it waits, valuation streams may
+    hold their share, and at least one thread must stay free for other routes
+    for admission control to mean anything.
+    """
+    free = config.get('GUNICORN_THREADS', 64) - stream_capacity(config) - 1
+    return max(1, min(config.get('PASSWORD_HASH_MAX_PENDING', 16), free))
+
+
+def get_password_hasher() -> PasswordHasher:
+    """The worker's hashing pool, created on first use so it never exists in a pre-fork master."""
+    hasher = current_app.extensions.get('password_hasher')
+    if hasher is None:
+        with _init_lock:
+            hasher = current_app.extensions.get('password_hasher')
+            if hasher is None:
+                config = current_app.config
+                hasher = current_app.extensions['password_hasher'] = PasswordHasher(
+                    workers=config.get('PASSWORD_HASH_WORKERS', 2),
+                    max_pending=max_pending_hashes(config),
+                    timeout=config.get('PASSWORD_HASH_TIMEOUT_SECONDS', 5.0),
+                )
+    return hasher
+
+
+# ---------------------------
+# Authenticated User Cache
+# ---------------------------
+class UserCache:
+    """
+    Per-worker LRU of users row snapshots keyed by id, each valid for ttl
+    seconds. Column values are cached rather than ORM instances, which belong
+    to the session of the request that loaded them; a hit is merged into the
+    current session without a query. Commits in this worker that touch a user
+    evict it right away; other workers see the change once the TTL lapses.
+    """
+
+    def __init__(self, ttl: float = 30.0, max_entries: int = 10_000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[int, Tuple[Dict, float]]' = OrderedDict()  # id -> (columns, expires_at)
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> Optional[User]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[1] <= time.monotonic():
+                del self._entries[user_id]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(user_id)
+        record_cache_lookup('user', hits=int(entry is not None), misses=int(entry is None))
+        if entry is None:
+            return None
+        user = User(**entry[0])
+        make_transient_to_detached(user)
+        return db.session.merge(user, load=False)
+
+    def put(self, user: User) -> None:
+        columns = {column.key: getattr(user, column.key) for column in User.__table__.columns}
+        with self._lock:
+            self._entries[user.id] = (columns, time.monotonic() + self.ttl)
+            self._entries.move_to_end(user.id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, *user_ids: int) -> None:
+        with self._lock:
+            for user_id in user_ids:
+                self._entries.pop(user_id, None)
+
+
+def get_user_cache() -> Optional[UserCache]:
+    """The worker's user cache, or None when USER_CACHE_TTL_SECONDS is 0."""
+    cache = current_app.extensions.get('user_cache')
+    if cache is None:
+        ttl = current_app.config.get('USER_CACHE_TTL_SECONDS', 30)
+        if ttl <= 0:
+            return None
+        cache = current_app.extensions['user_cache'] = UserCache(
+            ttl, current_app.config.get('USER_CACHE_MAX_ENTRIES', 10_000)
+        )
+    return cache
+
+
+def load_user(user_id: int) -> Optional[User]:
+    """Flask-Login user loader: the cached snapshot when fresh, otherwise one primary-key lookup."""
+    cache = get_user_cache()
+    if cache is None:
+        return db.session.get(User, user_id)
+    user = cache.get(user_id)
+    if user is None:
+        user = db.session.get(User, user_id)
+        if user is not None:
+            cache.put(user)
+    return user
+
+
+def invalidate_user(user_id: int) -> None:
+    """Evicts the user from this worker's cache (e.g. on logout)."""
+    cache = current_app.extensions.get('user_cache')
+    if cache is not None:
+        cache.invalidate(user_id)
+
+
+# User rows changed in a flush are evicted once the transaction commits, the same
+# way asset_search tracks Asset changes; a rollback just forgets them.
+@event.listens_for(Session, 'after_flush')
+def _collect_user_changes(session, flush_context):
+    changed = session.info.setdefault('user_cache_changes', set())
+    for instance in session.dirty | session.deleted:
+        if isinstance(instance, User) and instance.id is not None:
+            changed.add(instance.id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _evict_changed_users(session):
+    changed = session.info.pop('user_cache_changes', None)
+    if changed and has_app_context():
+        cache = current_app.extensions.get('user_cache')
+        if cache is not None:
+            cache.invalidate(*changed)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_user_changes(session, previous_transaction):
+    if not session.in_transaction():
+        session.info.pop('user_cache_changes', None)
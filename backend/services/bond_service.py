@@ -0,0 +1,249 @@
+# backend/services/bond_service.py
+#
+# Conventions: Bond.coupon_rate is an annual decimal rate (0.045 = 4.5%) paid
+# BOND_COUPON_FREQUENCY times a year on dates stepped back from maturity_date;
+# one unit of a bond has BOND_FACE_VALUE face and last_price is its clean price
+# per unit. NULL coupon_rate means a zero-coupon bond.
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from functools import lru_cache
+from typing import List, Optional, Sequence
+
+import numpy as np
+from flask import current_app
+from sqlalchemy import select
+
+from .. import db
+from ..models.account import Account
+from ..models.asset import Bond
+from ..models.position import Position
+from ..models.transaction import TransactionTypeEnum
+
+DAYS_PER_YEAR = 365.0
+SCHEDULE_YEARS = 100        # How far back from maturity coupon dates are generated
+SCHEDULE_CACHE_SIZE = 4096
+YTM_MAX_ITERATIONS = 100
+YTM_TOLERANCE = 1e-10
+
+
+@dataclass(frozen=True)
+class CouponSchedule:
+    """Every coupon date of a bond (ascending datetime64[D]) and the coupon per unit paid on each."""
+    dates: np.ndarray
+    coupon: float
+    face: float
+
+    def upcoming(self, after: np.datetime64, through: Optional[np.datetime64] = None) -> np.ndarray:
+        """Coupon dates strictly after `after` (and on or before `through`)."""
+        first = np.searchsorted(self.dates, after, side='right')
+        last = len(self.dates) if through is None else np.searchsorted(self.dates, through, side='right')
+        return self.dates[first:last]
+
+    def previous(self, on: np.datetime64) -> Optional[np.datetime64]:
+        index = np.searchsorted(self.dates, on, side='right') - 1
+        return self.dates[index] if index >= 0 else None
+
+
+@lru_cache(maxsize=SCHEDULE_CACHE_SIZE)
+def coupon_schedule(maturity: date, coupon_rate: float, frequency: int, face: float) -> CouponSchedule:
+    """
+    Cached per set of terms rather than per bond id, so edits to a bond never
+    serve a stale schedule and bonds with identical terms share one entry.
+    Dates keep maturity's day of month, clamped to shorter months.
+    """
+    if not coupon_rate:
+        return CouponSchedule(np.array([maturity], dtype='datetime64[D]'), 0.0, face)
+
+    step = 12 // frequency
+    months = np.datetime64(maturity, 'M') - np.arange(SCHEDULE_YEARS * frequency)[::-1] * step
+    month_start = months.astype('datetime64[D]')
+    month_length = ((months + 1).astype('datetime64[D]') - month_start).astype(np.int64)
+    dates = month_start + np.minimum(maturity.day, month_length) - 1
+    dates.setflags(write=False)
+    return CouponSchedule(dates, face * coupon_rate / frequency, face)
+
+
+def _terms():
+    config = current_app.config
+    return int(config.get('BOND_COUPON_FREQUENCY', 2)), float(config.get('BOND_FACE_VALUE', 100))
+
+
+def _schedule_for(maturity: date, coupon_rate: Optional[Decimal]) -> CouponSchedule:
+    frequency, face = _terms()
+    return coupon_schedule(maturity, float(coupon_rate or 0), frequency, face)
+
+
+# ---------------------------
+# Yield / Duration / Convexity
+# ---------------------------
+@dataclass
+class BondAnalytics:
+    """Per-bond results; every array is indexed like bond_ids (NaN when a bond has no price or no yield solves)."""
+    as_of: date
+    bond_ids: List[int]
+    clean_price: np.ndarray
+    accrued_interest: np.ndarray
+    ytm: np.ndarray                 # Annual yield, compounded at the coupon frequency
+    macaulay_duration: np.ndarray   # Years
+    modified_duration: np.ndarray
+    convexity: np.ndarray
+
+    def to_dicts(self) -> List[dict]:
+        def _num(value):
+            return None if np.isnan(value) else round(float(value), 10)
+
+        metrics = ('clean_price', 'accrued_interest', 'ytm', 'macaulay_duration', 'modified_duration', 'convexity')
+        return [
+            dict({'asset_id': bond_id}, **{name: _num(getattr(self, name)[i]) for name in metrics})
+            for i, bond_id in enumerate(self.bond_ids)
+        ]
+
+
+def solve_ytm(dirty_price: np.ndarray, cash_flows: np.ndarray, years: np.ndarray, frequency: int) -> np.ndarray:
+    """
+    Yield solving sum(cf * (1 + y/f) ** (-f * t)) = price for every row at once
+    (rows zero-padded to a common width). Newton steps on the whole batch;
+    rows drop out as they converge and come back NaN if they never do.
+    """
+    rate = np.full(len(cash_flows), 0.05)
+    result = np.full(len(cash_flows), np.nan)
+    done = ~(np.isfinite(dirty_price) & (dirty_price > 0))
+
+    for _ in range(YTM_MAX_ITERATIONS):
+        active = ~done
+        if not active.any():
+            break
+        base = 1 + rate[active][:, None] / frequency
+        cf, t = cash_flows[active], years[active]
+        discount = base ** (-frequency * t)
+        value = (cf * discount).sum(axis=1) - dirty_price[active]
+        derivative = (-t * cf * discount / base).sum(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            step = np.where(derivative != 0, value / derivative, np.nan)
+        new_rate = np.maximum(rate[active] - step, -0.999999 * frequency)
+
+        converged = np.abs(step) < YTM_TOLERANCE
+        failed = ~np.isfinite(new_rate)
+        indices = np.flatnonzero(active)
+        result[indices[converged]] = new_rate[converged]
+        rate[indices] = np.where(failed, rate[indices], new_rate)
+        done[indices[converged | failed]] = True
+    return result
+
+
+def compute_bond_analytics(bond_ids: Optional[Sequence[int]] = None, as_of: Optional[date] = None) -> BondAnalytics:
+    """
+    YTM, durations and convexity for the given bonds, or for every bond held in
+    a non-zero position. One query for terms and prices; cash flows come from the
+    cached schedules and are solved as one padded (bonds x flows) batch.
+    """
+    as_of = as_of or datetime.now(timezone.utc).date()
+    frequency, _ = _terms()
+    stmt = (
+        select(Bond.id, Bond.maturity_date, Bond.coupon_rate, Bond.last_price)
+        .where(Bond.maturity_date > as_of)
+        .order_by(Bond.id)
+    )
+    if bond_ids is None:
+        stmt = stmt.where(Bond.id.in_(select(Position.asset_id).where(Position.quantity != 0)))
+    else:
+        stmt = stmt.where(Bond.id.in_(list(bond_ids)))
+    rows = db.session.execute(stmt).all()
+
+    today = np.datetime64(as_of, 'D')
+    schedules = [_schedule_for(maturity, coupon_rate) for _, maturity, coupon_rate, _ in rows]
+    upcoming = [schedule.upcoming(today) for schedule in schedules]
+    width = max((len(dates) for dates in upcoming), default=0)
+
+    cash_flows = np.zeros((len(rows), width))
+    years = np.zeros((len(rows), width))
+    accrued = np.zeros(len(rows))
+    for i, (schedule, dates) in enumerate(zip(schedules, upcoming)):
+        cash_flows[i, :len(dates)] = schedule.coupon
+        cash_flows[i, len(dates) - 1] += schedule.face
+        years[i, :len(dates)] = (dates - today).astype(np.int64) / DAYS_PER_YEAR
+        previous = schedule.previous(today)
+        if previous is not None and schedule.coupon:
+            period = (dates[0] - previous).astype(np.int64)
+            accrued[i] = schedule.coupon * (today - previous).astype(np.int64) / period
+
+    clean = np.array([np.nan if row[3] is None else float(row[3]) for row in rows])
+    dirty = clean + accrued
+    ytm = solve_ytm(dirty, cash_flows, years, frequency)
+
+    base = 1 + ytm[:, None] / frequency
+    with np.errstate(divide='ignore', invalid='ignore'):
+        present_value = cash_flows * base ** (-frequency * years)
+        macaulay = (years * present_value).sum(axis=1) / dirty
+        convexity = (present_value * years * (years + 1 / frequency)).sum(axis=1) / (dirty * base[:, 0] ** 2)
+    solved = ~np.isnan(ytm)
+
+    return BondAnalytics(
+        as_of=as_of,
+        bond_ids=[row[0] for row in rows],
+        clean_price=clean,
+        accrued_interest=accrued,
+        ytm=ytm,
+        macaulay_duration=np.where(solved, macaulay, np.nan),
+        modified_duration=np.where(solved, macaulay / base[:, 0], np.nan),
+        convexity=np.where(solved, convexity, np.nan),
+    )
+
+
+# ---------------------------
+# Cash Flow Projection
+# ---------------------------
+@dataclass
+class BondCashFlow:
+    pay_date: date
+    account_id: int
+    asset_id: int
+    symbol: str
+    transaction_type: TransactionTypeEnum   # BOND_COUPON or BOND_MATURITY, as the transaction would be booked
+    amount: float
+    currency: str
+
+    def to_dict(self) -> dict:
+        return {
+            'date': self.pay_date.isoformat(),
+            'account_id': self.account_id,
+            'asset_id': self.asset_id,
+            'symbol': self.symbol,
+            'transaction_type': self.transaction_type.name,
+            'amount': round(self.amount, 8),
+            'currency': self.currency,
+        }
+
+
+def project_bond_cash_flows(portfolio_id: int, start: date, end: date) -> List[BondCashFlow]:
+    """
+    Coupons and principal repayments due in [start, end] on the portfolio's open
+    bond positions, ordered by date. A single query loads every holding with
+    its bond terms; the schedules themselves come from the cache.
+    """
+    rows = db.session.execute(
+        select(Position.account_id, Position.quantity, Bond.id, Bond.symbol, Bond.currency,
+               Bond.maturity_date, Bond.coupon_rate)
+        .join(Account, Position.account_id == Account.id)
+        .join(Bond, Position.asset_id == Bond.id)
+        .where(Account.portfolio_id == portfolio_id, Position.quantity != 0, Bond.maturity_date >= start)
+    ).all()
+
+    after = np.datetime64(start, 'D') - 1
+    through = np.datetime64(end, 'D')
+    flows: List[BondCashFlow] = []
+    for account_id, quantity, asset_id, symbol, currency, maturity, coupon_rate in rows:
+        schedule = _schedule_for(maturity, coupon_rate)
+        units = float(quantity)
+        if schedule.coupon:
+            for pay_date in schedule.upcoming(after, through).tolist():
+                flows.append(BondCashFlow(pay_date, account_id, asset_id, symbol, TransactionTypeEnum.BOND_COUPON,
+                                          units * schedule.coupon, currency))
+        if maturity <= end:
+            flows.append(BondCashFlow(maturity, account_id, asset_id, symbol, TransactionTypeEnum.BOND_MATURITY,
+                                      units * schedule.face, currency))
+    flows.sort(key=lambda flow: (flow.pay_date, flow.account_id, flow.asset_id, flow.transaction_type.name))
+    return flows
@@ -0,0 +1,123 @@
+# backend/services/corporate_action_service.py
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import date, datetime, time, timezone
+from decimal import Decimal
+
+from sqlalchemy import DateTime, Numeric, String, insert, literal, select, update
+from sqlalchemy.exc import IntegrityError
+
+from .. import db
+from ..models.asset import Asset
+from ..models.corporate_action import CorporateAction
+from ..models.lot import Lot
+from ..models.position import Position
+from ..models.transaction import Transaction, TransactionTypeEnum
+
+# Both scale every holding by a ratio and spread the existing cost basis over the new share count
+CORPORATE_ACTION_TYPES = frozenset({TransactionTypeEnum.STOCK_SPLIT, TransactionTypeEnum.DIVIDEND_STOCK})
+
+
+class CorporateActionError(ValueError):
+    """Raised for an invalid action, or one that conflicts with an action already applied."""
+
+
+@dataclass
+class CorporateActionResult:
+    action_id: int
+    applied: bool           # False when the action had already been applied (e.g. a retry)
+    positions_affected: int
+    lots_affected: int
+
+
+def _existing_result(action: CorporateAction, ratio: Decimal) -> CorporateActionResult:
+    if action.ratio != ratio:
+        raise CorporateActionError(
+            f'{action.action_type.name} for asset {action.asset_id} on {action.effective_date} '
+            f'was already applied with ratio {action.ratio}'
+        )
+    return CorporateActionResult(action.id, False, action.positions_affected, action.lots_affected)
+
+
+def apply_corporate_action(asset_id: int, action_type: TransactionTypeEnum, ratio: Decimal,
+                           effective_date: date) -> CorporateActionResult:
+    """
+    Applies a split (ratio 2 for 2-for-1, 0.1 for 1-for-10) or stock dividend
+    (ratio 1.05 for 5%) to every holding of the asset in three set-based
+    statements: one INSERT ... SELECT writes a STOCK_SPLIT/DIVIDEND_STOCK
+    transaction carrying the share delta for each open position, then one UPDATE
+    scales positions and one scales open lots (cost per unit divided, so total
+    cost is unchanged). Run it on the ex-date, before post-action trades are booked.
+
+    The corporate_actions row is written first under a unique key, so a retry
+    (or a concurrent duplicate) is reported as already applied instead of
+    scaling holdings twice. Runs inside the caller's transaction; the caller commits.
+    """
+    if action_type not in CORPORATE_ACTION_TYPES:
+        raise CorporateActionError(f'Unsupported corporate action: {action_type.name}')
+    ratio = Decimal(ratio)
+    if ratio <= 0 or ratio == 1:
+        raise CorporateActionError('Ratio must be positive and different from 1')
+    if action_type is TransactionTypeEnum.DIVIDEND_STOCK and ratio < 1:
+        raise CorporateActionError('A stock dividend ratio must be greater than 1')
+
+    key = (CorporateAction.asset_id == asset_id, CorporateAction.action_type == action_type,
+           CorporateAction.effective_date == effective_date)
+    existing = db.session.execute(select(CorporateAction).where(*key)).scalar_one_or_none()
+    if existing is not None:
+        return _existing_result(existing, ratio)
+
+    asset = db.session.get(Asset, asset_id)
+    if asset is None:
+        raise CorporateActionError(f'Asset {asset_id} not found')
+
+    action = CorporateAction(asset_id=asset_id, action_type=action_type, effective_date=effective_date, ratio=ratio)
+    try:
+        with db.session.begin_nested():
+            db.session.add(action)
+    except IntegrityError:
+        # Another worker applied the same action between our check and insert
+        return _existing_result(db.session.execute(select(CorporateAction).where(*key)).scalar_one(), ratio)
+
+    quantity_type = Position.__table__.c.quantity.type
+    delta = Position.quantity * literal(ratio - 1, Numeric(24, 8))
+    label = 'split' if action_type is TransactionTypeEnum.STOCK_SPLIT else 'stock dividend'
+    transactions = Transaction.__table__
+    inserted = db.session.execute(
+        insert(transactions).from_select(
+            ['account_id', 'asset_id', 'transaction_type', 'transaction_time', 'quantity', 'currency', 'description'],
+            select(
+                Position.account_id,
+                Position.asset_id,
+                literal(action_type, transactions.c.transaction_type.type),
+                literal(datetime.combine(effective_date, time.min, tzinfo=timezone.utc), DateTime(timezone=True)),
+                delta.cast(quantity_type),
+                literal(asset.currency, String(3)),
+                literal(f'{format(ratio.normalize(), "f")}x {label} (corporate action #{action.id})', String()),
+            )
+            .where(Position.asset_id == asset_id, Position.quantity != 0)
+            .order_by(Position.account_id),
+        )
+    )
+    db.session.execute(
+        update(Position)
+        .where(Position.asset_id == asset_id, Position.quantity != 0)
+        .values(quantity=Position.quantity + delta, updated_at=datetime.now(timezone.utc))
+        .execution_options(synchronize_session=False)
+    )
+    scaled = db.session.execute(
+        update(Lot)
+        .where(Lot.asset_id == asset_id, Lot.is_open.is_(True))
+        .values(
+            purchase_quantity=Lot.purchase_quantity * ratio,
+            quantity_remaining=Lot.quantity_remaining * ratio,
+            cost_basis_per_unit=Lot.cost_basis_per_unit / ratio,
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+    action.positions_affected = inserted.rowcount
+    action.lots_affected = scaled.rowcount
+    db.session.flush()
+    return CorporateActionResult(action.id, True, action.positions_affected, action.lots_affected)
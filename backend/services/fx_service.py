@@ -0,0 +1,229 @@
+# backend/services/fx_service.py
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from flask import current_app
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from .. import db
+from ..metrics import record_cache_lookup
+from ..models.fx_rate import FxRate
+
+# Currencies used to derive pairs that have no direct quote (A -> USD -> B, A -> EUR -> B)
+PIVOT_CURRENCIES = ('USD', 'EUR')
+MAX_CACHED_DAYS = 64
+
+
+class CrossRateMatrix:
+    """
+    N x N matrix for one day where matrix[i, j] is the number of units of
+    currencies[j] per unit of currencies[i]; NaN where no path exists.
+    """
+
+    def __init__(self, day: date, currencies: List[str], matrix: np.ndarray, complete: bool = True):
+        self.day = day
+        self.currencies = currencies
+        self.index = {currency: i for i, currency in enumerate(currencies)}
+        self.matrix = matrix
+        self.complete = complete  # Every pair was quoted on `day` itself (nothing missing or forward-filled)
+        self.loaded_at = time.monotonic()
+
+    @classmethod
+    def from_quotes(cls, day: date, quotes: Iterable[Tuple[str, str, float]], complete: bool = True) -> 'CrossRateMatrix':
+        quotes = list(quotes)
+        currencies = sorted({c for base, quote, _ in quotes for c in (base, quote)} | set(PIVOT_CURRENCIES))
+        index = {currency: i for i, currency in enumerate(currencies)}
+        size = len(currencies)
+        matrix = np.full((size, size), np.nan)
+        np.fill_diagonal(matrix, 1.0)
+
+        # Inverses first so an explicitly quoted reverse pair always wins
+        for base, quote, rate in quotes:
+            if rate:
+                matrix[index[quote], index[base]] = 1.0 / rate
+        for base, quote, rate in quotes:
+            matrix[index[base], index[quote]] = rate
+
+        # Triangulate: fill each missing cell through a pivot; two rounds allow A -> USD -> EUR -> B
+        for _ in range(2):
+            for pivot in PIVOT_CURRENCIES:
+                p = index[pivot]
+                via = np.outer(matrix[:, p], matrix[p, :])
+                missing = np.isnan(matrix)
+                matrix[missing] = via[missing]
+        return cls(day, currencies, matrix, complete)
+
+    def rate(self, from_currency: str, to_currency: str) -> float:
+        if from_currency == to_currency:
+            return 1.0
+        i, j = self.index.get(from_currency), self.index.get(to_currency)
+        if i is None or j is None:
+            return float('nan')
+        return float(self.matrix[i, j])
+
+    def rates_to(self, currencies: Sequence[str], to_currency: str) -> np.ndarray:
+        """Vector of units of to_currency per unit of each currency (NaN when unknown)."""
+        j = self.index.get(to_currency)
+        rows = np.array([self.index.get(c, -1) for c in currencies], dtype=np.int64)
+        result = np.full(len(rows), np.nan)
+        if j is not None:
+            known = rows >= 0
+            result[known] = self.matrix[rows[known], j]
+        same = np.array([c == to_currency for c in currencies], dtype=bool)
+        result[same] = 1.0
+        return result
+
+
+class FxRateCache:
+    """
+    In-process cache of one CrossRateMatrix per day bucket. A past day whose every
+    pair was quoted on that day never changes once loaded. The current day, and any
+    day built from no quotes or from rates forward-filled from earlier days, is
+    reloaded after FX_CACHE_TTL_SECONDS, so late-arriving rates are picked up.
+    After warm-up, conversions make no database round-trips.
+    """
+
+    def __init__(self, max_days: int = MAX_CACHED_DAYS):
+        self.max_days = max_days
+        self._matrices: 'OrderedDict[date, CrossRateMatrix]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def matrix_for(self, day: Optional[date] = None) -> CrossRateMatrix:
+        day = day or datetime.now(timezone.utc).date()
+        with self._lock:
+            cached = self._matrices.get(day)
+            if cached is not None and not self._is_stale(cached):
+                self._matrices.move_to_end(day)
+                record_cache_lookup('fx', hits=1)
+                return cached
+        record_cache_lookup('fx', misses=1)
+
+        matrix = CrossRateMatrix.from_quotes(day, *self._load_quotes(day))
+        with self._lock:
+            self._matrices[day] = matrix
+            self._matrices.move_to_end(day)
+            while len(self._matrices) > self.max_days:
+                self._matrices.popitem(last=False)
+        return matrix
+
+    def rate(self, from_currency: str, to_currency: str, day: Optional[date] = None) -> float:
+        if from_currency == to_currency:
+            return 1.0
+        return self.matrix_for(day).rate(from_currency, to_currency)
+
+    def rates_to(self, currencies: Sequence[str], to_currency: str, day: Optional[date] = None) -> np.ndarray:
+        return self.matrix_for(day).rates_to(currencies, to_currency)
+
+    def convert(self, amounts, currencies: Sequence[str], to_currency: str, day: Optional[date] = None) -> np.ndarray:
+        """Converts an array of amounts, each in its own currency, to to_currency in one pass."""
+        amounts = np.asarray(amounts, dtype=float)
+        unique, inverse = np.unique(np.asarray(currencies, dtype=str), return_inverse=True)
+        return amounts * self.rates_to(list(unique), to_currency, day)[inverse]
+
+    def invalidate(self, day: Optional[date] = None) -> None:
+        with self._lock:
+            if day is None:
+                self._matrices.clear()
+            else:
+                self._matrices.pop(day, None)
+
+    def _is_stale(self, matrix: CrossRateMatrix) -> bool:
+        if matrix.complete and matrix.day < datetime.now(timezone.utc).date():
+            return False
+        ttl = current_app.config.get('FX_CACHE_TTL_SECONDS', 900)
+        return time.monotonic() - matrix.loaded_at > ttl
+
+    @staticmethod
+    def _load_quotes(day: date) -> Tuple[List[Tuple[str, str, float]], bool]:
+        """
+        Latest quote per pair within the lookback window ending on `day` (one query),
+        and whether every pair was quoted on `day` itself.
+        """
+        lookback = current_app.config.get('FX_LOOKBACK_DAYS', 7)
+        stmt = (
+            select(FxRate.base_currency, FxRate.quote_currency, FxRate.rate, FxRate.rate_date)
+            .where(FxRate.rate_date <= day, FxRate.rate_date > day - timedelta(days=lookback))
+            .order_by(FxRate.rate_date)
+        )
+        latest: Dict[Tuple[str, str], Tuple[float, date]] = {}
+        for base, quote, rate, rate_date in db.session.execute(stmt):
+            latest[(base, quote)] = (float(rate), rate_date)  # Later dates overwrite earlier ones
+        quotes = [(base, quote, rate) for (base, quote), (rate, _) in latest.items()]
+        complete = bool(latest) and all(rate_date == day for _, rate_date in latest.values())
+        return quotes, complete
+
+
+# Shared per-process cache
+fx_cache = FxRateCache()
+
+
+def fx_rates_to(currencies: Sequence[str], to_currency: str) -> np.ndarray:
+    """FX provider for the valuation engine: today's rates from the shared cache."""
+    return fx_cache.rates_to(currencies, to_currency)
+
+
+def rates_over(currencies: Sequence[str], to_currency: str, days: Sequence[date]) -> np.ndarray:
+    """
+    (currency x day) matrix of units of to_currency per unit of each currency over
+    ascending `days`, NaN where unknown. Every quote the range needs is read in one
+    query and walked forward day by day, so a multi-year backfill neither queries per
+    day nor churns the shared per-day cache.
+    """
+    result = np.full((len(currencies), len(days)), np.nan)
+    if not len(days):
+        return result
+    lookback = timedelta(days=current_app.config.get('FX_LOOKBACK_DAYS', 7))
+    rows = db.session.execute(
+        select(FxRate.rate_date, FxRate.base_currency, FxRate.quote_currency, FxRate.rate)
+        .where(FxRate.rate_date > days[0] - lookback, FxRate.rate_date <= days[-1])
+        .order_by(FxRate.rate_date)
+    ).all()
+
+    latest: Dict[Tuple[str, str], Tuple[float, date]] = {}
+    position = 0
+    quotes, matrix = None, None
+    for column, day in enumerate(days):
+        while position < len(rows) and rows[position][0] <= day:
+            rate_date, base, quote, rate = rows[position]
+            latest[(base, quote)] = (float(rate), rate_date)
+            position += 1
+        day_quotes = sorted((base, quote, rate) for (base, quote), (rate, rate_date) in latest.items()
+                            if rate_date > day - lookback)
+        if day_quotes != quotes:  # Days without new quotes (weekends, holidays) reuse the previous matrix
+            quotes, matrix = day_quotes, CrossRateMatrix.from_quotes(day, day_quotes)
+        result[:, column] = matrix.rates_to(currencies, to_currency)
+    return result
+
+
+def store_rates(quotes: Iterable[Tuple[date, str, str, float]]) -> int:
+    """
+    Upserts (rate_date, base, quote, rate) rows in one statement and drops the
+    affected day buckets from this process's cache (other workers see today's
+    rates after the TTL). The caller commits.
+    """
+    now = datetime.now(timezone.utc)
+    rows = [
+        {'rate_date': day, 'base_currency': base.upper(), 'quote_currency': quote.upper(), 'rate': rate, 'created_at': now}
+        for day, base, quote, rate in quotes
+    ]
+    if not rows:
+        return 0
+    table = FxRate.__table__
+    dialect = db.session.get_bind().dialect.name
+    dialect_insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+    stmt = dialect_insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.rate_date, table.c.base_currency, table.c.quote_currency],
+        set_={'rate': stmt.excluded.rate, 'created_at': stmt.excluded.created_at},
+    )
+    db.session.execute(stmt, rows)
+    for day in {row['rate_date'] for row in rows}:
+        fx_cache.invalidate(day)
+    return len(rows)
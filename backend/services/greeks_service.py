@@ -0,0 +1,203 @@
+# backend/services/greeks_service.py
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass, field
+from datetime import date, datetime, timezone
+from typing import Dict, List, Optional
+
+import numpy as np
+from flask import current_app
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.orm import aliased
+
+from .. import db
+from ..models.asset import Asset, OptionContract, OptionTypeEnum
+
+DAYS_PER_YEAR = 365.0
+IV_LOWER_BOUND = 1e-4
+IV_UPPER_BOUND = 5.0        # 500% vol; prices above that are treated as unsolvable
+IV_PRICE_TOLERANCE = 1e-8
+IV_MAX_ITERATIONS = 100
+GREEK_LIMIT = 99.99999999   # Numeric(10, 8) columns
+
+# erfc as rational approximations (W. J. Cody's form, coefficients from Cephes ndtr.c),
+# accurate to double precision: erf(x) = x T(x^2) / U(x^2) below |x| = 1, and
+# erfc(|x|) = exp(-x^2) P(|x|) / Q(|x|) below 8 and exp(-x^2) R(|x|) / S(|x|) beyond.
+# Highest-order coefficient first, as np.polyval expects.
+_ERF_T = np.array([9.60497373987051638749e0, 9.00260197203842689217e1, 2.23200534594684319226e3,
+                   7.00332514112805075473e3, 5.55923013010394962768e4])
+_ERF_U = np.array([1.0, 3.35617141647503099647e1, 5.21357949780152679795e2, 4.59432382970980127987e3,
+                   2.26290000613890934246e4, 4.92673942608635921086e4])
+_ERFC_P = np.array([2.46196981473530512524e-10, 5.64189564831068821977e-1, 7.46321056442269912687e0,
+                    4.86371970985681366614e1, 1.96520832956077098242e2, 5.26445194995477358631e2,
+                    9.34528527171957607540e2, 1.02755188689515710272e3, 5.57535335369399327526e2])
+_ERFC_Q = np.array([1.0, 1.32281951154744992508e1, 8.67072140885989742329e1, 3.54937778887819891062e2,
+                    9.75708501743205489753e2, 1.82390916687909736289e3, 2.24633760818710981792e3,
+                    1.65666309194161350182e3, 5.57535340817727675546e2])
+_ERFC_R = np.array([5.64189583547755073984e-1, 1.27536670759978104416e0, 5.01905042251180477414e0,
+                    6.16021097993053585195e0, 7.40974269950448939160e0, 2.97886665372100240670e0])
+_ERFC_S = np.array([1.0, 2.26052863220117276590e0, 9.39603524938001434673e0, 1.20489539808096656605e1,
+                    1.70814450747565897222e1, 9.60896809063285878198e0, 3.36907645100081516050e0])
+_ERFC_CUTOFF = 40.0         # erfc underflows to 0 long before this; clipping keeps the polynomials finite at inf
+
+
+def erfc(x: np.ndarray) -> np.ndarray:
+    """Complementary error function on float64 arrays."""
+    x = np.asarray(x, dtype=float)
+    a = np.minimum(np.abs(x), _ERFC_CUTOFF)
+    z = a * a
+    near_zero = 1.0 - np.sign(x) * a * np.polyval(_ERF_T, z) / np.polyval(_ERF_U, z)
+    tail = np.exp(-z) * np.where(a < 8.0, np.polyval(_ERFC_P, a) / np.polyval(_ERFC_Q, a),
+                                 np.polyval(_ERFC_R, a) / np.polyval(_ERFC_S, a))
+    return np.where(a < 1.0, near_zero, np.where(x < 0, 2.0 - tail, tail))
+
+
+def norm_cdf(x: np.ndarray) -> np.ndarray:
+    # Through erfc rather than 1 + erf so far-OTM tails keep their relative precision
+    return 0.5 * erfc(-np.asarray(x, dtype=float) / math.sqrt(2.0))
+
+
+def norm_pdf(x: np.ndarray) -> np.ndarray:
+    return np.exp(-0.5 * x * x) / math.sqrt(2.0 * math.pi)
+
+
+def _d1_d2(spot, strike, years, rate, sigma):
+    sqrt_t = np.sqrt(years)
+    d1 = (np.log(spot / strike) + (rate + 0.5 * sigma * sigma) * years) / (sigma * sqrt_t)
+    return d1, d1 - sigma * sqrt_t
+
+
+def black_scholes_price(spot, strike, years, rate, sigma, is_call) -> np.ndarray:
+    """European option price (no dividends) for arrays of contracts."""
+    d1, d2 = _d1_d2(spot, strike, years, rate, sigma)
+    discount = strike * np.exp(-rate * years)
+    call = spot * norm_cdf(d1) - discount * norm_cdf(d2)
+    put = discount * norm_cdf(-d2) - spot * norm_cdf(-d1)
+    return np.where(is_call, call, put)
+
+
+def implied_volatility(price, spot, strike, years, rate, is_call) -> np.ndarray:
+    """
+    Vectorized implied volatility: Newton steps on the whole batch, kept inside a
+    per-contract [low, high] bracket that tightens every iteration, falling back
+    to bisection where Newton would leave it (deep ITM/OTM, tiny vega). NaN where
+    the price is outside no-arbitrage bounds or no volatility in range fits.
+    """
+    price, spot, strike, years = (np.asarray(a, dtype=float) for a in (price, spot, strike, years))
+    discount = strike * np.exp(-rate * years)
+    lower_bound = np.where(is_call, np.maximum(spot - discount, 0.0), np.maximum(discount - spot, 0.0))
+    upper_bound = np.where(is_call, spot, discount)
+    valid = (years > 0) & (spot > 0) & (strike > 0) & (price > lower_bound) & (price < upper_bound)
+
+    # Inputs for invalid rows are replaced by a harmless dummy contract so the math stays finite
+    safe = lambda a, fill: np.where(valid, a, fill)
+    price, spot, strike, years = safe(price, 1.0), safe(spot, 100.0), safe(strike, 100.0), safe(years, 1.0)
+
+    low = np.full(price.shape, IV_LOWER_BOUND)
+    high = np.full(price.shape, IV_UPPER_BOUND)
+    sigma = np.clip(np.sqrt(2 * math.pi / years) * price / spot, IV_LOWER_BOUND, IV_UPPER_BOUND)
+    converged = ~valid
+    for _ in range(IV_MAX_ITERATIONS):
+        diff = black_scholes_price(spot, strike, years, rate, sigma, is_call) - price
+        converged |= np.abs(diff) < IV_PRICE_TOLERANCE
+        if converged.all():
+            break
+        # Price rises with volatility, so the sign of the error tells which side the root is on
+        high = np.where(diff > 0, sigma, high)
+        low = np.where(diff < 0, sigma, low)
+        d1, _ = _d1_d2(spot, strike, years, rate, sigma)
+        vega = spot * norm_pdf(d1) * np.sqrt(years)
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            newton = sigma - diff / vega
+        in_bracket = (vega > 1e-12) & (newton > low) & (newton < high)
+        sigma = np.where(converged, sigma, np.where(in_bracket, newton, 0.5 * (low + high)))
+
+    return np.where(valid & converged, sigma, np.nan)
+
+
+def greeks(spot, strike, years, rate, sigma, is_call) -> Dict[str, np.ndarray]:
+    """Delta, gamma, theta (per calendar day) and vega (per 1 vol point) for arrays of contracts."""
+    d1, d2 = _d1_d2(spot, strike, years, rate, sigma)
+    pdf = norm_pdf(d1)
+    sqrt_t = np.sqrt(years)
+    discount = strike * np.exp(-rate * years)
+    decay = -spot * pdf * sigma / (2 * sqrt_t)
+    call_theta = decay - rate * discount * norm_cdf(d2)
+    put_theta = decay + rate * discount * norm_cdf(-d2)
+    return {
+        'delta': np.where(is_call, norm_cdf(d1), norm_cdf(d1) - 1.0),
+        'gamma': pdf / (spot * sigma * sqrt_t),
+        'theta': np.where(is_call, call_theta, put_theta) / DAYS_PER_YEAR,
+        'vega': spot * pdf * sqrt_t / 100.0,
+    }
+
+
+@dataclass
+class GreeksResult:
+    requested: int = 0
+    updated: int = 0
+    missing_prices: List[int] = field(default_factory=list)  # Contracts lacking an option or underlying price
+    unsolved: List[int] = field(default_factory=list)        # Prices outside no-arbitrage bounds / vol range
+
+
+def refresh_greeks(as_of: Optional[date] = None, risk_free_rate: Optional[float] = None) -> GreeksResult:
+    """
+    Recomputes implied volatility and greeks for every unexpired option contract.
+    One query loads contracts with their own and their underlying's last price,
+    the math runs on arrays, and results are written back as one executemany
+    UPDATE of option_contracts; contracts without prices or an implied
+    volatility get NULL greeks. The caller commits.
+    """
+    as_of = as_of or datetime.now(timezone.utc).date()
+    rate = current_app.config.get('OPTIONS_RISK_FREE_RATE', 0.04) if risk_free_rate is None else risk_free_rate
+
+    underlying = aliased(Asset)
+    rows = db.session.execute(
+        select(OptionContract.id, OptionContract.option_type, OptionContract.strike_price,
+               OptionContract.expiration_date, OptionContract.last_price, underlying.last_price)
+        .join(underlying, OptionContract.underlying_asset_id == underlying.id)
+        .where(OptionContract.expiration_date >= as_of)
+        .order_by(OptionContract.id)
+    ).all()
+
+    result = GreeksResult(requested=len(rows))
+    if not rows:
+        return result
+
+    count = len(rows)
+    ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=count)
+    is_call = np.fromiter((row[1] == OptionTypeEnum.CALL for row in rows), dtype=bool, count=count)
+    strike = np.fromiter((row[2] for row in rows), dtype=float, count=count)
+    # Contracts expiring today still carry a few hours of time value; floor at a quarter day
+    years = np.fromiter((max((row[3] - as_of).days, 0.25) for row in rows), dtype=float, count=count) / DAYS_PER_YEAR
+    price = np.fromiter((np.nan if row[4] is None else row[4] for row in rows), dtype=float, count=count)
+    spot = np.fromiter((np.nan if row[5] is None else row[5] for row in rows), dtype=float, count=count)
+
+    priced = ~np.isnan(price) & ~np.isnan(spot)
+    result.missing_prices = ids[~priced].tolist()
+
+    sigma = implied_volatility(np.where(priced, price, 0.0), np.where(priced, spot, 0.0), strike, years, rate, is_call)
+    solved = priced & ~np.isnan(sigma)
+    result.unsolved = ids[priced & ~solved].tolist()
+
+    names = ('delta', 'gamma', 'theta', 'vega', 'implied_volatility')
+    params = []
+    if solved.any():
+        values = greeks(spot[solved], strike[solved], years[solved], rate, sigma[solved], is_call[solved])
+        values['implied_volatility'] = sigma[solved]
+        values = {name: np.round(np.clip(array, -GREEK_LIMIT, GREEK_LIMIT), 8) for name, array in values.items()}
+        params = [
+            dict({'b_id': int(asset_id)}, **{name: float(values[name][i]) for name in names})
+            for i, asset_id in enumerate(ids[solved])
+        ]
+    # Greeks of a contract that no longer prices (or solves) would be stale; clear them
+    params.extend(dict({'b_id': int(asset_id)}, **dict.fromkeys(names)) for asset_id in ids[~solved])
+
+    table = OptionContract.__table__
+    db.session.execute(
+        update(table).where(table.c.id == bindparam('b_id')).values({name: bindparam(name) for name in names}),
+        params,
+    )
+    result.updated = int(solved.sum())
+    return result
@@ -0,0 +1,646 @@
+# backend/services/import_service.py
+from __future__ import annotations
+
+import csv
+import io
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from decimal import Decimal, InvalidOperation
+from typing import Dict, Iterator, List, Optional, Sequence, TextIO, Tuple
+
+from sqlalchemy import insert, select, text, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import SQLAlchemyError
+
+from .. import db
+from ..models.account import Account
+from ..models.asset import Asset
+from ..models.lot import Lot
+from ..models.transaction import Transaction, TransactionTypeEnum
+from .corporate_action_service import CORPORATE_ACTION_TYPES
+from .portfolio_service import (
+    LOT_CLOSING_TYPES, LotMatchResult, LotMatchingMethod, SellOrder,
+    apply_position_deltas, match_sells, position_deltas,
+)
+
+DEFAULT_BATCH_SIZE = 5000
+COST_BASIS_QUANTUM = Decimal('0.00000001')  # Matches Lot.cost_basis_per_unit scale
+STAGING_TABLE = 'import_transactions_staging'  # Per-connection temp table used by the COPY path
+
+# Transaction types that open a new tax lot when imported
+LOT_OPENING_TYPES = frozenset({TransactionTypeEnum.BUY, TransactionTypeEnum.OPTION_BUY})
+
+# Transaction types that must reference an asset
+ASSET_REQUIRED_TYPES = frozenset({
+    TransactionTypeEnum.BUY,
+    TransactionTypeEnum.SELL,
+    TransactionTypeEnum.OPTION_BUY,
+    TransactionTypeEnum.OPTION_SELL,
+    TransactionTypeEnum.OPTION_EXPIRE,
+    TransactionTypeEnum.OPTION_ASSIGN,
+    TransactionTypeEnum.BOND_COUPON,
+    TransactionTypeEnum.BOND_MATURITY,
+})
+
+# Transaction types that must carry a quantity
+QUANTITY_REQUIRED_TYPES = frozenset({
+    TransactionTypeEnum.BUY,
+    TransactionTypeEnum.SELL,
+    TransactionTypeEnum.OPTION_BUY,
+    TransactionTypeEnum.OPTION_SELL,
+})
+
+# Canonical field -> header names used by the brokers we have seen (compared lowercased)
+COLUMN_ALIASES: Dict[str, Tuple[str, ...]] = {
+    'transaction_time': ('transaction_time', 'date', 'datetime', 'time', 'trade date', 'trade_date'),
+    'transaction_type': ('transaction_type', 'type', 'action', 'activity'),
+    'symbol': ('symbol', 'ticker', 'instrument'),
+    'exchange': ('exchange', 'market'),
+    'quantity': ('quantity', 'qty', 'shares', 'units'),
+    'price_per_unit': ('price_per_unit', 'price', 'unit price', 'unit_price'),
+    'commission': ('commission', 'commissions'),
+    'fees': ('fees', 'fee'),
+    'currency': ('currency', 'ccy'),
+    'strategy_tag': ('strategy_tag', 'strategy', 'tag'),
+    'description': ('description', 'memo', 'notes'),
+}
+REQUIRED_COLUMNS = ('transaction_time', 'transaction_type')
+
+# Broker wording -> TransactionTypeEnum
+TYPE_ALIASES: Dict[str, TransactionTypeEnum] = {
+    'BOUGHT': TransactionTypeEnum.BUY,
+    'PURCHASE': TransactionTypeEnum.BUY,
+    'SOLD': TransactionTypeEnum.SELL,
+    'SALE': TransactionTypeEnum.SELL,
+    'DIVIDEND': TransactionTypeEnum.DIVIDEND_CASH,
+    'DIV': TransactionTypeEnum.DIVIDEND_CASH,
+    'SPLIT': TransactionTypeEnum.STOCK_SPLIT,
+    'WITHDRAW': TransactionTypeEnum.WITHDRAWAL,
+    'FEES': TransactionTypeEnum.FEE,
+    'COUPON': TransactionTypeEnum.BOND_COUPON,
+}
+
+DATE_FORMATS = ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d', '%m/%d/%Y %H:%M:%S', '%m/%d/%Y', '%d.%m.%Y')
+
+
+# ---------------------------
+# Errors
+# ---------------------------
+class ImportFormatError(ValueError):
+    """Raised when the file as a whole cannot be imported (e.g. missing header columns)."""
+
+
+class RowError(ValueError):
+    """Raised for a single bad row; the import reports it and carries on."""
+
+
+# ---------------------------
+# Row Parsing
+# ---------------------------
+def resolve_columns(fieldnames: Optional[Sequence[str]]) -> Dict[str, str]:
+    """Maps canonical field names to the actual CSV header names."""
+    if not fieldnames:
+        raise ImportFormatError('CSV file has no header row')
+    by_lower = {name.strip().lower(): name for name in fieldnames if name}
+    columns = {}
+    for field, aliases in COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in by_lower:
+                columns[field] = by_lower[alias]
+                break
+    missing = [field for field in REQUIRED_COLUMNS if field not in columns]
+    if missing:
+        raise ImportFormatError(f"CSV file is missing required columns: {', '.join(missing)}")
+    return columns
+
+
+def _clean(raw: dict, columns: Dict[str, str], field: str) -> Optional[str]:
+    header = columns.get(field)
+    if header is None:
+        return None
+    value = raw.get(header)
+    if value is None:
+        return None
+    value = value.strip()
+    return value or None
+
+
+def parse_decimal(value: Optional[str], field: str) -> Optional[Decimal]:
+    if value is None:
+        return None
+    cleaned = value.replace(',', '')
+    negative = cleaned.startswith('(') and cleaned.endswith(')')
+    if negative:
+        cleaned = cleaned[1:-1]
+    try:
+        number = Decimal(cleaned)
+    except InvalidOperation:
+        raise RowError(f'Invalid {field}: {value!r}')
+    if not number.is_finite():
+        raise RowError(f'Invalid {field}: {value!r}')
+    return -number if negative else number
+
+
+def parse_datetime(value: Optional[str]) -> datetime:
+    if value is None:
+        raise RowError('Missing transaction time')
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        for fmt in DATE_FORMATS:
+            try:
+                parsed = datetime.strptime(value, fmt)
+                break
+            except ValueError:
+                continue
+        else:
+            raise RowError(f'Invalid transaction time: {value!r}')
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def parse_transaction_type(value: Optional[str]) -> TransactionTypeEnum:
+    if value is None:
+        raise RowError('Missing transaction type')
+    key = value.strip().upper().replace(' ', '_').replace('-', '_')
+    if key in TransactionTypeEnum.__members__:
+        return TransactionTypeEnum[key]
+    if key in TYPE_ALIASES:
+        return TYPE_ALIASES[key]
+    raise RowError(f'Unknown transaction type: {value!r}')
+
+
+def parse_row(raw: dict, columns: Dict[str, str]) -> dict:
+    """Parses one CSV record into a dict of typed values (the asset is resolved later)."""
+    transaction_type = parse_transaction_type(_clean(raw, columns, 'transaction_type'))
+    if transaction_type in CORPORATE_ACTION_TYPES:
+        # A broker line only carries one account's share delta: booking it would move the
+        # position but not the lots, and nothing would stop the action being applied twice
+        raise RowError(f'{transaction_type.name} lines are not imported; apply the action once with '
+                       f'`flask positions corporate-action` so positions and lots are scaled together')
+    symbol = _clean(raw, columns, 'symbol')
+    quantity = parse_decimal(_clean(raw, columns, 'quantity'), 'quantity')
+    price = parse_decimal(_clean(raw, columns, 'price_per_unit'), 'price')
+
+    if transaction_type in ASSET_REQUIRED_TYPES and symbol is None:
+        raise RowError(f'{transaction_type.name} requires a symbol')
+    if transaction_type in QUANTITY_REQUIRED_TYPES and not quantity:
+        raise RowError(f'{transaction_type.name} requires a non-zero quantity')
+    if transaction_type in LOT_OPENING_TYPES and price is None:
+        raise RowError(f'{transaction_type.name} requires a price')
+    if quantity is not None and transaction_type in QUANTITY_REQUIRED_TYPES:
+        # Brokers disagree on the sign of sells; the type carries the direction
+        quantity = abs(quantity)
+
+    currency = _clean(raw, columns, 'currency')
+    if currency is not None and len(currency) != 3:
+        raise RowError(f'Invalid currency code: {currency!r}')
+
+    return {
+        'transaction_type': transaction_type,
+        'transaction_time': parse_datetime(_clean(raw, columns, 'transaction_time')),
+        'symbol': symbol.upper() if symbol else None,
+        'exchange': _clean(raw, columns, 'exchange'),
+        'quantity': quantity,
+        'price_per_unit': price,
+        'commission': parse_decimal(_clean(raw, columns, 'commission'), 'commission') or Decimal('0.0'),
+        'fees': parse_decimal(_clean(raw, columns, 'fees'), 'fees') or Decimal('0.0'),
+        'currency': currency.upper() if currency else None,
+        'strategy_tag': _clean(raw, columns, 'strategy_tag'),
+        'description': _clean(raw, columns, 'description'),
+    }
+
+
+# ---------------------------
+# Asset Lookup
+# ---------------------------
+class AssetLookup:
+    """
+    Per-import symbol -> asset id table. Unknown symbols are fetched in one
+    IN query per batch, so the database is hit once per distinct symbol at most.
+    """
+
+    def __init__(self, session):
+        self.session = session
+        self._candidates: Dict[str, List[Tuple[Optional[str], int]]] = {}
+
+    def prefetch(self, symbols) -> None:
+        missing = {symbol for symbol in symbols if symbol and symbol not in self._candidates}
+        if not missing:
+            return
+        for symbol in missing:
+            self._candidates[symbol] = []
+        stmt = select(Asset.id, Asset.symbol, Asset.exchange).where(Asset.symbol.in_(missing))
+        for asset_id, symbol, exchange in self.session.execute(stmt):
+            self._candidates.setdefault(symbol.upper(), []).append((exchange, asset_id))
+
+    def resolve(self, symbol: str, exchange: Optional[str] = None) -> int:
+        candidates = self._candidates.get(symbol, [])
+        if exchange is not None:
+            candidates = [c for c in candidates if (c[0] or '').upper() == exchange.upper()]
+        if not candidates:
+            raise RowError(f'Unknown asset symbol: {symbol}' + (f' on {exchange}' if exchange else ''))
+        if len(candidates) > 1:
+            raise RowError(f'Ambiguous asset symbol {symbol}: listed on several exchanges')
+        return candidates[0][1]
+
+
+# ---------------------------
+# Bulk Writers
+# ---------------------------
+def supports_copy(session) -> bool:
+    """True when the bound engine is Postgres via psycopg2, so COPY FROM STDIN is available."""
+    dialect = session.get_bind().dialect
+    return dialect.name == 'postgresql' and dialect.driver == 'psycopg2'
+
+
+def _copy_value(value):
+    if isinstance(value, TransactionTypeEnum):
+        return value.name
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def copy_rows(session, table_name: str, rows: List[dict]) -> None:
+    """Streams rows into `table_name` with COPY ... FROM STDIN inside the session's transaction."""
+    columns = list(rows[0].keys())
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([_copy_value(row[column]) for column in columns])
+    buffer.seek(0)
+    cursor = session.connection().connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {table_name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer
+        )
+    finally:
+        cursor.close()
+
+
+def reserve_ids(session, table, count: int) -> List[int]:
+    """Pulls `count` ids from the table's serial sequence in one round-trip."""
+    stmt = text("SELECT nextval(pg_get_serial_sequence(:table, 'id')) FROM generate_series(1, :count)")
+    return list(session.execute(stmt, {'table': table.name, 'count': count}).scalars())
+
+
+def bulk_insert(session, table, rows: List[dict], return_ids: bool = False) -> List[int]:
+    """
+    Inserts rows in one round-trip: COPY on Postgres, executemany elsewhere.
+    With return_ids, the new primary keys are returned in row order.
+    """
+    if not rows:
+        return []
+    if supports_copy(session):
+        ids = []
+        if return_ids:
+            ids = reserve_ids(session, table, len(rows))
+            rows = [dict(row, id=row_id) for row, row_id in zip(rows, ids)]
+        copy_rows(session, table.name, rows)
+        return ids
+    if return_ids:
+        stmt = insert(table).returning(table.c.id, sort_by_parameter_order=True)
+        return list(session.execute(stmt, rows).scalars())
+    session.execute(insert(table), rows)
+    return []
+
+
+def insert_transactions(session, rows: List[dict]) -> List[Tuple[int, dict]]:
+    """
+    Inserts transaction rows, skipping any whose fingerprint is already stored.
+    Returns (id, row) for the rows actually inserted. Callers give repeated identical
+    lines distinct fingerprints (see build_transaction_row's `occurrence`); a fingerprint
+    repeated within `rows` anyway is written once.
+
+    Duplicates are filtered set-based by the unique fingerprint index: COPY into a
+    temp staging table followed by INSERT ... SELECT ... ON CONFLICT DO NOTHING on
+    Postgres/psycopg2, a multi-row ON CONFLICT DO NOTHING insert on other Postgres
+    drivers and SQLite, and one batched anti-join query anywhere else.
+    """
+    unique_rows: Dict[str, dict] = {}
+    for row in rows:
+        unique_rows.setdefault(row['fingerprint'], row)
+    rows = list(unique_rows.values())
+    if not rows:
+        return []
+
+    table = Transaction.__table__
+    dialect = session.get_bind().dialect.name
+
+    if supports_copy(session):
+        # Ids of skipped rows are simply burned from the sequence
+        ids = reserve_ids(session, table, len(rows))
+        rows = [dict(row, id=row_id) for row, row_id in zip(rows, ids)]
+        session.execute(text(
+            f"CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE} "
+            f"(LIKE {table.name} INCLUDING DEFAULTS) ON COMMIT DELETE ROWS"
+        ))
+        copy_rows(session, STAGING_TABLE, rows)
+        columns = ', '.join(rows[0].keys())
+        inserted = set(session.execute(text(
+            f"INSERT INTO {table.name} ({columns}) SELECT {columns} FROM {STAGING_TABLE} "
+            f"ON CONFLICT (fingerprint) DO NOTHING RETURNING id"
+        )).scalars())
+        session.execute(text(f"TRUNCATE {STAGING_TABLE}"))
+        return [(row['id'], row) for row in rows if row['id'] in inserted]
+
+    if dialect in ('postgresql', 'sqlite'):
+        dialect_insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+        stmt = (
+            dialect_insert(table)
+            .on_conflict_do_nothing(index_elements=[table.c.fingerprint])
+            .returning(table.c.id, table.c.fingerprint)
+        )
+        ids_by_fingerprint = {fingerprint: row_id for row_id, fingerprint in session.execute(stmt, rows)}
+        return [
+            (ids_by_fingerprint[row['fingerprint']], row)
+            for row in rows if row['fingerprint'] in ids_by_fingerprint
+        ]
+
+    existing = set(session.execute(
+        select(table.c.fingerprint).where(table.c.fingerprint.in_(list(unique_rows)))
+    ).scalars())
+    rows = [row for row in rows if row['fingerprint'] not in existing]
+    return list(zip(bulk_insert(session, table, rows, return_ids=True), rows))
+
+
+@dataclass
+class WriteResult:
+    inserted: List[Tuple[int, dict]]  # (transaction id, row) for rows not skipped as duplicates
+    lots: List[dict]                  # Lot rows opened by the inserted transactions
+    shortfalls: Dict[int, Decimal]    # Sell transaction id -> quantity no open lot could cover
+
+
+def write_transactions(session, rows: List[dict], lot_method: LotMatchingMethod = LotMatchingMethod.FIFO,
+                       defer_matching: bool = False) -> WriteResult:
+    """
+    Writes transaction rows and everything derived from them in the caller's DB transaction:
+    deduplicated transactions, the lots opened by buys, lot matching for sells and the
+    incremental position update. Nothing is committed here.
+
+    With defer_matching, sells are written but not matched; the caller matches them
+    later with match_imported_sells once every lot they may draw from exists.
+    """
+    inserted = insert_transactions(session, rows)
+    lots = [
+        build_lot_row(transaction_id, row)
+        for transaction_id, row in inserted
+        if row['transaction_type'] in LOT_OPENING_TYPES
+    ]
+    bulk_insert(session, Lot.__table__, lots)
+    sells = [] if defer_matching else [
+        SellOrder(
+            transaction_id=transaction_id,
+            account_id=row['account_id'],
+            asset_id=row['asset_id'],
+            quantity=row['quantity'],
+            price_per_unit=row['price_per_unit'],
+            transaction_time=row['transaction_time'],
+            charges=(row['commission'] or 0) + (row['fees'] or 0),
+        )
+        for transaction_id, row in inserted
+        if row['transaction_type'] in LOT_CLOSING_TYPES
+    ]
+    match_result = match_sells(sells, lot_method) if sells else LotMatchResult(matches=[], shortfalls={})
+    apply_position_deltas(position_deltas((row for _, row in inserted), lots, match_result.matches))
+    return WriteResult(inserted=inserted, lots=lots, shortfalls=match_result.shortfalls)
+
+
+def match_imported_sells(session, account_id: int, sell_ids: Sequence[int],
+                         lot_method: LotMatchingMethod = LotMatchingMethod.FIFO,
+                         batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[LotMatchResult]:
+    """
+    Matches already-written sells of one account against its lots in transaction-time
+    order, whatever order the file listed them in, committing every `batch_size` sells.
+    `sell_ids` must be ascending (ids in insertion order). Yields each chunk's result.
+    """
+    if not sell_ids:
+        return
+    stmt = (
+        select(Transaction.id, Transaction.asset_id, Transaction.quantity, Transaction.price_per_unit,
+               Transaction.transaction_time, Transaction.commission, Transaction.fees)
+        .where(
+            Transaction.account_id == account_id,
+            Transaction.id.between(sell_ids[0], sell_ids[-1]),
+            Transaction.transaction_type.in_(LOT_CLOSING_TYPES),
+        )
+        .order_by(Transaction.transaction_time, Transaction.id)
+        .limit(batch_size)
+    )
+    after = None
+    while True:
+        page_stmt = stmt if after is None else stmt.where(
+            tuple_(Transaction.transaction_time, Transaction.id) > tuple_(*after)
+        )
+        page = session.execute(page_stmt).all()
+        if not page:
+            return
+        after = (page[-1].transaction_time, page[-1].id)
+        sells = [
+            SellOrder(
+                transaction_id=row.id,
+                account_id=account_id,
+                asset_id=row.asset_id,
+                quantity=row.quantity,
+                price_per_unit=row.price_per_unit,
+                transaction_time=row.transaction_time,
+                charges=(row.commission or 0) + (row.fees or 0),
+            )
+            for row in page if _contains(sell_ids, row.id)  # The id range may include other imports' sells
+        ]
+        if sells:
+            result = match_sells(sells, lot_method)
+            apply_position_deltas(position_deltas((), (), result.matches))
+            session.commit()
+            yield result
+
+
+def _contains(sorted_ids: Sequence[int], value: int) -> bool:
+    index = bisect_left(sorted_ids, value)
+    return index < len(sorted_ids) and sorted_ids[index] == value
+
+
+# ---------------------------
+# Import Pipeline
+# ---------------------------
+def stream_import(account: Account, stream: TextIO, batch_size: Optional[int] = None,
+                  lot_method: LotMatchingMethod = LotMatchingMethod.FIFO) -> Iterator[dict]:
+    """
+    Validates the CSV header and returns a generator of progress events.
+
+    Rows are parsed one at a time and written in batches of `batch_size`, each
+    batch committed on its own, so memory stays flat regardless of file size
+    (apart from the id and line of each imported sell; identical fills are numbered
+    with counts kept only for the rows that share the current transaction time).
+    Sells are matched against open lots with `lot_method` once every batch is written,
+    in transaction-time order, so newest-first statements match the same lots as
+    oldest-first ones.
+    Events are dicts with an 'event' key of 'error', 'warning', 'progress' or 'summary'.
+    """
+    if lot_method is LotMatchingMethod.SPECIFIC_ID:
+        raise ImportFormatError('Specific-ID lot matching is not available for CSV imports')
+    reader = csv.DictReader(stream)
+    columns = resolve_columns(reader.fieldnames)  # Raise format errors before streaming starts
+    return _run_import(account.id, account.currency, reader, columns, batch_size or DEFAULT_BATCH_SIZE, lot_method)
+
+
+def _run_import(account_id, account_currency, reader, columns, batch_size, lot_method) -> Iterator[dict]:
+    session = db.session
+    lookup = AssetLookup(session)
+    occurrences = _LineOccurrences()
+    sell_ids, sell_lines = array('q'), array('q')  # Imported sells awaiting lot matching, ascending ids
+    stats = {'rows_read': 0, 'rows_imported': 0, 'rows_skipped': 0, 'rows_failed': 0, 'lots_created': 0}
+    batch: List[Tuple[int, dict]] = []
+    failed = False
+
+    for raw in reader:
+        stats['rows_read'] += 1
+        try:
+            batch.append((reader.line_num, parse_row(raw, columns)))
+        except RowError as e:
+            stats['rows_failed'] += 1
+            yield {'event': 'error', 'line': reader.line_num, 'error': str(e)}
+
+        if len(batch) >= batch_size:
+            failed = yield from _flush_batch(session, lookup, occurrences, sell_ids, sell_lines,
+                                             account_id, account_currency, batch, stats)
+            batch = []
+            if failed:
+                break
+
+    if batch and not failed:
+        failed = yield from _flush_batch(session, lookup, occurrences, sell_ids, sell_lines,
+                                         account_id, account_currency, batch, stats)
+
+    # Sells of batches that were committed are matched even when a later batch failed
+    try:
+        for result in match_imported_sells(session, account_id, sell_ids, lot_method, batch_size):
+            for transaction_id, unmatched in result.shortfalls.items():
+                yield {
+                    'event': 'warning',
+                    'line': sell_lines[bisect_left(sell_ids, transaction_id)],
+                    'error': f'Sell exceeds open lots by {unmatched}; imported without full cost basis',
+                }
+    except SQLAlchemyError as e:
+        session.rollback()
+        failed = True
+        yield {'event': 'error', 'error': f'Sells could not be matched to lots: {e.__class__.__name__}'}
+
+    yield dict(stats, event='summary', status='failed' if failed else 'completed')
+
+
+class _LineOccurrences:
+    """
+    Numbers identical statement lines. Identical lines share a transaction time and
+    statements list each time's lines together, so counts are kept only for the run of
+    rows at the current time (carried across batch boundaries) and memory stays bounded
+    by the largest run rather than by the number of distinct lines in the file.
+    """
+
+    def __init__(self):
+        self.transaction_time = None
+        self.seen: Counter = Counter()  # Base fingerprint -> identical lines earlier in this run
+
+    def count(self, fingerprint: str, transaction_time: datetime) -> int:
+        """How many identical lines came earlier in the current run, counting this one for the next."""
+        if transaction_time != self.transaction_time:
+            self.transaction_time = transaction_time
+            self.seen.clear()
+        occurrence = self.seen[fingerprint]
+        self.seen[fingerprint] += 1
+        return occurrence
+
+
+def _flush_batch(session, lookup, occurrences, sell_ids, sell_lines, account_id, account_currency, batch, stats):
+    """Writes one batch in a single DB transaction. Returns True if the batch failed."""
+    lookup.prefetch(parsed['symbol'] for _, parsed in batch)
+
+    rows = []
+    line_by_fingerprint = {}
+    for line, parsed in batch:
+        try:
+            asset_id = lookup.resolve(parsed['symbol'], parsed['exchange']) if parsed['symbol'] else None
+        except RowError as e:
+            stats['rows_failed'] += 1
+            yield {'event': 'error', 'line': line, 'error': str(e)}
+            continue
+        row = build_transaction_row(account_id, asset_id, parsed, account_currency)
+        occurrence = occurrences.count(row['fingerprint'], parsed['transaction_time'])
+        if occurrence:
+            row = build_transaction_row(account_id, asset_id, parsed, account_currency, occurrence)
+        line_by_fingerprint.setdefault(row['fingerprint'], line)
+        rows.append(row)
+
+    try:
+        result = write_transactions(session, rows, defer_matching=True)
+        session.commit()
+    except SQLAlchemyError as e:
+        session.rollback()
+        stats['rows_failed'] += len(rows)
+        yield {
+            'event': 'error',
+            'line': batch[0][0],
+            'last_line': batch[-1][0],
+            'error': f'Batch could not be written: {e.__class__.__name__}',
+        }
+        return True
+
+    for transaction_id, row in sorted(result.inserted, key=lambda item: item[0]):
+        if row['transaction_type'] in LOT_CLOSING_TYPES:
+            sell_ids.append(transaction_id)
+            sell_lines.append(line_by_fingerprint[row['fingerprint']])
+
+    stats['rows_imported'] += len(result.inserted)
+    stats['rows_skipped'] += len(rows) - len(result.inserted)
+    stats['lots_created'] += len(result.lots)
+    yield dict(stats, event='progress')
+    return False
+
+
+def build_transaction_row(account_id: int, asset_id: Optional[int], parsed: dict, default_currency: str,
+                          occurrence: int = 0) -> dict:
+    """
+    Full column dict for a transactions insert (every column explicit so COPY and executemany agree).
+    `occurrence` is how many identical lines came earlier in the same statement.
+    """
+    fingerprint = Transaction.compute_fingerprint(
+        account_id, parsed['transaction_time'], parsed['transaction_type'],
+        asset_id, parsed['quantity'], parsed['price_per_unit'], occurrence,
+    )
+    return {
+        'account_id': account_id,
+        'asset_id': asset_id,
+        'transaction_type': parsed['transaction_type'],
+        'transaction_time': parsed['transaction_time'],
+        'quantity': parsed['quantity'],
+        'price_per_unit': parsed['price_per_unit'],
+        'commission': parsed['commission'],
+        'fees': parsed['fees'],
+        'currency': parsed['currency'] or default_currency,
+        'strategy_tag': parsed['strategy_tag'],
+        'description': parsed['description'],
+        'fingerprint': fingerprint,
+    }
+
+
+def build_lot_row(transaction_id: int, row: dict) -> dict:
+    """Lot opened by a BUY-like transaction row; fees and commission fold into the cost basis."""
+    quantity = row['quantity']
+    cost = quantity * row['price_per_unit'] + (row['commission'] or 0) + (row['fees'] or 0)
+    return {
+        'account_id': row['account_id'],
+        'asset_id': row['asset_id'],
+        'buy_transaction_id': transaction_id,
+        'purchase_date': row['transaction_time'],
+        'purchase_quantity': quantity,
+        'quantity_remaining': quantity,
+        'cost_basis_per_unit': (cost / quantity).quantize(COST_BASIS_QUANTUM),
+        'is_open': True,
+        'created_at': datetime.now(timezone.utc),
+        'closed_at': None,
+    }
@@ -0,0 +1,346 @@
+# backend/services/market_data_service.py
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from decimal import Decimal, InvalidOperation
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+import aiohttp
+from flask import current_app
+from sqlalchemy import select, update
+
+from .. import db
+from ..models.asset import Asset
+from ..models.position import Position
+
+MAX_RETRIES = 4
+REQUEST_TIMEOUT_SECONDS = 30
+
+
+@dataclass(frozen=True)
+class QuoteRequest:
+    asset_id: int
+    symbol: str
+    currency: str
+
+
+@dataclass
+class RefreshResult:
+    requested: int = 0
+    updated: int = 0
+    missing: List[int] = field(default_factory=list)  # Asset ids no provider returned a price for
+    errors: List[str] = field(default_factory=list)
+
+
+class ProviderError(RuntimeError):
+    """Raised when a provider keeps failing (or answers with an error payload) for a batch."""
+
+
+# ---------------------------
+# Rate Limiting
+# ---------------------------
+class TokenBucket:
+    """
+    Token bucket refilled at requests_per_minute. State is plain numbers rather than
+    loop-bound primitives, so one bucket per API key keeps its budget across refresh
+    runs; the lock covers the refill and take, since request threads each running
+    their own event loop share the bucket. It is never held while waiting.
+    """
+
+    def __init__(self, requests_per_minute: float, burst: int = 1):
+        self.rate = requests_per_minute / 60.0
+        self.capacity = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    async def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            await asyncio.sleep(wait)
+
+
+_buckets: Dict[Tuple[str, Optional[str]], TokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+
+def bucket_for(provider_name: str, api_key: Optional[str], requests_per_minute: float) -> TokenBucket:
+    """One bucket per (provider, API key) per process, shared by every provider instance using that key."""
+    key = (provider_name, api_key)
+    with _buckets_lock:
+        if key not in _buckets:
+            _buckets[key] = TokenBucket(requests_per_minute)
+        return _buckets[key]
+
+
+# ---------------------------
+# Providers
+# ---------------------------
+class QuoteProvider(ABC):
+    """
+    Base class for a batch-quote API. Subclasses set name/batch_size and implement
+    fetch() (a subclass that doesn't cannot be instantiated); base_url comes from
+    config so tests can point it at a local stub server.
+    """
+    name = 'base'
+    batch_size = 100
+    max_concurrency = 4
+
+    def __init__(self, base_url: str, api_key: Optional[str], requests_per_minute: float):
+        self.base_url = base_url.rstrip('/')
+        self.api_key = api_key
+        self.bucket = bucket_for(self.name, api_key, requests_per_minute)
+
+    def headers(self) -> Dict[str, str]:
+        return {}
+
+    @abstractmethod
+    async def fetch(self, session: aiohttp.ClientSession, batch: Sequence[QuoteRequest]) -> Dict[int, Decimal]:
+        """Prices of the batch's assets, keyed by asset id; assets without a quote are left out."""
+
+    async def get_json(self, session: aiohttp.ClientSession, path: str, params: Mapping[str, str]):
+        """GET under the rate limit, backing off on 429/5xx (honouring Retry-After)."""
+        for attempt in range(MAX_RETRIES):
+            await self.bucket.acquire()
+            async with session.get(self.base_url + path, params=params) as response:
+                if response.status == 429 or response.status >= 500:
+                    retry_after = response.headers.get('Retry-After')
+                    delay = float(retry_after) if retry_after and retry_after.isdigit() else 2 ** attempt
+                    await asyncio.sleep(delay)
+                    continue
+                response.raise_for_status()
+                return await response.json(content_type=None)
+        raise ProviderError(f'{self.name}: giving up on {path} after {MAX_RETRIES} attempts')
+
+
+def _price(value) -> Optional[Decimal]:
+    if value is None:
+        return None
+    try:
+        price = Decimal(str(value))
+    except InvalidOperation:
+        return None
+    return price if price.is_finite() and price > 0 else None
+
+
+def _by_symbol(batch: Sequence[QuoteRequest]) -> Dict[str, List[QuoteRequest]]:
+    grouped: Dict[str, List[QuoteRequest]] = defaultdict(list)
+    for request in batch:
+        grouped[request.symbol.upper()].append(request)
+    return grouped
+
+
+class AlphaVantageProvider(QuoteProvider):
+    """Stocks and ETFs via REALTIME_BULK_QUOTES (up to 100 symbols per call)."""
+    name = 'alpha_vantage'
+    batch_size = 100
+
+    async def fetch(self, session, batch):
+        grouped = _by_symbol(batch)
+        data = await self.get_json(session, '/query', {
+            'function': 'REALTIME_BULK_QUOTES',
+            'symbol': ','.join(grouped),
+            'apikey': self.api_key or '',
+        })
+        if 'data' not in data:
+            raise ProviderError(f"{self.name}: {data.get('Information') or data.get('Error Message') or 'unexpected payload'}")
+        prices = {}
+        for item in data['data']:
+            price = _price(item.get('close'))
+            for request in grouped.get(str(item.get('symbol', '')).upper(), []):
+                if price is not None:
+                    prices[request.asset_id] = price
+        return prices
+
+
+class CoinGeckoProvider(QuoteProvider):
+    """Crypto via /simple/price, which accepts many symbols and quote currencies per call."""
+    name = 'coingecko'
+    batch_size = 250
+
+    def headers(self):
+        return {'x-cg-demo-api-key': self.api_key} if self.api_key else {}
+
+    async def fetch(self, session, batch):
+        grouped = _by_symbol(batch)
+        data = await self.get_json(session, '/api/v3/simple/price', {
+            'symbols': ','.join(symbol.lower() for symbol in grouped),
+            'vs_currencies': ','.join(sorted({request.currency.lower() for request in batch})),
+        })
+        prices = {}
+        for symbol, requests in grouped.items():
+            quotes = data.get(symbol.lower()) or {}
+            for request in requests:
+                price = _price(quotes.get(request.currency.lower()))
+                if price is not None:
+                    prices[request.asset_id] = price
+        return prices
+
+
+class CoinMarketCapProvider(QuoteProvider):
+    """Crypto via /v1/cryptocurrency/quotes/latest; one call per quote currency in the batch."""
+    name = 'coinmarketcap'
+    batch_size = 100
+
+    def headers(self):
+        return {'X-CMC_PRO_API_KEY': self.api_key or ''}
+
+    async def fetch(self, session, batch):
+        by_currency: Dict[str, List[QuoteRequest]] = defaultdict(list)
+        for request in batch:
+            by_currency[request.currency.upper()].append(request)
+        prices = {}
+        for currency, requests in by_currency.items():
+            grouped = _by_symbol(requests)
+            data = await self.get_json(session, '/v1/cryptocurrency/quotes/latest', {
+                'symbol': ','.join(grouped),
+                'convert': currency,
+            })
+            for symbol, entry in (data.get('data') or {}).items():
+                price = _price(((entry.get('quote') or {}).get(currency) or {}).get('price'))
+                for request in grouped.get(symbol.upper(), []):
+                    if price is not None:
+                        prices[request.asset_id] = price
+        return prices
+
+
+def build_providers(config: Mapping) -> Dict[str, QuoteProvider]:
+    """Maps Asset.asset_type to the provider configured for it; types without usable credentials are left out."""
+    providers: Dict[str, QuoteProvider] = {}
+    if config.get('ALPHA_VANTAGE_API_KEY'):
+        alpha_vantage = AlphaVantageProvider(
+            config['ALPHA_VANTAGE_BASE_URL'], config['ALPHA_VANTAGE_API_KEY'],
+            config['ALPHA_VANTAGE_REQUESTS_PER_MINUTE'],
+        )
+        providers['STOCK'] = alpha_vantage
+        providers['ETF'] = alpha_vantage
+    if config.get('COINMARKETCAP_API_KEY') and not config.get('COINGECKO_API_KEY'):
+        providers['CRYPTO'] = CoinMarketCapProvider(
+            config['COINMARKETCAP_BASE_URL'], config['COINMARKETCAP_API_KEY'],
+            config['COINMARKETCAP_REQUESTS_PER_MINUTE'],
+        )
+    else:
+        # CoinGecko's public tier works without a key, just with a lower budget
+        providers['CRYPTO'] = CoinGeckoProvider(
+            config['COINGECKO_BASE_URL'], config.get('COINGECKO_API_KEY'),
+            config['COINGECKO_REQUESTS_PER_MINUTE'],
+        )
+    return providers
+
+
+# ---------------------------
+# Ingestion
+# ---------------------------
+def refresh_quotes(asset_types: Optional[Iterable[str]] = None, held_only: bool = False,
+                   providers: Optional[Mapping[str, QuoteProvider]] = None) -> RefreshResult:
+    """
+    Fetches latest prices for every asset a provider covers and stores them on
+    Asset.last_price in one bulk UPDATE. Providers run concurrently, each with its
+    own pooled HTTP session, batch-quote calls and token-bucket budget.
+    """
+    providers = providers if providers is not None else build_providers(current_app.config)
+    asset_types = [t for t in (asset_types or providers) if t in providers]
+    result = RefreshResult()
+    if not asset_types:
+        return result
+
+    stmt = select(Asset.id, Asset.symbol, Asset.currency, Asset.asset_type).where(Asset.asset_type.in_(asset_types))
+    if held_only:
+        stmt = stmt.where(Asset.id.in_(select(Position.asset_id).where(Position.quantity != 0)))
+
+    # Group by provider instance (several asset types may share one provider)
+    work: Dict[int, Tuple[QuoteProvider, List[QuoteRequest]]] = {}
+    for asset_id, symbol, currency, asset_type in db.session.execute(stmt):
+        provider = providers[asset_type]
+        work.setdefault(id(provider), (provider, []))[1].append(QuoteRequest(asset_id, symbol, currency))
+        result.requested += 1
+    if not work:
+        return result
+
+    prices, errors = asyncio.run(_fetch_all(list(work.values())))
+    result.errors = errors
+
+    if prices:
+        now = datetime.now(timezone.utc)
+        db.session.execute(update(Asset), [
+            {'id': asset_id, 'last_price': price, 'last_price_at': now}
+            for asset_id, price in prices.items()
+        ])
+        db.session.commit()
+    result.updated = len(prices)
+    result.missing = sorted(
+        request.asset_id for _, requests in work.values() for request in requests
+        if request.asset_id not in prices
+    )
+    return result
+
+
+def fetch_prices(refs) -> Dict[Tuple[str, Optional[str]], float]:
+    """
+    Quote fetcher for the quote cache: prices a list of AssetRefs through the
+    configured providers without touching the database. Returns {(symbol, exchange): price}.
+    """
+    providers = build_providers(current_app.config)
+    work: Dict[int, Tuple[QuoteProvider, List[QuoteRequest]]] = {}
+    key_by_asset_id = {}
+    for ref in refs:
+        provider = providers.get(ref.asset_type)
+        if provider is None:
+            continue
+        work.setdefault(id(provider), (provider, []))[1].append(QuoteRequest(ref.asset_id, ref.symbol, ref.currency))
+        key_by_asset_id[ref.asset_id] = ref.key
+    if not work:
+        return {}
+    prices, errors = asyncio.run(_fetch_all(list(work.values())))
+    for error in errors:
+        current_app.logger.warning('Quote fetch failed: %s', error)
+    return {key_by_asset_id[asset_id]: float(price) for asset_id, price in prices.items()}
+
+
+async def _fetch_all(work: List[Tuple[QuoteProvider, List[QuoteRequest]]]) -> Tuple[Dict[int, Decimal], List[str]]:
+    outcomes = await asyncio.gather(*(_run_provider(provider, requests) for provider, requests in work))
+    prices: Dict[int, Decimal] = {}
+    errors: List[str] = []
+    for provider_prices, provider_errors in outcomes:
+        prices.update(provider_prices)
+        errors.extend(provider_errors)
+    return prices, errors
+
+
+async def _run_provider(provider: QuoteProvider, requests: List[QuoteRequest]) -> Tuple[Dict[int, Decimal], List[str]]:
+    """Runs all of one provider's batches over a single pooled session, capped at max_concurrency."""
+    connector = aiohttp.TCPConnector(limit=provider.max_concurrency)
+    timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT_SECONDS)
+    semaphore = asyncio.Semaphore(provider.max_concurrency)
+    batches = [requests[i:i + provider.batch_size] for i in range(0, len(requests), provider.batch_size)]
+
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers=provider.headers()) as session:
+        async def run_batch(batch):
+            async with semaphore:
+                try:
+                    return await provider.fetch(session, batch), None
+                except (aiohttp.ClientError, asyncio.TimeoutError, ProviderError, ValueError) as e:
+                    return {}, f'{provider.name}: {e.__class__.__name__}: {e}'
+
+        outcomes = await asyncio.gather(*(run_batch(batch) for batch in batches))
+
+    prices: Dict[int, Decimal] = {}
+    errors: List[str] = []
+    for batch_prices, error in outcomes:
+        prices.update(batch_prices)
+        if error:
+            errors.append(error)
+    return prices, errors
@@ -0,0 +1,431 @@
+# backend/services/nav_service.py
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.exc import IntegrityError
+
+from .. import db
+from ..models.account import Account
+from ..models.asset import Asset
+from ..models.holding_checkpoint import HoldingCheckpoint
+from ..models.portfolio import Portfolio
+from ..models.portfolio_nav import PortfolioNav
+from ..models.transaction import Transaction, TransactionTypeEnum
+from .fx_service import rates_over
+from .portfolio_service import POSITION_DECREASING_TYPES, POSITION_INCREASING_TYPES, _as_utc
+from .price_history import get_price_store
+
+# External cash flows, which move NAV without being performance; signed by cash_effect (withdrawals negative)
+EXTERNAL_FLOW_TYPES = frozenset({TransactionTypeEnum.DEPOSIT, TransactionTypeEnum.WITHDRAWAL})
+
+# Sign of a transaction's gross amount on the account's cash; commission and fees always reduce cash
+CASH_INFLOW_TYPES = frozenset({
+    TransactionTypeEnum.SELL,
+    TransactionTypeEnum.OPTION_SELL,
+    TransactionTypeEnum.DEPOSIT,
+    TransactionTypeEnum.DIVIDEND_CASH,
+    TransactionTypeEnum.INTEREST,
+    TransactionTypeEnum.BOND_COUPON,
+    TransactionTypeEnum.BOND_MATURITY,
+})
+CASH_OUTFLOW_TYPES = frozenset({
+    TransactionTypeEnum.BUY,
+    TransactionTypeEnum.OPTION_BUY,
+    TransactionTypeEnum.WITHDRAWAL,
+    TransactionTypeEnum.FEE,
+    TransactionTypeEnum.COMMISSION,
+})
+
+HoldingKey = Tuple[int, int]  # (account_id, asset_id)
+CashKey = Tuple[int, str]     # (account_id, currency)
+
+
+@dataclass
+class HoldingsSnapshot:
+    as_of: date
+    positions: Dict[HoldingKey, float]
+    cash: Dict[CashKey, float]
+
+    def to_dict(self) -> dict:
+        return {
+            'as_of': self.as_of.isoformat(),
+            'positions': [
+                {'account_id': account_id, 'asset_id': asset_id, 'quantity': round(quantity, 8)}
+                for (account_id, asset_id), quantity in sorted(self.positions.items())
+            ],
+            'cash': [
+                {'account_id': account_id, 'currency': currency, 'amount': round(amount, 8)}
+                for (account_id, currency), amount in sorted(self.cash.items())
+            ],
+        }
+
+
+@dataclass
+class NavSeries:
+    """Stored daily NAV of one portfolio as parallel arrays (dates are datetime64[D])."""
+    portfolio_id: int
+    base_currency: str
+    dates: np.ndarray
+    market_value: np.ndarray
+    cash: np.ndarray
+    net_flow: np.ndarray
+    nav: np.ndarray
+    missing_prices: List[List[int]]  # Per day: held asset ids valued at 0 for lack of a price or FX rate
+
+    def to_dict(self) -> dict:
+        return {
+            'portfolio_id': self.portfolio_id,
+            'base_currency': self.base_currency,
+            'series': [
+                {
+                    'date': str(self.dates[i]),
+                    'market_value': round(float(self.market_value[i]), 8),
+                    'cash': round(float(self.cash[i]), 8),
+                    'net_flow': round(float(self.net_flow[i]), 8),
+                    'nav': round(float(self.nav[i]), 8),
+                    'missing_prices': self.missing_prices[i],
+                }
+                for i in range(len(self.dates))
+            ],
+            'missing_prices': sorted({asset_id for day in self.missing_prices for asset_id in day}),
+        }
+
+
+def cash_effect(transaction_type: TransactionTypeEnum, quantity, price_per_unit, commission, fees) -> float:
+    """
+    Signed change to cash in the transaction's currency. The gross amount is
+    quantity * price_per_unit, or whichever of the two is set for cash-only rows
+    such as deposits and dividends.
+    """
+    if quantity is not None and price_per_unit is not None:
+        gross = abs(float(quantity) * float(price_per_unit))
+    else:
+        gross = abs(float(quantity if quantity is not None else price_per_unit or 0))
+    costs = float(commission or 0) + float(fees or 0)
+    if transaction_type in CASH_INFLOW_TYPES:
+        return gross - costs
+    if transaction_type in CASH_OUTFLOW_TYPES:
+        return -gross - costs
+    return -costs
+
+
+def position_effect(transaction_type: TransactionTypeEnum, quantity) -> float:
+    if quantity is None:
+        return 0.0
+    if transaction_type in POSITION_INCREASING_TYPES:
+        return float(quantity)
+    if transaction_type in POSITION_DECREASING_TYPES:
+        return -abs(float(quantity))
+    return 0.0
+
+
+# ---------------------------
+# Public API
+# ---------------------------
+def refresh_nav(portfolio: Portfolio, through: Optional[date] = None) -> int:
+    """
+    Brings the stored NAV series up to `through` (default: today, UTC). Work starts
+    at the day after the last snapshot, or earlier if a transaction newer than the
+    portfolio's watermark is dated before that (a backdated insert), so only the
+    affected tail is recomputed. Returns the number of days written; the caller commits.
+
+    The portfolio row is locked (SELECT ... FOR UPDATE) until that commit, so concurrent
+    refreshes of one portfolio run one after the other; the second then finds the days
+    the first wrote and has nothing left to do.
+    """
+    through = through or datetime.now(timezone.utc).date()
+    watermark_id = db.session.execute(
+        select(Portfolio.nav_watermark_id).where(Portfolio.id == portfolio.id).with_for_update()
+    ).scalar_one()
+    account_ids = _account_ids(portfolio.id)
+    if not account_ids:
+        return 0
+
+    last_day = db.session.scalar(select(func.max(PortfolioNav.nav_date)).where(PortfolioNav.portfolio_id == portfolio.id))
+    stmt = select(func.min(Transaction.transaction_time)).where(Transaction.account_id.in_(account_ids))
+    if last_day is not None and watermark_id is not None:
+        stmt = stmt.where(Transaction.id > watermark_id)
+    earliest_new = db.session.scalar(stmt)
+
+    starts = [] if last_day is None else [last_day + timedelta(days=1)]
+    if earliest_new is not None:
+        starts.append(_as_utc(earliest_new).date())
+    if not starts or min(starts) > through:
+        return 0
+    return _recompute(portfolio, account_ids, min(starts), through)
+
+
+def ensure_nav_current(portfolio: Portfolio) -> None:
+    """
+    refresh_nav and commit, for read endpoints. On backends where FOR UPDATE is a no-op
+    (SQLite), two refreshes can still race to insert the same days: the loser's
+    IntegrityError just means the winner already stored them, so it rolls back.
+    """
+    try:
+        refresh_nav(portfolio)
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+
+
+def invalidate_nav(portfolio_id: int, from_day: date) -> None:
+    """
+    Drops snapshots and checkpoints from `from_day` on, so the next refresh_nav
+    recomputes them. Needed after editing or deleting transactions, which the
+    watermark cannot see; inserts are picked up automatically.
+    """
+    account_ids = _account_ids(portfolio_id)
+    db.session.execute(delete(PortfolioNav).where(PortfolioNav.portfolio_id == portfolio_id, PortfolioNav.nav_date >= from_day))
+    if account_ids:
+        db.session.execute(delete(HoldingCheckpoint).where(
+            HoldingCheckpoint.account_id.in_(account_ids), HoldingCheckpoint.checkpoint_date >= from_day,
+        ))
+
+
+def get_nav_series(portfolio: Portfolio, start: Optional[date] = None, end: Optional[date] = None) -> NavSeries:
+    """Stored snapshots between start and end (inclusive); call refresh_nav first for an up-to-date series."""
+    stmt = (
+        select(PortfolioNav.nav_date, PortfolioNav.market_value, PortfolioNav.cash, PortfolioNav.net_flow, PortfolioNav.nav,
+               PortfolioNav.missing_prices)
+        .where(PortfolioNav.portfolio_id == portfolio.id)
+        .order_by(PortfolioNav.nav_date)
+    )
+    if start is not None:
+        stmt = stmt.where(PortfolioNav.nav_date >= start)
+    if end is not None:
+        stmt = stmt.where(PortfolioNav.nav_date <= end)
+    rows = db.session.execute(stmt).all()
+
+    def _column(index):
+        return np.fromiter((row[index] for row in rows), dtype=float, count=len(rows))
+
+    return NavSeries(
+        portfolio_id=portfolio.id,
+        base_currency=portfolio.base_currency,
+        dates=np.array([row[0] for row in rows], dtype='datetime64[D]'),
+        market_value=_column(1),
+        cash=_column(2),
+        net_flow=_column(3),
+        nav=_column(4),
+        missing_prices=[row[5] or [] for row in rows],
+    )
+
+
+def holdings_as_of(portfolio_id: int, day: date) -> HoldingsSnapshot:
+    """Quantities and cash at the end of `day`: the nearest checkpoint plus the transactions after it."""
+    account_ids = _account_ids(portfolio_id)
+    checkpoint_day, positions, cash = _load_checkpoint(account_ids, day)
+    for row in _load_transactions(account_ids, checkpoint_day, day):
+        account_id, asset_id, transaction_type, _, quantity, price, commission, fees, currency = row
+        if asset_id is not None:
+            delta = position_effect(transaction_type, quantity)
+            if delta:
+                positions[(account_id, asset_id)] = positions.get((account_id, asset_id), 0.0) + delta
+        cash[(account_id, currency)] = cash.get((account_id, currency), 0.0) + cash_effect(transaction_type, quantity, price, commission, fees)
+
+    return HoldingsSnapshot(
+        as_of=day,
+        positions={key: value for key, value in positions.items() if abs(value) > 1e-9},
+        cash={key: value for key, value in cash.items() if abs(value) > 1e-9},
+    )
+
+
+# ---------------------------
+# Engine
+# ---------------------------
+def _account_ids(portfolio_id: int) -> List[int]:
+    return list(db.session.scalars(select(Account.id).where(Account.portfolio_id == portfolio_id)))
+
+
+def _day_start(day: date) -> datetime:
+    return datetime.combine(day, time.min, tzinfo=timezone.utc)
+
+
+def _load_checkpoint(account_ids: Sequence[int], on_or_before: date):
+    """Latest checkpoint on or before the given day: (day or None, positions, cash)."""
+    if not account_ids:
+        return None, {}, {}
+    checkpoint_day = db.session.scalar(
+        select(func.max(HoldingCheckpoint.checkpoint_date))
+        .where(HoldingCheckpoint.account_id.in_(account_ids), HoldingCheckpoint.checkpoint_date <= on_or_before)
+    )
+    positions: Dict[HoldingKey, float] = {}
+    cash: Dict[CashKey, float] = {}
+    if checkpoint_day is None:
+        return None, positions, cash
+    rows = db.session.execute(
+        select(HoldingCheckpoint.account_id, HoldingCheckpoint.asset_id, HoldingCheckpoint.currency, HoldingCheckpoint.quantity)
+        .where(HoldingCheckpoint.account_id.in_(account_ids), HoldingCheckpoint.checkpoint_date == checkpoint_day)
+    )
+    for account_id, asset_id, currency, quantity in rows:
+        if asset_id is None:
+            cash[(account_id, currency)] = float(quantity)
+        else:
+            positions[(account_id, asset_id)] = float(quantity)
+    return checkpoint_day, positions, cash
+
+
+def _load_transactions(account_ids: Sequence[int], after: Optional[date], through: date) -> list:
+    """Transactions dated after `after` (exclusive, None for all) through `through` (inclusive), oldest first."""
+    if not account_ids:
+        return []
+    stmt = (
+        select(Transaction.account_id, Transaction.asset_id, Transaction.transaction_type, Transaction.transaction_time,
+               Transaction.quantity, Transaction.price_per_unit, Transaction.commission, Transaction.fees,
+               Transaction.currency)
+        .where(Transaction.account_id.in_(account_ids),
+               Transaction.transaction_time < _day_start(through + timedelta(days=1)))
+        .order_by(Transaction.transaction_time, Transaction.id)
+    )
+    if after is not None:
+        stmt = stmt.where(Transaction.transaction_time >= _day_start(after + timedelta(days=1)))
+    return db.session.execute(stmt).all()
+
+
+def _recompute(portfolio: Portfolio, account_ids: List[int], start: date, end: date) -> int:
+    """
+    Rewrites snapshots and month-end checkpoints for [start, end]. Replays from the
+    nearest checkpoint before `start` with daily deltas scattered into
+    (key x day) matrices and cumulated, so the per-day work is all array ops.
+    """
+    watermark = db.session.scalar(select(func.max(Transaction.id)).where(Transaction.account_id.in_(account_ids)))
+    checkpoint_day, positions, cash = _load_checkpoint(account_ids, start - timedelta(days=1))
+    rows = _load_transactions(account_ids, checkpoint_day, end)
+    invalidate_nav(portfolio.id, start)
+
+    if checkpoint_day is not None:
+        replay_start = checkpoint_day + timedelta(days=1)
+    elif rows:
+        replay_start = _as_utc(rows[0][3]).date()
+    else:
+        replay_start = start
+    first_day = max(start, replay_start)
+    day_count = (end - replay_start).days + 1
+    if first_day > end:
+        _set_watermark(portfolio, watermark)
+        return 0
+
+    # Keys: everything in the checkpoint plus everything the replayed transactions touch
+    position_keys = list(positions)
+    cash_keys = list(cash)
+    position_index = {key: i for i, key in enumerate(position_keys)}
+    cash_index = {key: i for i, key in enumerate(cash_keys)}
+    position_entries, cash_entries, flow_entries = [], [], []
+    for account_id, asset_id, transaction_type, transaction_time, quantity, price, commission, fees, currency in rows:
+        day_index = (_as_utc(transaction_time).date() - replay_start).days
+        delta = position_effect(transaction_type, quantity) if asset_id is not None else 0.0
+        if delta:
+            key = (account_id, asset_id)
+            if key not in position_index:
+                position_index[key] = len(position_keys)
+                position_keys.append(key)
+            position_entries.append((position_index[key], day_index, delta))
+        key = (account_id, currency)
+        if key not in cash_index:
+            cash_index[key] = len(cash_keys)
+            cash_keys.append(key)
+        cash_entries.append((cash_index[key], day_index, cash_effect(transaction_type, quantity, price, commission, fees)))
+        if transaction_type in EXTERNAL_FLOW_TYPES:
+            flow_entries.append((cash_index[key], day_index, cash_effect(transaction_type, quantity, price, 0, 0)))
+
+    held = _cumulate(position_keys, positions, position_entries, day_count)
+    balances = _cumulate(cash_keys, cash, cash_entries, day_count)
+    flows = _scatter(len(cash_keys), flow_entries, day_count)
+
+    # Only [first_day, end] is written; earlier columns were just the replay run-up
+    offset = (first_day - replay_start).days
+    held, balances, flows = held[:, offset:], balances[:, offset:], flows[:, offset:]
+    days = np.arange(np.datetime64(first_day, 'D'), np.datetime64(end, 'D') + 1)
+
+    asset_ids = sorted({asset_id for _, asset_id in position_keys})
+    asset_rows = {
+        row[0]: row for row in db.session.execute(
+            select(Asset.id, Asset.currency, Asset.last_price).where(Asset.id.in_(asset_ids))
+        )
+    } if asset_ids else {}
+    prices = get_price_store().closes_asof(asset_ids, days)
+    # Assets without bar history are carried at their last quote
+    last_prices = np.array([np.nan if asset_rows[a][2] is None else float(asset_rows[a][2]) for a in asset_ids], dtype=float)
+    prices = np.where(np.isnan(prices), last_prices[:, None], prices)
+
+    currencies = sorted({asset_rows[a][1] for a in asset_ids} | {currency for _, currency in cash_keys})
+    fx = _fx_matrix(currencies, portfolio.base_currency, days)
+    currency_index = {currency: i for i, currency in enumerate(currencies)}
+
+    asset_row = {asset_id: i for i, asset_id in enumerate(asset_ids)}
+    price_rows = np.array([asset_row[asset_id] for _, asset_id in position_keys], dtype=np.int64)
+    position_fx_rows = np.array([currency_index[asset_rows[asset_id][1]] for _, asset_id in position_keys], dtype=np.int64)
+    cash_fx_rows = np.array([currency_index[currency] for _, currency in cash_keys], dtype=np.int64)
+
+    values = held * prices[price_rows] * fx[position_fx_rows] if position_keys else np.zeros((0, len(days)))
+    market_value = np.nansum(values, axis=0)
+    # nansum counts a holding without a price or FX rate as 0; record which ones, as /valuation does
+    unpriced = np.isnan(values) & (np.abs(held) > 1e-9)
+    position_assets = np.array([asset_id for _, asset_id in position_keys], dtype=np.int64)
+    cash_total = np.nansum(balances * fx[cash_fx_rows], axis=0) if cash_keys else np.zeros(len(days))
+    net_flow = np.nansum(flows * fx[cash_fx_rows], axis=0) if cash_keys else np.zeros(len(days))
+
+    now = datetime.now(timezone.utc)
+    day_list = days.astype(object)
+    db.session.execute(insert(PortfolioNav), [
+        {
+            'portfolio_id': portfolio.id,
+            'nav_date': day,
+            'market_value': round(float(market_value[i]), 8),
+            'cash': round(float(cash_total[i]), 8),
+            'net_flow': round(float(net_flow[i]), 8),
+            'nav': round(float(market_value[i] + cash_total[i]), 8),
+            'missing_prices': sorted(set(position_assets[unpriced[:, i]].tolist())) or None,
+            'created_at': now,
+        }
+        for i, day in enumerate(day_list)
+    ])
+
+    # Month-end checkpoints bound how much history any later replay has to read
+    checkpoints = []
+    for i, day in enumerate(day_list):
+        if (day + timedelta(days=1)).day != 1:
+            continue
+        for k, (account_id, asset_id) in enumerate(position_keys):
+            if abs(held[k, i]) > 1e-9:
+                checkpoints.append({'account_id': account_id, 'checkpoint_date': day, 'asset_id': asset_id,
+                                    'currency': None, 'quantity': round(float(held[k, i]), 8)})
+        for k, (account_id, currency) in enumerate(cash_keys):
+            if abs(balances[k, i]) > 1e-9:
+                checkpoints.append({'account_id': account_id, 'checkpoint_date': day, 'asset_id': None,
+                                    'currency': currency, 'quantity': round(float(balances[k, i]), 8)})
+    if checkpoints:
+        db.session.execute(insert(HoldingCheckpoint), checkpoints)
+
+    _set_watermark(portfolio, watermark)
+    return len(day_list)
+
+
+def _scatter(size: int, entries: List[Tuple[int, int, float]], day_count: int) -> np.ndarray:
+    matrix = np.zeros((size, day_count))
+    if entries:
+        rows, columns, values = (np.array(part) for part in zip(*entries))
+        np.add.at(matrix, (rows.astype(np.int64), columns.astype(np.int64)), values.astype(float))
+    return matrix
+
+
+def _cumulate(keys: list, initial: Dict, entries: List[Tuple[int, int, float]], day_count: int) -> np.ndarray:
+    """End-of-day level per key: starting level plus the running sum of daily deltas."""
+    start = np.array([initial.get(key, 0.0) for key in keys], dtype=float)
+    return start[:, None] + np.cumsum(_scatter(len(keys), entries, day_count), axis=1)
+
+
+def _fx_matrix(currencies: List[str], base_currency: str, days: np.ndarray) -> np.ndarray:
+    """(currency x day) conversion rates to base; a single-currency portfolio needs no lookups."""
+    if not len(days) or all(currency == base_currency for currency in currencies):
+        return np.ones((len(currencies), len(days)))
+    return rates_over(currencies, base_currency, list(days.astype(object)))
+
+
+def _set_watermark(portfolio: Portfolio, watermark: Optional[int]) -> None:
+    portfolio.nav_watermark_id = watermark
@@ -0,0 +1,591 @@
+# backend/services/portfolio_service.py
+from __future__ import annotations
+
+import base64
+import enum
+import json
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import bindparam, case, delete, func, insert, select, tuple_, union_all, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import contains_eager, selectinload, with_polymorphic
+
+from .. import db
+from ..models.account import Account
+from ..models.asset import Asset
+from ..models.lot import Lot
+from ..models.lot_disposal import LotDisposal
+from ..models.portfolio import Portfolio
+from ..models.position import Position
+from ..models.transaction import Transaction, TransactionTypeEnum
+
+# Transaction types that draw down open lots
+LOT_CLOSING_TYPES = frozenset({TransactionTypeEnum.SELL, TransactionTypeEnum.OPTION_SELL})
+
+# Transaction types whose quantity adds to / removes from a position.
+# STOCK_SPLIT rows carry the share delta (negative for reverse splits).
+POSITION_INCREASING_TYPES = frozenset({
+    TransactionTypeEnum.BUY,
+    TransactionTypeEnum.OPTION_BUY,
+    TransactionTypeEnum.DIVIDEND_STOCK,
+    TransactionTypeEnum.STOCK_SPLIT,
+})
+POSITION_DECREASING_TYPES = LOT_CLOSING_TYPES
+
+POSITION_QUANTUM = Decimal('0.00000001')  # Matches the Numeric(24, 8) position columns
+DRIFT_TOLERANCE = Decimal('0.0001')
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+# ---------------------------
+# Ownership Helpers
+# ---------------------------
+def get_owned_account(user_id: int, account_id: int) -> Optional[Account]:
+    """Returns the account if it belongs to one of the user's portfolios, else None."""
+    return (
+        Account.query
+        .join(Portfolio, Account.portfolio_id == Portfolio.id)
+        .filter(Account.id == account_id, Portfolio.user_id == user_id)
+        .first()
+    )
+
+
+def get_owned_portfolio(user_id: int, portfolio_id: int) -> Optional[Portfolio]:
+    """Returns the portfolio if the user owns it, else None."""
+    return Portfolio.query.filter_by(id=portfolio_id, user_id=user_id).first()
+
+
+def load_portfolio(user_id: int, portfolio_id: int) -> Optional[Portfolio]:
+    """Like get_owned_portfolio, with portfolio.accounts eager-loaded in one extra query."""
+    return (
+        Portfolio.query
+        .options(selectinload(Portfolio.accounts))
+        .filter_by(id=portfolio_id, user_id=user_id)
+        .first()
+    )
+
+
+# ---------------------------
+# Lot Matching
+# ---------------------------
+class LotMatchingMethod(enum.Enum):
+    FIFO = 'FIFO'                # Oldest purchase first
+    LIFO = 'LIFO'                # Newest purchase first
+    HIFO = 'HIFO'                # Highest cost basis first
+    SPECIFIC_ID = 'SPECIFIC_ID'  # Lots named on the sell, in the given order
+
+
+class LotMatchingError(ValueError):
+    """Raised when a sell cannot be matched as requested (e.g. unknown specific lot)."""
+
+
+@dataclass(frozen=True)
+class SellOrder:
+    transaction_id: int
+    account_id: int
+    asset_id: int
+    quantity: Decimal
+    price_per_unit: Optional[Decimal]
+    transaction_time: datetime
+    lot_ids: Optional[Tuple[int, ...]] = None  # Only used by SPECIFIC_ID
+    charges: Decimal = Decimal('0')             # Commission + fees of the whole sell
+
+    @classmethod
+    def from_transaction(cls, transaction: Transaction, lot_ids: Optional[Iterable[int]] = None) -> 'SellOrder':
+        return cls(
+            transaction_id=transaction.id,
+            account_id=transaction.account_id,
+            asset_id=transaction.asset_id,
+            quantity=transaction.quantity,
+            price_per_unit=transaction.price_per_unit,
+            transaction_time=transaction.transaction_time,
+            lot_ids=tuple(lot_ids) if lot_ids is not None else None,
+            charges=(transaction.commission or 0) + (transaction.fees or 0),
+        )
+
+
+@dataclass(frozen=True)
+class LotMatch:
+    sell_transaction_id: int
+    account_id: int
+    asset_id: int
+    lot_id: int
+    quantity: Decimal
+    cost_basis_per_unit: Decimal
+    proceeds_per_unit: Optional[Decimal]
+    purchase_date: datetime
+    sale_date: datetime
+    charges: Decimal = Decimal('0')  # This match's pro-rata share of the sell's commission + fees
+
+    @property
+    def realized_gain(self) -> Optional[Decimal]:
+        if self.proceeds_per_unit is None:
+            return None
+        return (self.proceeds_per_unit - self.cost_basis_per_unit) * self.quantity
+
+    @property
+    def net_proceeds(self) -> Decimal:
+        """Sale value of the matched quantity after its share of charges; what realized P&L books."""
+        return self.quantity * (self.proceeds_per_unit or 0) - self.charges
+
+
+@dataclass
+class LotMatchResult:
+    matches: List[LotMatch]
+    shortfalls: Dict[int, Decimal]  # sell transaction id -> quantity left unmatched
+
+
+class _OpenLot:
+    """Mutable in-memory copy of an open lot row while a batch is being matched."""
+    __slots__ = ('id', 'purchase_date', 'quantity_remaining', 'cost_basis_per_unit', 'closed_at', 'dirty')
+
+    def __init__(self, lot_id, purchase_date, quantity_remaining, cost_basis_per_unit):
+        self.id = lot_id
+        self.purchase_date = _as_utc(purchase_date)
+        self.quantity_remaining = quantity_remaining
+        self.cost_basis_per_unit = cost_basis_per_unit
+        self.closed_at = None
+        self.dirty = False
+
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite hands back naive datetimes even for timezone-aware columns
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+_LOT_ORDERING = {
+    LotMatchingMethod.FIFO: (Lot.purchase_date.asc(), Lot.id.asc()),
+    LotMatchingMethod.LIFO: (Lot.purchase_date.desc(), Lot.id.desc()),
+    LotMatchingMethod.HIFO: (Lot.cost_basis_per_unit.desc(), Lot.purchase_date.asc(), Lot.id.asc()),
+    LotMatchingMethod.SPECIFIC_ID: (Lot.id.asc(),),
+}
+
+
+def _load_open_lots(account_id: int, asset_id: int, method: LotMatchingMethod) -> List[_OpenLot]:
+    """
+    Loads (and row-locks) the open lots of one (account, asset) in matching order.
+    FOR UPDATE only touches this pair's lots, so sells of other assets never wait on it.
+    """
+    stmt = (
+        select(Lot.id, Lot.purchase_date, Lot.quantity_remaining, Lot.cost_basis_per_unit)
+        .where(Lot.account_id == account_id, Lot.asset_id == asset_id, Lot.is_open.is_(True))
+        .order_by(*_LOT_ORDERING[method])
+        .with_for_update()
+    )
+    return [_OpenLot(*row) for row in db.session.execute(stmt)]
+
+
+def _consume(sell: SellOrder, candidates: Iterable[_OpenLot], matches: List[LotMatch]) -> Decimal:
+    """Draws the sell's quantity from candidates in order; returns what could not be matched."""
+    remaining = sell.quantity
+    sale_date = _as_utc(sell.transaction_time)
+    for lot in candidates:
+        if remaining <= 0:
+            break
+        if lot.quantity_remaining <= 0 or lot.purchase_date > sale_date:
+            continue
+        taken = min(lot.quantity_remaining, remaining)
+        lot.quantity_remaining -= taken
+        lot.dirty = True
+        if lot.quantity_remaining == 0:
+            lot.closed_at = sale_date
+        remaining -= taken
+        matches.append(LotMatch(
+            sell_transaction_id=sell.transaction_id,
+            account_id=sell.account_id,
+            asset_id=sell.asset_id,
+            lot_id=lot.id,
+            quantity=taken,
+            cost_basis_per_unit=lot.cost_basis_per_unit,
+            proceeds_per_unit=sell.price_per_unit,
+            purchase_date=lot.purchase_date,
+            sale_date=sale_date,
+            charges=sell.charges * taken / sell.quantity if sell.charges else Decimal('0'),
+        ))
+    return remaining
+
+
+def match_sells(sells: Iterable[SellOrder], method: LotMatchingMethod = LotMatchingMethod.FIFO) -> LotMatchResult:
+    """
+    Matches a batch of sells against open lots and writes the lot changes back.
+
+    Sells are grouped by (account, asset); each group's open lots are loaded once,
+    all of its sells are matched in memory in time order, every touched lot is
+    written back with one executemany UPDATE and every match is recorded as a
+    LotDisposal row with one executemany INSERT. Quantity that cannot be covered is
+    reported in `shortfalls` rather than raised, so partial histories still import.
+    Runs inside the caller's transaction; committing is left to the caller.
+    """
+    groups: Dict[Tuple[int, int], List[SellOrder]] = defaultdict(list)
+    for sell in sells:
+        groups[(sell.account_id, sell.asset_id)].append(sell)
+
+    matches: List[LotMatch] = []
+    shortfalls: Dict[int, Decimal] = {}
+    touched: List[_OpenLot] = []
+
+    # Lock groups in a stable order so two batches cannot deadlock each other
+    for (account_id, asset_id) in sorted(groups):
+        lots = _load_open_lots(account_id, asset_id, method)
+        lots_by_id = {lot.id: lot for lot in lots}
+        for sell in sorted(groups[(account_id, asset_id)], key=lambda s: (_as_utc(s.transaction_time), s.transaction_id)):
+            if method is LotMatchingMethod.SPECIFIC_ID:
+                if not sell.lot_ids:
+                    raise LotMatchingError(f'Sell {sell.transaction_id} names no lots for specific-ID matching')
+                unknown = [lot_id for lot_id in sell.lot_ids if lot_id not in lots_by_id]
+                if unknown:
+                    raise LotMatchingError(f'Sell {sell.transaction_id} references lots that are not open: {unknown}')
+                candidates = [lots_by_id[lot_id] for lot_id in sell.lot_ids]
+            else:
+                candidates = lots
+            unmatched = _consume(sell, candidates, matches)
+            if unmatched > 0:
+                shortfalls[sell.transaction_id] = unmatched
+        touched.extend(lot for lot in lots if lot.dirty)
+
+    if touched:
+        db.session.execute(update(Lot), [
+            {
+                'id': lot.id,
+                'quantity_remaining': lot.quantity_remaining,
+                'is_open': lot.quantity_remaining > 0,
+                'closed_at': lot.closed_at,
+            }
+            for lot in touched
+        ])
+    if matches:
+        db.session.execute(insert(LotDisposal), [
+            {
+                'lot_id': match.lot_id,
+                'sell_transaction_id': match.sell_transaction_id,
+                'account_id': match.account_id,
+                'asset_id': match.asset_id,
+                'quantity': match.quantity,
+                'cost_basis_per_unit': match.cost_basis_per_unit,
+                'purchase_date': match.purchase_date,
+                'sale_date': match.sale_date,
+            }
+            for match in matches
+        ])
+
+    return LotMatchResult(matches=matches, shortfalls=shortfalls)
+
+
+# ---------------------------
+# Positions
+# ---------------------------
+PositionKey = Tuple[int, int]  # (account_id, asset_id)
+
+
+def position_deltas(transactions: Iterable[dict], lots: Iterable[dict],
+                    matches: Iterable[LotMatch]) -> Dict[PositionKey, List[Decimal]]:
+    """
+    Folds freshly written transaction rows, the lots they opened and the lot matches
+    of their sells into per-position [quantity, total_cost, realized_pnl] deltas.
+
+    Cost always comes from lot rows (purchase_quantity * cost_basis_per_unit) and
+    realized P&L from matches only, which is exactly what rebuild_positions() sums,
+    so the two never disagree. Quantity a sell could not match (a shortfall) still
+    reduces the position but books no gain: its cost basis is unknown.
+    """
+    deltas: Dict[PositionKey, List[Decimal]] = defaultdict(lambda: [Decimal('0'), Decimal('0'), Decimal('0')])
+    for row in transactions:
+        if row['asset_id'] is None or row['quantity'] is None:
+            continue
+        key = (row['account_id'], row['asset_id'])
+        if row['transaction_type'] in POSITION_INCREASING_TYPES:
+            deltas[key][0] += row['quantity']
+        elif row['transaction_type'] in POSITION_DECREASING_TYPES:
+            deltas[key][0] -= row['quantity']
+    for lot in lots:
+        deltas[(lot['account_id'], lot['asset_id'])][1] += lot['purchase_quantity'] * lot['cost_basis_per_unit']
+    for match in matches:
+        matched_cost = match.quantity * match.cost_basis_per_unit
+        deltas[(match.account_id, match.asset_id)][1] -= matched_cost
+        deltas[(match.account_id, match.asset_id)][2] += match.net_proceeds - matched_cost
+    return deltas
+
+
+def apply_position_deltas(deltas: Dict[PositionKey, List[Decimal]]) -> None:
+    """
+    Adds deltas onto the positions table in one set-based upsert
+    (INSERT ... ON CONFLICT DO UPDATE SET quantity = quantity + excluded.quantity ...).
+    Runs inside the caller's transaction, so positions commit together with the transactions.
+    """
+    if not deltas:
+        return
+    now = datetime.now(timezone.utc)
+    rows = [
+        {
+            'account_id': account_id,
+            'asset_id': asset_id,
+            'quantity': quantity.quantize(POSITION_QUANTUM),
+            'total_cost': total_cost.quantize(POSITION_QUANTUM),
+            'realized_pnl': realized.quantize(POSITION_QUANTUM),
+            'updated_at': now,
+        }
+        for (account_id, asset_id), (quantity, total_cost, realized) in sorted(deltas.items())
+    ]
+    table = Position.__table__
+    dialect = db.session.get_bind().dialect.name
+
+    if dialect in ('postgresql', 'sqlite'):
+        dialect_insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+        stmt = dialect_insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.account_id, table.c.asset_id],
+            set_={
+                'quantity': table.c.quantity + stmt.excluded.quantity,
+                'total_cost': table.c.total_cost + stmt.excluded.total_cost,
+                'realized_pnl': table.c.realized_pnl + stmt.excluded.realized_pnl,
+                'updated_at': stmt.excluded.updated_at,
+            },
+        )
+        db.session.execute(stmt, rows)
+        return
+
+    # Generic fallback: one query for the keys that already exist, then one UPDATE and one INSERT batch
+    keys = [(row['account_id'], row['asset_id']) for row in rows]
+    existing = {
+        (account_id, asset_id): position_id
+        for position_id, account_id, asset_id in db.session.execute(
+            select(table.c.id, table.c.account_id, table.c.asset_id)
+            .where(tuple_(table.c.account_id, table.c.asset_id).in_(keys))
+        )
+    }
+    updates = [row for row in rows if (row['account_id'], row['asset_id']) in existing]
+    inserts = [row for row in rows if (row['account_id'], row['asset_id']) not in existing]
+    if updates:
+        db.session.execute(
+            update(table).where(table.c.id == bindparam('position_id')).values(
+                quantity=table.c.quantity + bindparam('d_quantity'),
+                total_cost=table.c.total_cost + bindparam('d_total_cost'),
+                realized_pnl=table.c.realized_pnl + bindparam('d_realized_pnl'),
+                updated_at=bindparam('d_updated_at'),
+            ),
+            [
+                {
+                    'position_id': existing[(row['account_id'], row['asset_id'])],
+                    'd_quantity': row['quantity'],
+                    'd_total_cost': row['total_cost'],
+                    'd_realized_pnl': row['realized_pnl'],
+                    'd_updated_at': row['updated_at'],
+                }
+                for row in updates
+            ],
+        )
+    if inserts:
+        db.session.execute(insert(table), inserts)
+
+
+def compute_positions(account_ids: Optional[Iterable[int]] = None) -> Dict[PositionKey, Tuple[Decimal, Decimal, Decimal]]:
+    """
+    Recomputes positions from scratch with three GROUP BY queries: quantities from
+    transactions, net proceeds of matched quantity from lot disposals (joined to their
+    sells), open and consumed cost from lots.
+    """
+    account_ids = list(account_ids) if account_ids is not None else None
+    quantity_expr = case(
+        (Transaction.transaction_type.in_(POSITION_INCREASING_TYPES), Transaction.quantity),
+        (Transaction.transaction_type.in_(POSITION_DECREASING_TYPES), -Transaction.quantity),
+        else_=0,
+    )
+    transaction_stmt = (
+        select(Transaction.account_id, Transaction.asset_id, func.coalesce(func.sum(quantity_expr), 0))
+        .where(Transaction.asset_id.is_not(None), Transaction.quantity.is_not(None))
+        .group_by(Transaction.account_id, Transaction.asset_id)
+    )
+    # Same pro-rata charge split as _consume: quantity * (price - (commission + fees) / sell quantity)
+    net_proceeds_expr = LotDisposal.quantity * (
+        func.coalesce(Transaction.price_per_unit, 0)
+        - (func.coalesce(Transaction.commission, 0) + func.coalesce(Transaction.fees, 0)) / Transaction.quantity
+    )
+    proceeds_stmt = (
+        select(LotDisposal.account_id, LotDisposal.asset_id, func.sum(net_proceeds_expr))
+        .join(Transaction, LotDisposal.sell_transaction_id == Transaction.id)
+        .group_by(LotDisposal.account_id, LotDisposal.asset_id)
+    )
+    lot_stmt = (
+        select(Lot.account_id, Lot.asset_id,
+               func.sum(Lot.quantity_remaining * Lot.cost_basis_per_unit),
+               func.sum((Lot.purchase_quantity - Lot.quantity_remaining) * Lot.cost_basis_per_unit))
+        .where(Lot.asset_id.is_not(None))
+        .group_by(Lot.account_id, Lot.asset_id)
+    )
+    if account_ids is not None:
+        transaction_stmt = transaction_stmt.where(Transaction.account_id.in_(account_ids))
+        proceeds_stmt = proceeds_stmt.where(LotDisposal.account_id.in_(account_ids))
+        lot_stmt = lot_stmt.where(Lot.account_id.in_(account_ids))
+
+    computed: Dict[PositionKey, List[Decimal]] = defaultdict(lambda: [Decimal('0'), Decimal('0'), Decimal('0')])
+    for account_id, asset_id, quantity in db.session.execute(transaction_stmt):
+        computed[(account_id, asset_id)][0] = Decimal(quantity)
+    for account_id, asset_id, proceeds in db.session.execute(proceeds_stmt):
+        computed[(account_id, asset_id)][2] += Decimal(str(proceeds or 0))
+    for account_id, asset_id, open_cost, consumed_cost in db.session.execute(lot_stmt):
+        computed[(account_id, asset_id)][1] = Decimal(open_cost or 0)
+        computed[(account_id, asset_id)][2] -= Decimal(consumed_cost or 0)
+    return {
+        key: tuple(value.quantize(POSITION_QUANTUM) for value in values)
+        for key, values in computed.items()
+        if any(values)
+    }
+
+
+def rebuild_positions(account_ids: Optional[Iterable[int]] = None, apply: bool = True) -> List[dict]:
+    """
+    Recomputes positions from the transaction/lot history and reports any drift
+    from the stored rows. With apply=True the stored rows are replaced; the caller commits.
+    """
+    account_ids = list(account_ids) if account_ids is not None else None
+    computed = compute_positions(account_ids)
+
+    stored_stmt = select(Position.account_id, Position.asset_id, Position.quantity,
+                         Position.total_cost, Position.realized_pnl)
+    if account_ids is not None:
+        stored_stmt = stored_stmt.where(Position.account_id.in_(account_ids))
+    stored = {(row[0], row[1]): tuple(row[2:]) for row in db.session.execute(stored_stmt)}
+
+    zero = (Decimal('0'), Decimal('0'), Decimal('0'))
+    drift = []
+    for key in sorted(set(computed) | set(stored)):
+        expected = computed.get(key, zero)
+        actual = tuple(Decimal(value) for value in stored.get(key, zero))
+        if any(abs(e - a) > DRIFT_TOLERANCE for e, a in zip(expected, actual)):
+            drift.append({
+                'account_id': key[0],
+                'asset_id': key[1],
+                'expected': {'quantity': expected[0], 'total_cost': expected[1], 'realized_pnl': expected[2]},
+                'stored': {'quantity': actual[0], 'total_cost': actual[1], 'realized_pnl': actual[2]},
+            })
+
+    if apply:
+        delete_stmt = delete(Position)
+        if account_ids is not None:
+            delete_stmt = delete_stmt.where(Position.account_id.in_(account_ids))
+        db.session.execute(delete_stmt)
+        now = datetime.now(timezone.utc)
+        rows = [
+            {'account_id': account_id, 'asset_id': asset_id, 'quantity': quantity,
+             'total_cost': total_cost, 'realized_pnl': realized, 'updated_at': now}
+            for (account_id, asset_id), (quantity, total_cost, realized) in sorted(computed.items())
+        ]
+        if rows:
+            db.session.execute(insert(Position.__table__), rows)
+    return drift
+
+
+def get_portfolio_positions(portfolio_id: int, include_closed: bool = False) -> List[Tuple[Position, Asset]]:
+    """
+    Holdings of a portfolio read straight from the positions table in one query.
+    Assets are loaded through every subclass table at once (with_polymorphic) and
+    populate Position.asset (contains_eager), so subclass fields such as a bond's
+    maturity or an option's strike never trigger a per-row load.
+    """
+    asset = with_polymorphic(Asset, '*', flat=True)
+    query = (
+        db.session.query(Position)
+        .join(Account, Position.account_id == Account.id)
+        .join(Position.asset.of_type(asset))
+        .options(contains_eager(Position.asset.of_type(asset)))
+        .filter(Account.portfolio_id == portfolio_id)
+        .order_by(Position.account_id, asset.symbol)
+    )
+    if not include_closed:
+        query = query.filter(Position.quantity != 0)
+    return [(position, position.asset) for position in query]
+
+
+# ---------------------------
+# Transaction Listing
+# ---------------------------
+class InvalidCursorError(ValueError):
+    """Raised when a pagination cursor cannot be decoded."""
+
+
+@dataclass
+class TransactionPage:
+    rows: List[Tuple[Transaction, Optional[str]]]  # (transaction, asset symbol)
+    next_cursor: Optional[str]
+
+
+def encode_cursor(transaction_time: datetime, transaction_id: int) -> str:
+    payload = json.dumps([_as_utc(transaction_time).isoformat(), transaction_id])
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        time_text, transaction_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return _as_utc(datetime.fromisoformat(time_text)), int(transaction_id)
+    except (ValueError, TypeError, UnicodeError) as e:
+        raise InvalidCursorError('Invalid cursor') from e
+
+
+def list_transactions(account_ids: Iterable[int], cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE,
+                      transaction_types: Optional[Iterable[TransactionTypeEnum]] = None,
+                      asset_id: Optional[int] = None, strategy_tag: Optional[str] = None,
+                      start: Optional[datetime] = None, end: Optional[datetime] = None) -> TransactionPage:
+    """
+    Newest-first page of transactions using keyset pagination on (transaction_time, id):
+    each page continues strictly after the cursor's row, so the database walks the
+    (account_id, transaction_time, id) index instead of counting past an OFFSET.
+    Every account is scanned separately for at most one page and the results merged.
+    `end` is exclusive.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    filters = []
+    if transaction_types:
+        filters.append(Transaction.transaction_type.in_(list(transaction_types)))
+    if asset_id is not None:
+        filters.append(Transaction.asset_id == asset_id)
+    if strategy_tag is not None:
+        filters.append(Transaction.strategy_tag == strategy_tag)
+    if start is not None:
+        filters.append(Transaction.transaction_time >= start)
+    if end is not None:
+        filters.append(Transaction.transaction_time < end)
+    if cursor:
+        cursor_time, cursor_id = decode_cursor(cursor)
+        filters.append(tuple_(Transaction.transaction_time, Transaction.id) < tuple_(cursor_time, cursor_id))
+    newest_first = (Transaction.transaction_time.desc(), Transaction.id.desc())
+
+    # With several accounts, `account_id IN (...) ORDER BY time, id` cannot be one
+    # range scan of the index. Instead each account contributes its own LIMITed
+    # keyset scan and only those (accounts x page) candidate ids are merged.
+    account_ids = sorted(set(account_ids))
+    scans = [
+        select(Transaction.id)
+        .where(Transaction.account_id == account_id, *filters)
+        .order_by(*newest_first)
+        .limit(limit + 1)
+        .subquery()
+        for account_id in account_ids
+    ]
+    if len(scans) == 1:
+        candidates = select(scans[0].c.id)
+    else:
+        candidates = union_all(*(select(scan.c.id) for scan in scans))
+
+    # One extra row tells us whether another page exists without a COUNT
+    rows = (
+        db.session.query(Transaction, Asset.symbol)
+        .outerjoin(Asset, Transaction.asset_id == Asset.id)
+        .filter(Transaction.id.in_(candidates))
+        .order_by(*newest_first)
+        .limit(limit + 1)
+        .all()
+    ) if scans else []
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1][0]
+        next_cursor = encode_cursor(last.transaction_time, last.id)
+    return TransactionPage(rows=[(transaction, symbol) for transaction, symbol in rows], next_cursor=next_cursor)
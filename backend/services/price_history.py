@@ -0,0 +1,238 @@
+# backend/services/price_history.py
+from __future__ import annotations
+
+import os
+import shutil
+import threading
+from dataclasses import dataclass
+from datetime import date
+from typing import Dict, Iterable, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+from flask import current_app
+
+# One raw little-endian file per column per asset; 'date' is written last so its
+# length is always the committed row count, whatever a concurrent reader sees.
+# Value bytes past it are left by an append that crashed and are cut before the next write.
+DATE_DTYPE = np.dtype('<M8[D]')
+VALUE_DTYPE = np.dtype('<f8')
+VALUE_COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+
+
+@dataclass
+class BarSeries:
+    """Daily OHLCV for one asset; arrays are read-only views into the memory-mapped files."""
+    asset_id: int
+    date: np.ndarray
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    volume: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.date)
+
+    @classmethod
+    def empty(cls, asset_id: int) -> 'BarSeries':
+        values = np.empty(0, dtype=VALUE_DTYPE)
+        return cls(asset_id, np.empty(0, dtype=DATE_DTYPE), values, values, values, values, values)
+
+
+def _as_day(value) -> np.datetime64:
+    return np.datetime64(value, 'D')
+
+
+class PriceHistoryStore:
+    """
+    Columnar store of daily bars under `root/<asset_id>/<column>.bin`.
+
+    Appends after the last stored date are plain file appends; anything that
+    overlaps or predates the series rewrites that asset's directory and swaps it
+    in. Reads memory-map the column files once per process (re-mapping when the
+    file has grown or the directory was swapped by a rewrite, in any process) and
+    slice by binary search, so a range read copies nothing.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self._maps: Dict[int, Tuple[tuple, BarSeries]] = {}  # asset_id -> (version mapped, series)
+        self._lock = threading.RLock()  # Held across each read-modify-write; reads re-enter it to cache maps
+        os.makedirs(root, exist_ok=True)
+
+    # ---------------------------
+    # Writes
+    # ---------------------------
+    def append(self, asset_id: int, dates, open=None, high=None, low=None, close=None, volume=None) -> int:
+        """
+        Adds bars for one asset. Missing columns are stored as NaN; bars for dates
+        already stored replace them. Returns the number of bars written.
+        """
+        dates = np.asarray(dates, dtype=DATE_DTYPE)
+        columns = {}
+        for name, values in zip(VALUE_COLUMNS, (open, high, low, close, volume)):
+            columns[name] = np.full(len(dates), np.nan) if values is None else np.asarray(values, dtype=VALUE_DTYPE)
+            if len(columns[name]) != len(dates):
+                raise ValueError(f"Column '{name}' has {len(columns[name])} values for {len(dates)} dates")
+        if not len(dates):
+            return 0
+
+        # Sort and keep the last bar given for each date
+        order = np.argsort(dates, kind='stable')
+        dates = dates[order]
+        keep = np.append(dates[1:] != dates[:-1], True)
+        dates = dates[keep]
+        columns = {name: values[order][keep] for name, values in columns.items()}
+
+        with self._lock:
+            self._recover(asset_id)
+            existing = self.read(asset_id)
+            if not len(existing) or dates[0] > existing.date[-1]:
+                self._append_files(asset_id, dates, columns)
+            else:
+                self._rewrite(asset_id, existing, dates, columns)
+            self._maps.pop(asset_id, None)
+        return len(dates)
+
+    def append_many(self, bars: Mapping[int, Mapping[str, Sequence]]) -> int:
+        """Bulk append: {asset_id: {'dates': [...], 'close': [...], ...}}."""
+        return sum(self.append(asset_id, **columns) for asset_id, columns in bars.items())
+
+    def delete(self, asset_id: int) -> None:
+        with self._lock:
+            self._maps.pop(asset_id, None)
+            shutil.rmtree(self._dir(asset_id), ignore_errors=True)
+
+    def _dir(self, asset_id: int) -> str:
+        return os.path.join(self.root, str(int(asset_id)))
+
+    def _recover(self, asset_id: int) -> None:
+        """
+        Puts back a series left in `.old` by a rewrite that crashed between its two renames,
+        and cuts every column to the committed row count after an append that crashed midway.
+        """
+        directory = self._dir(asset_id)
+        retired = directory + '.old'
+        if not os.path.exists(directory) and os.path.isdir(retired):
+            os.replace(retired, directory)
+
+        date_path = os.path.join(directory, 'date.bin')
+        try:
+            rows = os.stat(date_path).st_size // DATE_DTYPE.itemsize
+        except FileNotFoundError:
+            rows = 0
+        for name in ('date',) + VALUE_COLUMNS:
+            path = os.path.join(directory, f'{name}.bin')
+            committed = rows * (DATE_DTYPE if name == 'date' else VALUE_DTYPE).itemsize
+            try:
+                if os.stat(path).st_size > committed:
+                    os.truncate(path, committed)
+            except FileNotFoundError:
+                pass
+
+    def _append_files(self, asset_id: int, dates: np.ndarray, columns: Mapping[str, np.ndarray]) -> None:
+        directory = self._dir(asset_id)
+        os.makedirs(directory, exist_ok=True)
+        for name in VALUE_COLUMNS:
+            with open(os.path.join(directory, f'{name}.bin'), 'ab') as f:
+                f.write(columns[name].tobytes())
+        with open(os.path.join(directory, 'date.bin'), 'ab') as f:
+            f.write(dates.tobytes())
+
+    def _rewrite(self, asset_id: int, existing: BarSeries, dates: np.ndarray, columns: Mapping[str, np.ndarray]) -> None:
+        # Existing bars on dates not being replaced, merged with the new ones
+        retained = ~np.isin(existing.date, dates)
+        merged_dates = np.concatenate([existing.date[retained], dates])
+        order = np.argsort(merged_dates, kind='stable')
+        merged = {
+            name: np.concatenate([getattr(existing, name)[retained], columns[name]])[order]
+            for name in VALUE_COLUMNS
+        }
+        merged_dates = merged_dates[order]
+
+        directory = self._dir(asset_id)
+        staging, retired = directory + '.new', directory + '.old'
+        # Leftovers of a rewrite that crashed midway; os.replace cannot rename over a non-empty directory
+        shutil.rmtree(staging, ignore_errors=True)
+        shutil.rmtree(retired, ignore_errors=True)
+        self._append_files_to(staging, merged_dates, merged)
+        # Readers holding maps of the old files keep valid views; new readers see the new directory
+        os.replace(directory, retired)
+        os.replace(staging, directory)
+        shutil.rmtree(retired, ignore_errors=True)
+
+    def _append_files_to(self, directory: str, dates: np.ndarray, columns: Mapping[str, np.ndarray]) -> None:
+        os.makedirs(directory, exist_ok=True)
+        for name in VALUE_COLUMNS:
+            columns[name].tofile(os.path.join(directory, f'{name}.bin'))
+        dates.tofile(os.path.join(directory, 'date.bin'))
+
+    # ---------------------------
+    # Reads
+    # ---------------------------
+    def read(self, asset_id: int, start: Optional[date] = None, end: Optional[date] = None) -> BarSeries:
+        """Bars with start <= date <= end (either bound optional), as views into the mapped files."""
+        series = self._mapped(asset_id)
+        if start is None and end is None:
+            return series
+        lo = 0 if start is None else int(np.searchsorted(series.date, _as_day(start), side='left'))
+        hi = len(series) if end is None else int(np.searchsorted(series.date, _as_day(end), side='right'))
+        return BarSeries(asset_id, *(getattr(series, name)[lo:hi] for name in ('date',) + VALUE_COLUMNS))
+
+    def read_many(self, asset_ids: Iterable[int], start: Optional[date] = None,
+                  end: Optional[date] = None) -> Dict[int, BarSeries]:
+        return {int(asset_id): self.read(asset_id, start, end) for asset_id in asset_ids}
+
+    def closes_asof(self, asset_ids: Sequence[int], dates, column: str = 'close') -> np.ndarray:
+        """
+        (len(asset_ids), len(dates)) matrix of the latest value on or before each
+        date, NaN before an asset's first bar. Used to price holdings on any day,
+        including weekends and holidays.
+        """
+        dates = np.asarray(dates, dtype=DATE_DTYPE)
+        result = np.full((len(asset_ids), len(dates)), np.nan)
+        for row, asset_id in enumerate(asset_ids):
+            series = self._mapped(asset_id)
+            if not len(series):
+                continue
+            index = np.searchsorted(series.date, dates, side='right') - 1
+            known = index >= 0
+            result[row, known] = getattr(series, column)[index[known]]
+        return result
+
+    def _mapped(self, asset_id: int) -> BarSeries:
+        asset_id = int(asset_id)
+        directory = self._dir(asset_id)
+        date_path = os.path.join(directory, 'date.bin')
+        try:
+            directory_stat = os.stat(directory)
+            rows = os.stat(date_path).st_size // DATE_DTYPE.itemsize
+        except FileNotFoundError:
+            return BarSeries.empty(asset_id)
+
+        # Appends grow date.bin; rewrites (e.g. a corrected bar, same row count) swap in a new directory
+        version = (directory_stat.st_ino, directory_stat.st_mtime_ns, rows)
+        cached = self._maps.get(asset_id)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        if rows == 0:
+            return BarSeries.empty(asset_id)
+
+        arrays = {'date': np.memmap(date_path, dtype=DATE_DTYPE, mode='r', shape=(rows,))}
+        for name in VALUE_COLUMNS:
+            arrays[name] = np.memmap(os.path.join(directory, f'{name}.bin'), dtype=VALUE_DTYPE, mode='r', shape=(rows,))
+        series = BarSeries(asset_id, **arrays)
+        with self._lock:
+            self._maps[asset_id] = (version, series)
+        return series
+
+
+def get_price_store() -> PriceHistoryStore:
+    """The app's PriceHistoryStore rooted at PRICE_HISTORY_PATH, opened on first use."""
+    store = current_app.extensions.get('price_history')
+    if store is None:
+        root = current_app.config['PRICE_HISTORY_PATH']
+        if not os.path.isabs(root):
+            root = os.path.join(current_app.instance_path, root)
+        store = current_app.extensions['price_history'] = PriceHistoryStore(root)
+    return store
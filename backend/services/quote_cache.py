@@ -0,0 +1,303 @@
+# backend/services/quote_cache.py
+from __future__ import annotations
+
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from flask import current_app
+
+from ..metrics import record_cache_lookup
+
+logger = logging.getLogger(__name__)
+
+# Seconds a quote stays fresh, per Asset.asset_type
+QUOTE_TTLS = {
+    'CRYPTO': 15,
+    'STOCK': 60,
+    'ETF': 60,
+    'OPTION': 60,
+    'BOND': 3600,
+    'CASH': 86400,
+}
+DEFAULT_TTL = 60
+UNPRICED_TTL = 30             # Seconds a "no quote available" answer is cached
+UNPRICED = float('nan')       # Cached in place of a price for keys the fetcher could not price
+FILL_LOCK_SECONDS = 10        # Cross-process single-flight lock lifetime
+FILL_WAIT_SECONDS = 2.0       # How long a fill waits for another worker's fetch before fetching itself
+FILL_POLL_INTERVAL = 0.05
+
+QuoteKey = Tuple[str, Optional[str]]  # (symbol, exchange)
+
+
+@dataclass(frozen=True)
+class AssetRef:
+    asset_id: int
+    symbol: str
+    exchange: Optional[str]
+    asset_type: str
+    currency: str
+
+    @property
+    def key(self) -> QuoteKey:
+        return (self.symbol.upper(), self.exchange.upper() if self.exchange else None)
+
+
+# fetcher(refs) -> {QuoteKey: price}; keys it cannot price are simply absent
+QuoteFetcher = Callable[[List[AssetRef]], Dict[QuoteKey, float]]
+
+
+# ---------------------------
+# Backends
+# ---------------------------
+class LocalQuoteBackend:
+    """Per-process LRU dict; right for a single worker or tests."""
+
+    def __init__(self, max_entries: int = 100_000):
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[QuoteKey, Tuple[float, float]]' = OrderedDict()  # key -> (price, expires_at)
+        self._lock = threading.Lock()
+
+    def get_many(self, keys: Iterable[QuoteKey]) -> Dict[QuoteKey, float]:
+        now = time.time()
+        found = {}
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                if entry[1] <= now:
+                    del self._entries[key]
+                    continue
+                self._entries.move_to_end(key)
+                found[key] = entry[0]
+        return found
+
+    def set_many(self, prices: Dict[QuoteKey, float], ttls: Dict[QuoteKey, int]) -> None:
+        now = time.time()
+        with self._lock:
+            for key, price in prices.items():
+                self._entries[key] = (price, now + ttls[key])
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def acquire_fill_locks(self, keys: Iterable[QuoteKey]) -> Set[QuoteKey]:
+        # Only one process uses this backend, so in-process coalescing is all that is needed
+        return set(keys)
+
+    def release_fill_locks(self, keys: Iterable[QuoteKey]) -> None:
+        pass
+
+
+class RedisQuoteBackend:
+    """
+    Shared backend for multi-worker deployments, using any Redis-compatible server.
+    Entries expire by TTL; LRU eviction is left to the server's maxmemory-policy.
+    Needs the `redis` package, which is only imported when this backend is configured.
+    """
+    prefix = 'tradewonk:quote:'
+
+    def __init__(self, url: str):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("QUOTE_CACHE_BACKEND='redis' requires the 'redis' package") from e
+        self.client = redis.Redis.from_url(url)
+
+    def _name(self, key: QuoteKey) -> str:
+        return f'{self.prefix}{key[0]}:{key[1] or ""}'
+
+    def get_many(self, keys: Iterable[QuoteKey]) -> Dict[QuoteKey, float]:
+        keys = list(keys)
+        if not keys:
+            return {}
+        values = self.client.mget([self._name(key) for key in keys])
+        return {key: float(value) for key, value in zip(keys, values) if value is not None}
+
+    def set_many(self, prices: Dict[QuoteKey, float], ttls: Dict[QuoteKey, int]) -> None:
+        pipeline = self.client.pipeline(transaction=False)
+        for key, price in prices.items():
+            pipeline.set(self._name(key), repr(price), ex=ttls[key])
+        pipeline.execute()
+
+    def acquire_fill_locks(self, keys: Iterable[QuoteKey]) -> Set[QuoteKey]:
+        keys = list(keys)
+        pipeline = self.client.pipeline(transaction=False)
+        for key in keys:
+            pipeline.set(self._name(key) + ':lock', '1', nx=True, ex=FILL_LOCK_SECONDS)
+        return {key for key, acquired in zip(keys, pipeline.execute()) if acquired}
+
+    def release_fill_locks(self, keys: Iterable[QuoteKey]) -> None:
+        names = [self._name(key) + ':lock' for key in keys]
+        if names:
+            self.client.delete(*names)
+
+
+# ---------------------------
+# Cache
+# ---------------------------
+class QuoteCache:
+    """
+    Read-through quote cache keyed by (symbol, exchange) with per-asset-type TTLs.
+
+    Misses are coalesced: within a process, concurrent callers asking for the same
+    key wait on one in-flight Future; across processes, the backend's fill lock lets
+    one worker fetch while others poll the backend briefly. Each key is therefore
+    fetched once per TTL no matter how many dashboards ask for it. Keys the fetcher
+    cannot price are cached as UNPRICED for UNPRICED_TTL, so they are not refetched
+    (or waited on) by every request. Callers fall back to stored prices for any
+    asset missing from the result.
+
+    Fills run on a small background pool, never in the request thread: provider
+    rate limits can hold a fetch far longer than a request should wait. Every caller,
+    the one that started the fill included, waits at most fill_timeout and then goes
+    on without the key; the fill still completes and caches its prices for later requests.
+    """
+
+    def __init__(self, backend, fetcher: QuoteFetcher, ttls: Optional[Dict[str, int]] = None,
+                 fill_timeout: float = 2.0, fill_workers: int = 2):
+        self.backend = backend
+        self.fetcher = fetcher
+        self.ttls = dict(QUOTE_TTLS, **(ttls or {}))
+        self.fill_timeout = fill_timeout
+        self.hits = 0
+        self.misses = 0
+        self._inflight: Dict[QuoteKey, Future] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=fill_workers, thread_name_prefix='quote-fill')
+
+    def ttl_for(self, ref: AssetRef) -> int:
+        return self.ttls.get(ref.asset_type, DEFAULT_TTL)
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def get_prices(self, refs: Iterable[AssetRef]) -> Dict[int, float]:
+        """Returns {asset_id: price} for every ref a quote is available for."""
+        refs = list(refs)
+        refs_by_key: Dict[QuoteKey, List[AssetRef]] = {}
+        for ref in refs:
+            refs_by_key.setdefault(ref.key, []).append(ref)
+
+        prices = self.backend.get_many(refs_by_key)
+        missing = [key for key in refs_by_key if key not in prices]
+        with self._lock:
+            self.hits += len(refs_by_key) - len(missing)
+            self.misses += len(missing)
+        record_cache_lookup('quote', hits=len(refs_by_key) - len(missing), misses=len(missing))
+        if missing:
+            prices.update(self._fill(missing, refs_by_key))
+
+        return {
+            ref.asset_id: prices[key]
+            for key, key_refs in refs_by_key.items() if key in prices and not math.isnan(prices[key])
+            for ref in key_refs
+        }
+
+    def _fill(self, keys: List[QuoteKey], refs_by_key: Dict[QuoteKey, List[AssetRef]]) -> Dict[QuoteKey, float]:
+        leading: Dict[QuoteKey, Future] = {}
+        waiting: Dict[QuoteKey, Future] = {}
+        with self._lock:
+            for key in keys:
+                if key not in self._inflight:
+                    leading[key] = self._inflight[key] = Future()
+                waiting[key] = self._inflight[key]
+        if leading:
+            self._executor.submit(self._lead, leading, {key: refs_by_key[key] for key in leading})
+
+        prices: Dict[QuoteKey, float] = {}
+        deadline = time.monotonic() + self.fill_timeout
+        for key, future in waiting.items():
+            try:
+                price = future.result(timeout=max(0.0, deadline - time.monotonic()))
+            except Exception:
+                # Still fetching, or the fetch failed: leave the key out so the caller
+                # values it at the stored price
+                continue
+            if price is not None:
+                prices[key] = price
+        return prices
+
+    def _lead(self, leading: Dict[QuoteKey, Future], refs_by_key: Dict[QuoteKey, List[AssetRef]]) -> None:
+        """Runs one fill on the background pool and hands its prices to everyone waiting on it."""
+        prices: Dict[QuoteKey, float] = {}
+        error: Optional[Exception] = None
+        try:
+            prices = self._fetch_as_leader(list(leading), refs_by_key)
+        except Exception as e:
+            logger.exception('Quote fill failed; callers use stored prices')
+            error = e
+        finally:
+            with self._lock:
+                for key in leading:
+                    self._inflight.pop(key, None)
+        for key, future in leading.items():
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(prices.get(key))
+
+    def _store(self, keys: List[QuoteKey], fetched: Dict[QuoteKey, float],
+               refs_by_key: Dict[QuoteKey, List[AssetRef]]) -> Dict[QuoteKey, float]:
+        """Caches fetched prices, and UNPRICED for the keys the fetch came back without."""
+        entries = {key: fetched.get(key, UNPRICED) for key in keys}
+        ttls = {key: self.ttl_for(refs_by_key[key][0]) if key in fetched else UNPRICED_TTL for key in keys}
+        if entries:
+            self.backend.set_many(entries, ttls)
+        return entries
+
+    def _fetch_as_leader(self, keys: List[QuoteKey], refs_by_key: Dict[QuoteKey, List[AssetRef]]) -> Dict[QuoteKey, float]:
+        locked = self.backend.acquire_fill_locks(keys)
+        prices: Dict[QuoteKey, float] = {}
+        try:
+            if locked:
+                fetched = self.fetcher([refs_by_key[key][0] for key in keys if key in locked])
+                prices.update(self._store([key for key in keys if key in locked], fetched, refs_by_key))
+        finally:
+            self.backend.release_fill_locks(locked)
+
+        # Another worker holds the lock for the rest: wait for it to publish, then fetch stragglers ourselves
+        waiting = [key for key in keys if key not in locked]
+        deadline = time.monotonic() + FILL_WAIT_SECONDS
+        while waiting and time.monotonic() < deadline:
+            time.sleep(FILL_POLL_INTERVAL)
+            published = self.backend.get_many(waiting)
+            prices.update(published)
+            waiting = [key for key in waiting if key not in published]
+        if waiting:
+            fetched = self.fetcher([refs_by_key[key][0] for key in waiting])
+            prices.update(self._store(waiting, fetched, refs_by_key))
+        return prices
+
+
+def get_quote_cache() -> QuoteCache:
+    """The app's shared QuoteCache, built on first use from QUOTE_CACHE_* config."""
+    cache = current_app.extensions.get('quote_cache')
+    if cache is None:
+        from .market_data_service import fetch_prices  # Avoid importing aiohttp until quotes are needed
+
+        config = current_app.config
+        app = current_app._get_current_object()
+
+        def fetcher(refs):
+            with app.app_context():  # Fills run on the cache's own threads
+                return fetch_prices(refs)
+
+        if config.get('QUOTE_CACHE_BACKEND') == 'redis':
+            backend = RedisQuoteBackend(config['QUOTE_CACHE_REDIS_URL'])
+        else:
+            backend = LocalQuoteBackend(config.get('QUOTE_CACHE_MAX_ENTRIES', 100_000))
+        cache = current_app.extensions['quote_cache'] = QuoteCache(
+            backend, fetcher,
+            fill_timeout=config.get('QUOTE_FILL_TIMEOUT_SECONDS', 2.0),
+            fill_workers=config.get('QUOTE_FILL_WORKERS', 2),
+        )
+    return cache
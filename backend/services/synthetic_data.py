@@ -0,0 +1,550 @@
+# backend/services/synthetic_data.py
+#
+# Deterministic synthetic dataset for performance work: users, portfolios and
+# accounts, every Asset subclass, daily FX rates and a transaction history
+# (with the lots, disposals and positions it implies) of arbitrary size.
+# Every random draw comes from one numpy Generator seeded by SyntheticSpec.seed,
+# and dates are laid out backwards from SyntheticSpec.end_date, so the same
+# spec on an empty database always produces the same rows. Intended for a
+# dedicated database: FX rates for the generated dates are upserted.
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timedelta, timezone
+from decimal import Decimal
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+from flask import current_app
+from sqlalchemy import bindparam, select, update
+
+from .. import db
+from ..models.account import Account
+from ..models.asset import Asset, Bond, CashCurrency, CryptoCurrency, ETF, OptionContract, OptionTypeEnum, Stock
+from ..models.portfolio import Portfolio
+from ..models.transaction import TransactionTypeEnum
+from ..models.user import User
+from .fx_service import store_rates
+from .import_service import DEFAULT_BATCH_SIZE, bulk_insert, build_transaction_row, write_transactions
+from .nav_service import cash_effect
+
+T = TransactionTypeEnum
+
+# Exchange, trading currency, share of listings
+EXCHANGES = (
+    ('NASDAQ', 'USD', 0.35), ('NYSE', 'USD', 0.30), ('LSE', 'GBP', 0.10),
+    ('XETRA', 'EUR', 0.10), ('TSE', 'JPY', 0.08), ('TSX', 'CAD', 0.07),
+)
+COUNTRIES = {'NASDAQ': 'US', 'NYSE': 'US', 'LSE': 'GB', 'XETRA': 'DE', 'TSE': 'JP', 'TSX': 'CA'}
+# Popularity multipliers on top of the Zipf ranks, so option and bond trading stays a minority
+KIND_POPULARITY = {'STOCK': 1.0, 'ETF': 1.0, 'CRYPTO': 0.5, 'BOND': 0.3, 'OPTION': 0.1, 'CASH': 0.0}
+# Units of each currency per USD on the first generated day
+FX_START = {'USD': 1.0, 'EUR': 0.92, 'GBP': 0.79, 'JPY': 150.0, 'CAD': 1.36, 'CHF': 0.88}
+FX_VOLATILITY = 0.08
+ACCOUNT_CURRENCIES = (('USD', 0.70), ('EUR', 0.12), ('GBP', 0.08), ('CAD', 0.05), ('CHF', 0.03), ('JPY', 0.02))
+ACCOUNT_TYPES = ('BROKERAGE', 'RETIREMENT', 'IRA', 'CRYPTO_EXCHANGE')
+
+SECTORS = (
+    'Technology', 'Healthcare', 'Financials', 'Consumer Discretionary', 'Industrials',
+    'Energy', 'Utilities', 'Materials', 'Real Estate', 'Communication Services', 'Consumer Staples',
+)
+NAME_WORDS = (
+    'Alpha', 'Apex', 'Atlas', 'Aurora', 'Beacon', 'Blue', 'Bright', 'Cedar', 'Crest', 'Delta', 'Eagle',
+    'Echo', 'Ever', 'First', 'Frontier', 'Global', 'Golden', 'Granite', 'Harbor', 'Horizon', 'Iron',
+    'Keystone', 'Liberty', 'Lunar', 'Maple', 'Meridian', 'Nova', 'Nordic', 'Oak', 'Omega', 'Pacific',
+    'Peak', 'Pioneer', 'Prime', 'Quantum', 'Red', 'Ridge', 'River', 'Sierra', 'Silver', 'Solar',
+    'Sterling', 'Summit', 'Terra', 'Titan', 'Unity', 'Vertex', 'Vista', 'West', 'Zenith',
+)
+NAME_SUFFIXES = (
+    'Holdings', 'Group', 'Systems', 'Technologies', 'Industries', 'Energy', 'Pharmaceuticals',
+    'Financial', 'Networks', 'Materials', 'Logistics', 'Foods', 'Motors', 'Semiconductor', 'Bank',
+)
+ETF_INDICES = ('S&P 500', 'Nasdaq 100', 'Russell 2000', 'MSCI World', 'MSCI EM', 'US Aggregate Bond', 'Gold')
+CREDIT_RATINGS = ('AAA', 'AA', 'A', 'BBB', 'BB', 'B')
+
+# Relative frequency of event types after an account's opening deposit
+EVENT_TYPES = (
+    (T.BUY, 0.46), (T.SELL, 0.30), (T.DIVIDEND_CASH, 0.09), (T.DEPOSIT, 0.05), (T.WITHDRAWAL, 0.02),
+    (T.FEE, 0.03), (T.INTEREST, 0.02), (T.BOND_COUPON, 0.03),
+)
+OPTION_TRADING_DAYS = 365     # Options are only traded over the last year, inside their listing window
+OPTION_VOLATILITY = 0.30
+RISK_FREE_RATE = 0.04
+PRICE_QUANTUM = 8
+CASH_QUANTUM = 4
+
+
+class SyntheticDataError(ValueError):
+    """Raised when a spec is invalid or its users already exist."""
+
+
+@dataclass
+class SyntheticSpec:
+    seed: int = 42
+    users: int = 100
+    transactions: int = 1_000_000
+    stocks: int = 4000
+    etfs: int = 400
+    cryptos: int = 150
+    bonds: int = 800
+    option_underlyings: int = 50   # Largest stocks that get a full option chain
+    years: int = 5
+    end_date: Optional[date] = None
+    prefix: str = 'synth'          # Username/email prefix, so several datasets can share a database
+    batch_size: Optional[int] = None
+
+
+@dataclass
+class SyntheticSummary:
+    counts: Dict[str, int] = field(default_factory=dict)
+
+    def add(self, name: str, count: int) -> None:
+        self.counts[name] = self.counts.get(name, 0) + count
+
+
+# ---------------------------
+# Price Paths
+# ---------------------------
+def _price_paths(rng: np.random.Generator, start_prices: np.ndarray, drift: np.ndarray, volatility: np.ndarray,
+                 days: int) -> np.ndarray:
+    """(assets x weeks) geometric Brownian motion sampled weekly; _price_on adds intra-week noise."""
+    weeks = days // 7 + 2
+    dt = 7 / 365.0
+    shocks = rng.standard_normal((len(start_prices), weeks - 1))
+    steps = (drift - 0.5 * volatility ** 2)[:, None] * dt + volatility[:, None] * math.sqrt(dt) * shocks
+    log_paths = np.concatenate([np.zeros((len(start_prices), 1)), np.cumsum(steps, axis=1)], axis=1)
+    return start_prices[:, None] * np.exp(log_paths)
+
+
+def _price_on(paths: np.ndarray, index: int, day: int, noise: float) -> float:
+    return float(paths[index, day // 7]) * math.exp(0.01 * noise)
+
+
+def _black_scholes(spot: float, strike: float, years: float, sigma: float, is_call: bool) -> float:
+    """Scalar twin of greeks_service.black_scholes_price, used to price option trades one at a time."""
+    sqrt_t = math.sqrt(years)
+    d1 = (math.log(spot / strike) + (RISK_FREE_RATE + 0.5 * sigma * sigma) * years) / (sigma * sqrt_t)
+    d2 = d1 - sigma * sqrt_t
+    cdf = lambda x: 0.5 * (1.0 + math.erf(x / math.sqrt(2.0)))
+    discount = strike * math.exp(-RISK_FREE_RATE * years)
+    if is_call:
+        return spot * cdf(d1) - discount * cdf(d2)
+    return discount * cdf(-d2) - spot * cdf(-d1)
+
+
+def _decimal(value: float, places: int = PRICE_QUANTUM) -> Decimal:
+    return Decimal(f'{value:.{places}f}')
+
+
+# ---------------------------
+# Reference Data
+# ---------------------------
+def _symbols(rng: np.random.Generator, count: int, lengths: tuple, taken: set) -> List[str]:
+    """`count` unique upper-case tickers not in `taken` (which is updated)."""
+    symbols: List[str] = []
+    while len(symbols) < count:
+        length = int(rng.choice(lengths))
+        candidate = ''.join(chr(65 + c) for c in rng.integers(0, 26, length))
+        if candidate not in taken:
+            taken.add(candidate)
+            symbols.append(candidate)
+    return symbols
+
+
+def _company_name(rng: np.random.Generator) -> str:
+    first, second = rng.choice(len(NAME_WORDS), 2, replace=False)
+    return f'{NAME_WORDS[first]} {NAME_WORDS[second]} {NAME_SUFFIXES[rng.integers(len(NAME_SUFFIXES))]}'
+
+
+def _generate_fx(rng: np.random.Generator, days: int) -> Dict[str, np.ndarray]:
+    """Units of each currency per USD for each of days + 1 consecutive days."""
+    rates = {'USD': np.ones(days + 1)}
+    dt = 1 / 365.0
+    for currency, initial in FX_START.items():
+        if currency == 'USD':
+            continue
+        steps = FX_VOLATILITY * math.sqrt(dt) * rng.standard_normal(days)
+        rates[currency] = initial * np.exp(np.concatenate([[0.0], np.cumsum(steps)]))
+    return rates
+
+
+@dataclass
+class _Universe:
+    """Generated assets, indexed 0..n-1 in insertion order."""
+    ids: List[int]
+    symbols: List[str]
+    kinds: List[str]               # Asset.asset_type of each asset
+    currencies: List[str]
+    paths: np.ndarray              # Weekly prices; options are priced off their underlying's path
+    weights: np.ndarray            # Zipf popularity, sums to 1
+    underlying: Dict[int, int]     # Option index -> underlying stock index
+    option_terms: Dict[int, tuple]  # Option index -> (strike, expiration, is_call)
+    bond_coupons: Dict[int, float]  # Bond index -> annual coupon per unit (BOND_FACE_VALUE face)
+
+
+def _insert_assets(session, rng: np.random.Generator, spec: SyntheticSpec, start: date, days: int,
+                   now: datetime, summary: SyntheticSummary) -> _Universe:
+    taken = set(session.execute(select(Asset.symbol)).scalars())
+    end = start + timedelta(days=days)
+    exchange_p = np.array([share for _, _, share in EXCHANGES])
+
+    base_rows, details, kinds = [], [], []
+
+    def add(kind: str, symbol: str, name: str, currency: str, exchange: Optional[str], detail: dict):
+        base_rows.append({
+            'asset_type': kind, 'symbol': symbol, 'name': name, 'currency': currency, 'exchange': exchange,
+            'description': None, 'icon_url': None, 'last_price': None, 'last_price_at': None,
+            'created_at': now, 'updated_at': now,
+        })
+        details.append(detail)
+        kinds.append(kind)
+
+    for currency in FX_START:
+        if currency not in taken:
+            taken.add(currency)
+            add('CASH', currency, f'{currency} cash', currency, None, {})
+
+    # Stocks: market caps are Pareto distributed, so a few giants and a long tail
+    market_caps = np.sort(2e8 * (rng.pareto(1.1, spec.stocks) + 1))[::-1]
+    exchange_of = rng.choice(len(EXCHANGES), spec.stocks, p=exchange_p)
+    exchange_of[:spec.option_underlyings] = 0  # Optionable names are US listed
+    for i, symbol in enumerate(_symbols(rng, spec.stocks, (3, 4, 4), taken)):
+        exchange, currency, _ = EXCHANGES[exchange_of[i]]
+        add('STOCK', symbol, _company_name(rng), currency, exchange, {
+            'sector': SECTORS[rng.integers(len(SECTORS))], 'industry': None,
+            'market_cap': _decimal(min(market_caps[i], 9e15), 2), 'country': COUNTRIES[exchange],
+        })
+    for symbol in _symbols(rng, spec.etfs, (3, 4), taken):
+        index = ETF_INDICES[rng.integers(len(ETF_INDICES))]
+        issuer = NAME_WORDS[rng.integers(len(NAME_WORDS))]
+        add('ETF', symbol, f'{issuer} {index} ETF', 'USD', 'NYSE', {
+            'issuer': issuer, 'expense_ratio': _decimal(rng.uniform(0.0003, 0.0075), 4),
+            'underlying_index': index, 'asset_class': 'Fixed Income' if 'Bond' in index else 'Equity',
+        })
+    for symbol in _symbols(rng, spec.cryptos, (3, 4, 5), taken):
+        add('CRYPTO', symbol, f'{NAME_WORDS[rng.integers(len(NAME_WORDS))]}{symbol.title()} Coin', 'USD', 'CRYPTO', {
+            'algorithm': ('SHA-256', 'Ethash', 'Proof of Stake')[rng.integers(3)],
+            'circulating_supply': _decimal(rng.uniform(1e6, 1e10)), 'max_supply': None,
+        })
+    bond_coupons: Dict[int, float] = {}
+    face = float(current_app.config.get('BOND_FACE_VALUE', 100))
+    for i in range(spec.bonds):
+        issuer = _company_name(rng).rsplit(' ', 1)[0]
+        currency = ('USD', 'USD', 'USD', 'EUR', 'GBP')[rng.integers(5)]
+        coupon = round(float(rng.uniform(0.005, 0.07)), 5)
+        maturity = end + timedelta(days=int(rng.integers(180, 30 * 365)))
+        bond_coupons[len(base_rows)] = coupon * face
+        add('BOND', f'{issuer.split()[0][:4].upper()}{maturity:%y%m%d}{i:05d}'[:30], f'{issuer} {coupon:.2%} {maturity:%Y}',
+            currency, 'OTC', {
+                'issuer': issuer, 'maturity_date': maturity, 'coupon_rate': _decimal(coupon, 5),
+                'credit_rating': CREDIT_RATINGS[rng.integers(len(CREDIT_RATINGS))], 'bond_type': 'CORPORATE',
+            })
+
+    count = len(base_rows)
+    kind_array = np.array(kinds)
+    start_prices = np.where(kind_array == 'CASH', 1.0, np.exp(rng.normal(3.5, 1.1, count)))
+    start_prices = np.where(kind_array == 'CRYPTO', np.exp(rng.normal(1.0, 3.0, count)), start_prices)
+    start_prices = np.where(kind_array == 'BOND', rng.uniform(90, 105, count), start_prices)
+    volatility = np.select(
+        [kind_array == 'CASH', kind_array == 'BOND', kind_array == 'CRYPTO', kind_array == 'ETF'],
+        [0.0, 0.04, 0.8, 0.15], rng.uniform(0.2, 0.5, count),
+    )
+    drift = np.where(kind_array == 'BOND', 0.0, rng.normal(0.06, 0.05, count))
+    paths = _price_paths(rng, start_prices, drift, volatility, days)
+
+    # Option chains: monthly expiries over the next half year, strikes around the final spot
+    underlying, option_terms = {}, {}
+    stock_indices = [i for i, kind in enumerate(kinds) if kind == 'STOCK'][:spec.option_underlyings]
+    expiries = []
+    for offset in range(1, 7):
+        years_ahead, month = divmod(end.month - 1 + offset, 12)
+        first = date(end.year + years_ahead, month + 1, 1)
+        expiries.append(first + timedelta(days=(4 - first.weekday()) % 7 + 14))  # Third Friday
+    for stock in stock_indices:
+        spot = float(paths[stock, -1])
+        for expiry in expiries:
+            for offset in np.linspace(-0.25, 0.25, 11):
+                strike = float(round(spot * (1 + offset), 2 if spot < 50 else 0)) or 0.01
+                for is_call in (True, False):
+                    letter = 'C' if is_call else 'P'
+                    symbol = f'{base_rows[stock]["symbol"]}{expiry:%y%m%d}{letter}{int(strike * 1000):08d}'
+                    underlying[len(base_rows)] = stock
+                    option_terms[len(base_rows)] = (strike, expiry, is_call)
+                    add('OPTION', symbol, f'{base_rows[stock]["symbol"]} {expiry:%b %d %Y} {strike:g} {letter}',
+                        'USD', 'OPRA', {
+                            'underlying_asset_id': None, 'option_type': OptionTypeEnum.CALL if is_call else OptionTypeEnum.PUT,
+                            'strike_price': _decimal(strike), 'expiration_date': expiry, 'delta': None, 'gamma': None,
+                            'theta': None, 'vega': None, 'implied_volatility': None,
+                        })
+
+    # Closing prices as of the end date
+    end_at = datetime.combine(end, time(21), tzinfo=timezone.utc)
+    for index, row in enumerate(base_rows):
+        if row['asset_type'] == 'OPTION':
+            strike, expiry, is_call = option_terms[index]
+            price = _black_scholes(float(paths[underlying[index], -1]), strike, (expiry - end).days / 365.0,
+                                   OPTION_VOLATILITY, is_call)
+            row['last_price'] = _decimal(max(price, 0.01))
+        else:
+            row['last_price'] = _decimal(float(paths[index, -1]))
+        row['last_price_at'] = end_at
+
+    ids = bulk_insert(session, Asset.__table__, base_rows, return_ids=True)
+    tables = {'STOCK': Stock, 'ETF': ETF, 'CRYPTO': CryptoCurrency, 'BOND': Bond, 'OPTION': OptionContract,
+              'CASH': CashCurrency}
+    for kind, model in tables.items():
+        rows = []
+        for index, (asset_id, detail) in enumerate(zip(ids, details)):
+            if kinds[index] != kind:
+                continue
+            if kind == 'OPTION':
+                detail = dict(detail, underlying_asset_id=ids[underlying[index]])
+            rows.append(dict(detail, id=asset_id))
+        bulk_insert(session, model.__table__, rows)
+        summary.add(f'assets_{kind.lower()}', len(rows))
+
+    # Zipf popularity: rank order is a random permutation, scaled per asset type
+    ranks = rng.permutation(len(kinds)) + 1
+    weights = np.array([KIND_POPULARITY[kind] for kind in kinds]) / ranks ** 1.1
+    return _Universe(
+        ids=ids, symbols=[row['symbol'] for row in base_rows], kinds=kinds, currencies=[row['currency'] for row in base_rows], paths=paths,
+        weights=weights / weights.sum(), underlying=underlying, option_terms=option_terms, bond_coupons=bond_coupons,
+    )
+
+
+def _insert_owners(session, rng: np.random.Generator, spec: SyntheticSpec, benchmark: Optional[str],
+                   now: datetime, summary: SyntheticSummary) -> List[tuple]:
+    """Users, their portfolios and accounts; returns (account_id, currency, account_type) per account."""
+    # PBKDF2 is deliberately slow, so every synthetic user shares one hash of the password '<prefix>-password'
+    template = User(username='template', email='template@example.invalid')
+    template.set_password(f'{spec.prefix}-password')
+    users = [
+        {'username': f'{spec.prefix}_{i:06d}', 'email': f'{spec.prefix}_{i:06d}@example.invalid',
+         'password_hash': template.password_hash, 'created_at': now, 'email_verified': True, 'last_login_at': None}
+        for i in range(spec.users)
+    ]
+    user_ids = bulk_insert(session, User.__table__, users, return_ids=True)
+
+    currency_names = [c for c, _ in ACCOUNT_CURRENCIES]
+    currency_p = np.array([share for _, share in ACCOUNT_CURRENCIES])
+    portfolios = []
+    for user_id, portfolios_per_user in zip(user_ids, 1 + rng.poisson(0.6, len(user_ids))):
+        for n in range(portfolios_per_user):
+            portfolios.append({
+                'name': ('Main', 'Retirement', 'Speculative', 'Kids', 'Income')[n % 5],
+                'description': None, 'base_currency': currency_names[rng.choice(len(currency_names), p=currency_p)],
+                'benchmark_ticker': benchmark, 'created_at': now, 'nav_watermark_id': None, 'user_id': user_id,
+            })
+    portfolio_ids = bulk_insert(session, Portfolio.__table__, portfolios, return_ids=True)
+
+    accounts = []
+    for portfolio_id, portfolio in zip(portfolio_ids, portfolios):
+        for n in range(1 + rng.poisson(1.0)):
+            currency = portfolio['base_currency'] if rng.random() < 0.7 else \
+                currency_names[rng.choice(len(currency_names), p=currency_p)]
+            account_type = ACCOUNT_TYPES[rng.integers(len(ACCOUNT_TYPES))]
+            accounts.append({
+                'name': f'{account_type.title()} {n + 1}', 'account_type': account_type, 'custodian': None,
+                'account_number_masked': f'****{rng.integers(10000):04d}', 'currency': currency,
+                'cash_balance': Decimal('0'), 'created_at': now, 'last_synced_at': None, 'is_active': True,
+                'portfolio_id': portfolio_id,
+            })
+    account_ids = bulk_insert(session, Account.__table__, accounts, return_ids=True)
+    summary.add('users', len(user_ids))
+    summary.add('portfolios', len(portfolio_ids))
+    summary.add('accounts', len(account_ids))
+    return [(account_id, row['currency'], row['account_type']) for account_id, row in zip(account_ids, accounts)]
+
+
+# ---------------------------
+# Transaction History
+# ---------------------------
+def _account_history(rng: np.random.Generator, universe: _Universe, fx: Dict[str, np.ndarray], account: tuple,
+                     count: int, start: datetime, days: int):
+    """
+    Yields (transaction row, cash effect in the account currency) for one account,
+    in time order. Sells never exceed the quantity held, so lot matching has no shortfalls.
+    """
+    account_id, account_currency, account_type = account
+    kinds = universe.kinds
+
+    # Each account holds a power-law sized slice of the universe, drawn by popularity
+    weights = universe.weights
+    if account_type == 'CRYPTO_EXCHANGE':
+        weights = np.where(np.array(kinds) == 'CRYPTO', weights, 0.0)
+        weights = weights / weights.sum()
+    available = int(np.count_nonzero(weights))
+    breadth = int(min(available, max(1, count // 4), 1 + 3 * rng.pareto(1.2)))
+    slice_ = rng.choice(len(weights), breadth, replace=False, p=weights)
+    slice_weights = weights[slice_] / weights[slice_].sum()
+
+    seconds = np.sort(rng.integers(0, days * 86400, count))
+    event_p = np.array([share for _, share in EVENT_TYPES])
+    events = rng.choice(len(EVENT_TYPES), count, p=event_p)
+    picks = slice_[rng.choice(breadth, count, p=slice_weights)]
+    draws = rng.random((count, 3))
+    noise = rng.standard_normal(count)
+
+    held: Dict[int, Decimal] = {}
+
+    def convert(amount: float, currency: str, day: int) -> float:
+        return amount * fx[account_currency][day] / fx[currency][day]
+
+    def row(transaction_type, moment, asset_index, quantity, price, commission, currency, description=None):
+        parsed = {
+            'transaction_time': moment, 'transaction_type': transaction_type, 'quantity': quantity,
+            'price_per_unit': price, 'commission': commission, 'fees': Decimal('0'), 'currency': currency,
+            'strategy_tag': None, 'description': description,
+        }
+        asset_id = universe.ids[asset_index] if asset_index is not None else None
+        effect = convert(cash_effect(transaction_type, quantity, price, commission, 0), currency, (moment - start).days)
+        return build_transaction_row(account_id, asset_id, parsed, account_currency), effect
+
+    for i in range(count):
+        # Microsecond offsets keep times unique per account, so fingerprints never collide
+        moment = start + timedelta(seconds=int(seconds[i]), microseconds=i % 1_000_000)
+        day = (moment - start).days
+        event = EVENT_TYPES[events[i]][0]
+        u_size, u_pick, u_cost = draws[i]
+        if event in (T.DIVIDEND_CASH, T.BOND_COUPON):
+            payers = ('BOND',) if event is T.BOND_COUPON else ('STOCK', 'ETF')
+            candidates = [asset for asset in held if kinds[asset] in payers]
+            if not candidates:
+                event = T.BUY  # Nothing held pays out yet
+
+        if i == 0 or event is T.DEPOSIT:
+            amount = _decimal(1000 * math.exp(3 * u_size), CASH_QUANTUM)
+            result = row(T.DEPOSIT, moment, None, None, amount, None, account_currency, 'Synthetic deposit')
+        elif event in (T.WITHDRAWAL, T.FEE, T.INTEREST):
+            scale = {T.WITHDRAWAL: 500.0, T.FEE: 10.0, T.INTEREST: 25.0}[event]
+            amount = _decimal(scale * (0.2 + u_size), CASH_QUANTUM)
+            result = row(event, moment, None, None, amount, None, account_currency)
+        elif event in (T.DIVIDEND_CASH, T.BOND_COUPON):
+            asset = candidates[int(u_pick * len(candidates))]
+            if event is T.BOND_COUPON:
+                amount = float(held[asset]) * universe.bond_coupons[asset] / 2
+            else:
+                amount = float(held[asset]) * _price_on(universe.paths, asset, day, noise[i]) * 0.005
+            result = row(event, moment, asset, None, _decimal(max(amount, 0.01), CASH_QUANTUM), None,
+                         universe.currencies[asset])
+        else:
+            is_sell = event is T.SELL and bool(held)
+            if is_sell:
+                open_assets = list(held)
+                asset = open_assets[int(u_pick * len(open_assets))]
+            else:
+                asset = int(picks[i])
+            kind = kinds[asset]
+            if kind == 'OPTION':
+                strike, expiry, is_call = universe.option_terms[asset]
+                if not is_sell and days - day > OPTION_TRADING_DAYS:
+                    asset, kind = universe.underlying[asset], 'STOCK'  # Before the listing window: trade the stock
+                else:
+                    spot = _price_on(universe.paths, universe.underlying[asset], day, noise[i])
+                    years = max((expiry - moment.date()).days, 1) / 365.0
+                    price = max(_black_scholes(spot, strike, years, OPTION_VOLATILITY, is_call), 0.01)
+            if kind != 'OPTION':
+                price = _price_on(universe.paths, asset, day, noise[i])
+
+            if is_sell:
+                fraction = 1.0 if u_size > 0.6 else 0.2 + u_size
+                quantity = held[asset] if fraction >= 1 else held[asset] * _decimal(fraction, 2)
+                quantity = quantity.quantize(Decimal(1)) if kind in ('STOCK', 'ETF', 'OPTION', 'BOND') \
+                    else quantity.quantize(Decimal('0.00000001'))
+                if quantity <= 0:
+                    quantity = held[asset]
+            elif kind == 'CRYPTO':
+                quantity = _decimal(max(2000 * u_size / price, 1e-6))
+            elif kind == 'OPTION':
+                quantity = Decimal(1 + int(10 * u_size ** 2))
+            else:
+                quantity = Decimal(max(1, int(5000 * u_size ** 2 / price)))
+
+            transaction_type = (T.OPTION_SELL if is_sell else T.OPTION_BUY) if kind == 'OPTION' else \
+                (T.SELL if is_sell else T.BUY)
+            commission = _decimal(round(5 * u_cost, 2), CASH_QUANTUM)
+            result = row(transaction_type, moment, asset, quantity, _decimal(price), commission, universe.currencies[asset])
+            remaining = held.get(asset, Decimal('0')) + (-quantity if is_sell else quantity)
+            if remaining > 0:
+                held[asset] = remaining
+            else:
+                held.pop(asset, None)
+        yield result
+
+
+def generate_dataset(spec: SyntheticSpec, progress: Optional[Callable[[str], None]] = None) -> SyntheticSummary:
+    """
+    Generates spec's dataset, committing as it goes: reference data and owners
+    first, then transactions per account in batches through write_transactions,
+    so lots, disposals and positions are derived exactly as an import would.
+    Holdings follow power laws: asset popularity is Zipf, transactions per
+    account and the number of distinct assets an account trades are Pareto.
+    """
+    if spec.users < 1 or spec.transactions < 1 or spec.stocks < max(spec.option_underlyings, 1):
+        raise SyntheticDataError('Need at least one user, one transaction and as many stocks as option underlyings')
+    first_username = f'{spec.prefix}_{0:06d}'
+    if db.session.execute(select(User.id).where(User.username == first_username)).first() is not None:
+        raise SyntheticDataError(f'A dataset with prefix {spec.prefix!r} already exists; choose another prefix')
+
+    progress = progress or (lambda message: None)
+    batch_size = spec.batch_size or current_app.config.get('IMPORT_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+    rng = np.random.default_rng(spec.seed)
+    end = spec.end_date or datetime.now(timezone.utc).date()
+    days = 365 * spec.years
+    start = end - timedelta(days=days)
+    start_at = datetime.combine(start, time.min, tzinfo=timezone.utc)
+    now = datetime.now(timezone.utc)
+    session = db.session
+    summary = SyntheticSummary()
+
+    fx = _generate_fx(rng, days)
+    quotes = [
+        (start + timedelta(days=day), 'USD', currency, round(float(series[day]), 8))
+        for currency, series in fx.items() if currency != 'USD'
+        for day in range(days + 1)
+    ]
+    summary.add('fx_rates', store_rates(quotes))
+    session.commit()
+    progress(f"{summary.counts['fx_rates']} FX rates")
+
+    universe = _insert_assets(session, rng, spec, start, days, now, summary)
+    benchmark = universe.symbols[universe.kinds.index('ETF')] if 'ETF' in universe.kinds else None
+    accounts = _insert_owners(session, rng, spec, benchmark, now, summary)
+    session.commit()
+    progress(f'{len(universe.ids)} assets, {summary.counts["users"]} users, {len(accounts)} accounts')
+
+    # Pareto transaction counts: a handful of hyperactive accounts and a long tail of small ones
+    activity = rng.pareto(1.16, len(accounts)) + 1
+    counts = rng.multinomial(max(spec.transactions - 2 * len(accounts), 0), activity / activity.sum()) + 2
+
+    batch: List[dict] = []
+    balances: Dict[int, float] = {}
+
+    def flush():
+        result = write_transactions(session, batch)
+        session.commit()
+        summary.add('transactions', len(result.inserted))
+        summary.add('lots', len(result.lots))
+        batch.clear()
+
+    for account, count in zip(accounts, counts.tolist()):
+        balance = 0.0
+        for transaction_row, effect in _account_history(rng, universe, fx, account, count, start_at, days):
+            batch.append(transaction_row)
+            balance += effect
+            if len(batch) >= batch_size:
+                flush()
+                progress(f"{summary.counts['transactions']} transactions")
+        balances[account[0]] = balance
+    if batch:
+        flush()
+
+    account_table = Account.__table__
+    session.execute(
+        update(account_table).where(account_table.c.id == bindparam('b_id')).values(cash_balance=bindparam('cash')),
+        [{'b_id': account_id, 'cash': _decimal(balance)} for account_id, balance in balances.items()],
+    )
+    session.commit()
+    progress(f"{summary.counts.get('transactions', 0)} transactions, {summary.counts.get('lots', 0)} lots")
+    return summary
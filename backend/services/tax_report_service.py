@@ -0,0 +1,185 @@
+# backend/services/tax_report_service.py
+from __future__ import annotations
+
+import csv
+import io
+import json
+from collections import deque
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from itertools import groupby
+from typing import Iterable, Iterator, Optional, Sequence
+
+from flask import current_app
+from sqlalchemy import select
+
+from .. import db
+from ..models.asset import Asset
+from ..models.lot import Lot
+from ..models.lot_disposal import LotDisposal
+from ..models.transaction import Transaction
+from .portfolio_service import POSITION_QUANTUM, _as_utc
+
+WASH_SALE_WINDOW = timedelta(days=30)
+DEFAULT_YIELD_PER = 2000
+CHUNK_ROWS = 500  # Rows rendered per chunk of the HTTP response
+
+REPORT_COLUMNS = (
+    'account_id', 'asset_id', 'symbol', 'lot_id', 'sell_transaction_id', 'quantity',
+    'purchase_date', 'sale_date', 'holding_days', 'term', 'cost_basis', 'proceeds', 'gain',
+    'currency', 'wash_sale',
+)
+
+
+def is_long_term(purchase_date: date, sale_date: date) -> bool:
+    """Held more than one year: sold after the first anniversary of the purchase."""
+    try:
+        anniversary = purchase_date.replace(year=purchase_date.year + 1)
+    except ValueError:  # Bought on Feb 29
+        anniversary = purchase_date.replace(year=purchase_date.year + 1, day=28)
+    return sale_date > anniversary
+
+
+def iter_realized_gains(account_ids: Sequence[int], start: datetime, end: datetime,
+                        wash_sale_account_ids: Optional[Sequence[int]] = None,
+                        yield_per: Optional[int] = None) -> Iterator[dict]:
+    """
+    Yields one dict per lot disposal with a sale in [start, end), ordered by asset
+    then sale date. Two server-side cursors run side by side: the disposals, and
+    the purchases (lots) that could trigger a wash sale, both sorted by
+    (asset, date). Purchases are merged into a sliding +/-30 day window per
+    disposal, so memory holds one batch of each cursor plus that window.
+
+    A loss is flagged as a wash sale when replacement shares of the same asset were
+    bought in wash_sale_account_ids (default: account_ids) within 30 days of the
+    sale: a lot bought after the sale, or one bought before it that was still open
+    afterwards. Lots the sale itself consumed never count.
+    The flag is informational; disallowed amounts are not computed.
+    """
+    yield_per = yield_per or current_app.config.get('REPORT_YIELD_PER', DEFAULT_YIELD_PER)
+    account_ids = list(account_ids)
+    wash_sale_account_ids = list(wash_sale_account_ids) if wash_sale_account_ids is not None else account_ids
+    if not account_ids:
+        return
+
+    disposals = db.session.execute(
+        select(LotDisposal.account_id, LotDisposal.asset_id, Asset.symbol, LotDisposal.lot_id,
+               LotDisposal.sell_transaction_id, LotDisposal.quantity, LotDisposal.cost_basis_per_unit,
+               LotDisposal.purchase_date, LotDisposal.sale_date, Transaction.quantity, Transaction.price_per_unit,
+               Transaction.commission, Transaction.fees, Transaction.currency)
+        .join(Transaction, LotDisposal.sell_transaction_id == Transaction.id)
+        .join(Asset, LotDisposal.asset_id == Asset.id)
+        .where(LotDisposal.account_id.in_(account_ids), LotDisposal.sale_date >= start, LotDisposal.sale_date < end)
+        .order_by(LotDisposal.asset_id, LotDisposal.sale_date, LotDisposal.id)
+        .execution_options(yield_per=yield_per)
+    )
+    purchases = db.session.execute(
+        select(Lot.asset_id, Lot.purchase_date, Lot.id, Lot.closed_at)
+        .where(Lot.account_id.in_(wash_sale_account_ids), Lot.asset_id.is_not(None),
+               Lot.purchase_date >= start - WASH_SALE_WINDOW, Lot.purchase_date <= end + WASH_SALE_WINDOW)
+        .order_by(Lot.asset_id, Lot.purchase_date, Lot.id)
+        .execution_options(yield_per=yield_per)
+    )
+
+    try:
+        pending = next(purchases, None)
+        window: deque = deque()  # (purchase_date, lot_id, closed_at) of the current asset around the current sale
+        current_asset = None
+        # Disposals of one sell are adjacent; a sell is handled as a group so its own lots are known
+        for sell_id, group in groupby(disposals, key=lambda row: row[4]):
+            group = list(group)
+            asset_id, sale_date = group[0][1], _as_utc(group[0][8])
+            if asset_id != current_asset:
+                window.clear()
+                current_asset = asset_id
+            while pending is not None and (
+                pending[0] < asset_id or (pending[0] == asset_id and _as_utc(pending[1]) <= sale_date + WASH_SALE_WINDOW)
+            ):
+                if pending[0] == asset_id:
+                    window.append((_as_utc(pending[1]), pending[2], pending[3] and _as_utc(pending[3])))
+                pending = next(purchases, None)
+            while window and window[0][0] < sale_date - WASH_SALE_WINDOW:
+                window.popleft()
+
+            # Replacement shares: bought after the sale, or bought before it and still held afterwards.
+            # Lots this sell (or an earlier one) used up are the shares sold, not replacements.
+            consumed = {row[3] for row in group}
+            replaced = any(
+                lot not in consumed and (bought > sale_date or closed is None or closed > sale_date)
+                for bought, lot, closed in window
+            )
+            for (account_id, asset_id, symbol, lot_id, sell_id, quantity, cost_per_unit, purchase_date, _,
+                 sell_quantity, price, commission, fees, currency) in group:
+                purchase_date = _as_utc(purchase_date)
+                cost = (quantity * cost_per_unit).quantize(POSITION_QUANTUM)
+                proceeds = gain = None
+                if price is not None:
+                    selling_costs = ((commission or 0) + (fees or 0)) * quantity / sell_quantity if sell_quantity else 0
+                    proceeds = (quantity * price - selling_costs).quantize(POSITION_QUANTUM)
+                    gain = proceeds - cost
+
+                yield {
+                    'account_id': account_id,
+                    'asset_id': asset_id,
+                    'symbol': symbol,
+                    'lot_id': lot_id,
+                    'sell_transaction_id': sell_id,
+                    'quantity': quantity,
+                    'purchase_date': purchase_date.date(),
+                    'sale_date': sale_date.date(),
+                    'holding_days': (sale_date.date() - purchase_date.date()).days,
+                    'term': 'LONG' if is_long_term(purchase_date.date(), sale_date.date()) else 'SHORT',
+                    'cost_basis': cost,
+                    'proceeds': proceeds,
+                    'gain': gain,
+                    'currency': currency,
+                    'wash_sale': gain is not None and gain < 0 and replaced,
+                }
+    finally:
+        disposals.close()
+        purchases.close()
+
+
+def _text(value) -> str:
+    if value is None:
+        return ''
+    if isinstance(value, Decimal):
+        return format(value, 'f')
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value)
+
+
+def render_csv(rows: Iterable[dict], chunk_rows: int = CHUNK_ROWS) -> Iterator[str]:
+    """CSV text in chunks of chunk_rows rows; the header goes out before the first row is fetched."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(REPORT_COLUMNS)
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    count = 0
+    for row in rows:
+        writer.writerow([_text(row[column]) for column in REPORT_COLUMNS])
+        count += 1
+        if count % chunk_rows == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def render_jsonl(rows: Iterable[dict], chunk_rows: int = CHUNK_ROWS) -> Iterator[str]:
+    """One JSON object per line, chunk_rows lines per chunk. Amounts are strings to keep full precision."""
+    chunk = []
+    for row in rows:
+        chunk.append(json.dumps({
+            column: row[column] if isinstance(row[column], (bool, int)) or row[column] is None else _text(row[column])
+            for column in REPORT_COLUMNS
+        }) + '\n')
+        if len(chunk) >= chunk_rows:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
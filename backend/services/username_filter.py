@@ -0,0 +1,272 @@
+# backend/services/username_filter.py
+# Per-worker Bloom filter of every username and email, so availability checks
+# (called on each keystroke of the registration form) only reach the database
+# when the name might already be taken. A Bloom filter has no false negatives
+# for what it was given: "absent" is definite for every user this worker knows
+# about. Registrations committed here are added immediately; users created by
+# other workers are picked up by a catch-up read of recent registrations every
+# USERNAME_FILTER_CATCHUP_SECONDS, and the periodic full resync also drops
+# deleted users and resizes the filter. A name taken within that short window
+# may still be reported available; /register rejects it with a 409 regardless.
+from __future__ import annotations
+
+import hashlib
+import logging
+import math
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, List, Optional, Set
+
+import numpy as np
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+from .. import db
+from ..models.user import User
+
+logger = logging.getLogger(__name__)
+
+MIN_CAPACITY = 10_000
+CAPACITY_HEADROOM = 2       # Sized for twice the current users, so registrations don't degrade it before a resync
+LOAD_BATCH_SIZE = 10000
+# Catch-ups re-read registrations from this long before the last full build, covering
+# clock skew between workers and users committed just after the build read the table
+CATCHUP_OVERLAP = timedelta(minutes=1)
+_MASK64 = (1 << 64) - 1
+
+
+def _username_key(username: str) -> str:
+    return f'u:{username}'  # Usernames are matched case-sensitively, like the users.username lookup
+
+
+def _email_key(email: str) -> str:
+    return f'e:{email.lower()}'
+
+
+def _hash_pair(key: str):
+    digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+    return int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+
+
+class BloomFilter:
+    """
+    Bit array of `bits` bits with `hashes` probes per key, derived by double
+    hashing (h1 + i * h2) from one 128-bit BLAKE2b digest. Lookups take no lock;
+    adds are serialized so concurrent read-modify-writes of a byte can't lose bits.
+    """
+
+    def __init__(self, capacity: int, false_positive_rate: float = 0.01):
+        capacity = max(capacity, 1)
+        self.bits = max(64, int(math.ceil(-capacity * math.log(false_positive_rate) / math.log(2) ** 2)))
+        self.hashes = max(1, round(self.bits / capacity * math.log(2)))
+        self.capacity = capacity
+        self.count = 0
+        self._array = np.zeros((self.bits + 7) // 8, dtype=np.uint8)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_keys(cls, keys: List[str], capacity: int, false_positive_rate: float = 0.01) -> 'BloomFilter':
+        """Bulk build: digests in Python, bit positions and packing in numpy."""
+        bloom = cls(capacity, false_positive_rate)
+        if keys:
+            pairs = np.array([_hash_pair(key) for key in keys], dtype=np.uint64)
+            probes = np.arange(bloom.hashes, dtype=np.uint64)
+            with np.errstate(over='ignore'):
+                positions = (pairs[:, :1] + probes * pairs[:, 1:]) % np.uint64(bloom.bits)
+            flags = np.zeros(len(bloom._array) * 8, dtype=bool)
+            flags[positions.ravel().astype(np.int64)] = True
+            bloom._array = np.packbits(flags, bitorder='little')
+            bloom.count = len(keys)
+        return bloom
+
+    def _positions(self, key: str):
+        h1, h2 = _hash_pair(key)
+        return [((h1 + i * h2) & _MASK64) % self.bits for i in range(self.hashes)]
+
+    def add(self, key: str) -> None:
+        positions = self._positions(key)
+        with self._lock:
+            for position in positions:
+                self._array[position >> 3] |= 1 << (position & 7)
+            self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        array = self._array
+        return all(array[position >> 3] >> (position & 7) & 1 for position in self._positions(key))
+
+
+def load_user_keys() -> List[str]:
+    keys = []
+    stmt = select(User.username, User.email).execution_options(yield_per=LOAD_BATCH_SIZE)
+    for username, email in db.session.execute(stmt):
+        keys.append(_username_key(username))
+        keys.append(_email_key(email))
+    return keys
+
+
+class UsernameFilter:
+    """
+    Owns one app's BloomFilter: built on first use (or at worker start via
+    warm_username_filter), rebuilt from the database on a background thread
+    every USERNAME_FILTER_RESYNC_SECONDS. Keys added while a rebuild runs are
+    replayed into the new filter before it is swapped in. In between, a lookup
+    at most every USERNAME_FILTER_CATCHUP_SECONDS first adds the users created
+    since the last build (one query on ix_users_created_at), so registrations
+    made in other workers become visible within seconds.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.resync_seconds = app.config.get('USERNAME_FILTER_RESYNC_SECONDS', 300)
+        self.catchup_seconds = app.config.get('USERNAME_FILTER_CATCHUP_SECONDS', 5)
+        self.false_positive_rate = app.config.get('USERNAME_FILTER_FALSE_POSITIVE_RATE', 0.01)
+        self.bloom: Optional[BloomFilter] = None
+        self.built_at = 0.0
+        self.caught_up_at = 0.0
+        self._recent_since = datetime.now(timezone.utc)    # Registrations from here on are re-read by catch-ups
+        self._recent_ids: Set[int] = set()                 # Users catch-ups already added to the current filter
+        self._lock = threading.Lock()
+        self._catchup_lock = threading.Lock()
+        self._rebuilding = False
+        self._missed: List[str] = []
+
+    def _build(self):
+        """A filter of every user, and the wall-clock time from which catch-ups must look."""
+        since = datetime.now(timezone.utc) - CATCHUP_OVERLAP
+        keys = load_user_keys()
+        return BloomFilter.from_keys(keys, max(MIN_CAPACITY, CAPACITY_HEADROOM * len(keys)), self.false_positive_rate), since
+
+    def _swap(self, bloom: BloomFilter, since: datetime) -> None:
+        """Installs a freshly built filter; the caller holds _lock."""
+        self.bloom, self._recent_since, self._recent_ids = bloom, since, set()
+        self.built_at = self.caught_up_at = time.monotonic()
+
+    def _current(self) -> BloomFilter:
+        bloom = self.bloom
+        if bloom is None:
+            with self._lock:
+                if self.bloom is None:
+                    self._swap(*self._build())
+                bloom = self.bloom
+        elif time.monotonic() - self.built_at > self.resync_seconds:
+            self._resync_in_background()
+        elif time.monotonic() - self.caught_up_at >= self.catchup_seconds:
+            self._catch_up(bloom)
+        return bloom
+
+    def _catch_up(self, bloom: BloomFilter) -> None:
+        """Adds users registered (by any worker) since the filter was built; one lookup at a time runs it."""
+        if not self._catchup_lock.acquire(blocking=False):
+            return
+        try:
+            recent = db.session.execute(
+                select(User.id, User.username, User.email).where(User.created_at >= self._recent_since)
+            ).all()
+            for user_id, username, email in recent:
+                if user_id not in self._recent_ids:
+                    self._recent_ids.add(user_id)
+                    self.add([_username_key(username), _email_key(email)], bloom)
+            self.caught_up_at = time.monotonic()
+        except Exception:
+            logger.exception('Username filter catch-up failed; relying on the next resync')
+            self.caught_up_at = time.monotonic()
+        finally:
+            self._catchup_lock.release()
+
+    def might_have_username(self, username: str) -> bool:
+        return _username_key(username) in self._current()
+
+    def might_have_email(self, email: str) -> bool:
+        return _email_key(email) in self._current()
+
+    def add(self, keys: Iterable[str], bloom: Optional[BloomFilter] = None) -> None:
+        keys = list(keys)
+        with self._lock:  # Also waits out a first build in progress, which may predate these users
+            bloom = bloom or self.bloom
+            if bloom is None:
+                return  # The first lookup builds from the database, which will include these users
+            if self._rebuilding:
+                self._missed.extend(keys)
+        for key in keys:
+            bloom.add(key)
+
+    def _resync_in_background(self) -> None:
+        with self._lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+            self._missed = []
+        threading.Thread(target=self._resync, daemon=True, name='username-filter-resync').start()
+
+    def _resync(self) -> None:
+        try:
+            with self.app.app_context():
+                try:
+                    bloom, since = self._build()
+                finally:
+                    db.session.remove()
+            with self._lock:
+                for key in self._missed:
+                    bloom.add(key)
+                self._swap(bloom, since)
+        except Exception:
+            logger.exception('Username filter resync failed; keeping the previous filter')
+            self.built_at = time.monotonic()  # Don't retry on every lookup
+        finally:
+            with self._lock:
+                self._rebuilding = False
+                self._missed = []
+
+
+def get_username_filter() -> UsernameFilter:
+    username_filter = current_app.extensions.get('username_filter')
+    if username_filter is None:
+        username_filter = current_app.extensions['username_filter'] = UsernameFilter(current_app._get_current_object())
+    return username_filter
+
+
+def warm_username_filter(app) -> None:
+    """Builds the filter up front (gunicorn post_worker_init), so no user-facing request pays for it."""
+    with app.app_context():
+        try:
+            get_username_filter().might_have_username('')
+        except Exception:
+            logger.exception('Username filter warm-up failed; it will be built on first use')
+        finally:
+            db.session.remove()
+
+
+# ---------------------------
+# Change Tracking
+# ---------------------------
+# New users flushed in a session are added once the transaction commits, the
+# same way asset_search tracks Asset changes; a rollback discards them.
+# Renamed users keep their old keys until the next resync (a false positive only).
+@event.listens_for(Session, 'after_flush')
+def _collect_new_users(session, flush_context):
+    keys = session.info.setdefault('username_filter_keys', [])
+    for instance in session.new | session.dirty:
+        if not isinstance(instance, User):
+            continue
+        state = inspect(instance)
+        if instance in session.new or state.attrs.username.history.has_changes():
+            keys.append(_username_key(instance.username))
+        if instance in session.new or state.attrs.email.history.has_changes():
+            keys.append(_email_key(instance.email))
+
+
+@event.listens_for(Session, 'after_commit')
+def _publish_new_users(session):
+    keys = session.info.pop('username_filter_keys', None)
+    if keys and has_app_context():
+        username_filter = current_app.extensions.get('username_filter')
+        if username_filter is not None:
+            username_filter.add(keys)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_new_users(session, previous_transaction):
+    if not session.in_transaction():
+        session.info.pop('username_filter_keys', None)
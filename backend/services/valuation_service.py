@@ -0,0 +1,209 @@
+# backend/services/valuation_service.py
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Mapping, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import select
+
+from .. import db
+from ..models.account import Account
+from ..models.asset import Asset
+from ..models.portfolio import Portfolio
+from ..models.position import Position
+from .fx_service import fx_rates_to
+from .quote_cache import AssetRef, get_quote_cache
+
+# fx(currencies, base) -> float array of "units of base per unit of currency", NaN where unknown
+FxProvider = Callable[[Sequence[str], str], np.ndarray]
+
+
+def same_currency_fx(currencies: Sequence[str], base_currency: str) -> np.ndarray:
+    """Fallback FX provider: 1.0 for the base currency, NaN (unknown) for anything else."""
+    return np.array([1.0 if currency == base_currency else np.nan for currency in currencies], dtype=float)
+
+
+@dataclass
+class PortfolioValuation:
+    """Result of one vectorized valuation pass; per-position arrays share the same order."""
+    base_currency: str
+    account_ids: np.ndarray
+    asset_ids: np.ndarray
+    symbols: List[str]
+    quantity: np.ndarray
+    price: np.ndarray           # Asset currency, NaN when no quote is known
+    fx_rate: np.ndarray         # Asset currency -> base currency, NaN when unknown
+    market_value: np.ndarray    # Base currency
+    cost_basis: np.ndarray      # Base currency
+    unrealized_pnl: np.ndarray  # Base currency
+    weight: np.ndarray          # Share of total_value
+    cash_by_account: Dict[int, float]  # Base currency
+    missing_prices: List[int]   # Asset ids valued at nothing for lack of a quote
+    missing_fx: List[str]       # Currencies that could not be converted to base
+
+    @property
+    def total_market_value(self) -> float:
+        return float(np.nansum(self.market_value))
+
+    @property
+    def total_cash(self) -> float:
+        return float(np.nansum(list(self.cash_by_account.values()))) if self.cash_by_account else 0.0
+
+    @property
+    def total_value(self) -> float:
+        return self.total_market_value + self.total_cash
+
+    @property
+    def total_unrealized_pnl(self) -> float:
+        return float(np.nansum(self.unrealized_pnl))
+
+    def to_dict(self) -> dict:
+        def _num(value):
+            return None if np.isnan(value) else round(float(value), 8)
+
+        positions = [
+            {
+                'account_id': int(self.account_ids[i]),
+                'asset_id': int(self.asset_ids[i]),
+                'symbol': self.symbols[i],
+                'quantity': _num(self.quantity[i]),
+                'price': _num(self.price[i]),
+                'fx_rate': _num(self.fx_rate[i]),
+                'market_value': _num(self.market_value[i]),
+                'cost_basis': _num(self.cost_basis[i]),
+                'unrealized_pnl': _num(self.unrealized_pnl[i]),
+                'weight': _num(self.weight[i]),
+            }
+            for i in range(len(self.asset_ids))
+        ]
+        return {
+            'base_currency': self.base_currency,
+            'total_value': round(self.total_value, 8),
+            'total_market_value': round(self.total_market_value, 8),
+            'total_cash': round(self.total_cash, 8),
+            'total_unrealized_pnl': round(self.total_unrealized_pnl, 8),
+            'cash_by_account': {str(k): _num(v) for k, v in self.cash_by_account.items()},
+            'positions': positions,
+            'missing_prices': self.missing_prices,
+            'missing_fx': self.missing_fx,
+        }
+
+
+# ---------------------------
+# Public API
+# ---------------------------
+def value_portfolio(portfolio: Portfolio, prices: Optional[Mapping[int, float]] = None,
+                    fx: Optional[FxProvider] = None, live: bool = False) -> PortfolioValuation:
+    """
+    Values every account and position of a portfolio together in its base currency.
+    With live=True, prices come from the shared quote cache instead of Asset.last_price.
+    """
+    return _value(Account.portfolio_id == portfolio.id, portfolio.base_currency, prices, fx, live)
+
+
+def value_accounts(account_ids: Iterable[int], base_currency: str, prices: Optional[Mapping[int, float]] = None,
+                   fx: Optional[FxProvider] = None, live: bool = False) -> PortfolioValuation:
+    """Same as value_portfolio for an explicit set of accounts and target currency."""
+    return _value(Account.id.in_(list(account_ids)), base_currency, prices, fx, live)
+
+
+# ---------------------------
+# Engine
+# ---------------------------
+# Column order of the rows value_rows() takes; _value() and valuation_stream select exactly these
+POSITION_COLUMNS = (Position.account_id, Position.asset_id, Position.quantity, Position.total_cost,
+                    Asset.symbol, Asset.currency, Asset.last_price, Asset.exchange, Asset.asset_type)
+CASH_COLUMNS = (Account.id, Account.currency, Account.cash_balance)
+
+
+def position_refs(position_rows: Sequence[Sequence]) -> List[AssetRef]:
+    """One quote-cache reference per distinct asset in rows of POSITION_COLUMNS."""
+    refs = {row[1]: AssetRef(row[1], row[4], row[7], row[8], row[5]) for row in position_rows}
+    return list(refs.values())
+
+
+def _value(account_filter, base_currency: str, prices: Optional[Mapping[int, float]],
+           fx: Optional[FxProvider], live: bool = False) -> PortfolioValuation:
+    """Two queries (positions joined to their assets, and account cash), then value_rows()."""
+    position_rows = db.session.execute(
+        select(*POSITION_COLUMNS)
+        .join(Account, Position.account_id == Account.id)
+        .join(Asset, Position.asset_id == Asset.id)
+        .where(account_filter, Position.quantity != 0)
+        .order_by(Position.account_id, Position.asset_id)
+    ).all()
+    cash_rows = db.session.execute(select(*CASH_COLUMNS).where(account_filter).order_by(Account.id)).all()
+
+    if live and position_rows:
+        live_prices = get_quote_cache().get_prices(position_refs(position_rows))
+        prices = dict(live_prices, **(prices or {}))
+    return value_rows(position_rows, cash_rows, base_currency, prices, fx)
+
+
+def value_rows(position_rows: Sequence[Sequence], cash_rows: Sequence[Sequence], base_currency: str,
+               prices: Optional[Mapping[int, float]] = None, fx: Optional[FxProvider] = None) -> PortfolioValuation:
+    """
+    Values already-loaded rows of POSITION_COLUMNS and CASH_COLUMNS in one
+    vectorized pass: price overrides via searchsorted, FX resolved once per distinct
+    currency and broadcast back, then market value, P&L and weights as array ops.
+    """
+    fx = fx or fx_rates_to
+    count = len(position_rows)
+    account_ids = np.fromiter((row[0] for row in position_rows), dtype=np.int64, count=count)
+    asset_ids = np.fromiter((row[1] for row in position_rows), dtype=np.int64, count=count)
+    quantity = np.fromiter((row[2] for row in position_rows), dtype=float, count=count)
+    total_cost = np.fromiter((row[3] for row in position_rows), dtype=float, count=count)
+    price = np.fromiter((np.nan if row[6] is None else row[6] for row in position_rows), dtype=float, count=count)
+    symbols = [row[4] for row in position_rows]
+
+    if prices:
+        price = _overlay_prices(asset_ids, price, prices)
+
+    # Resolve each distinct currency once, then broadcast to positions and cash rows
+    currencies = np.array([row[5] for row in position_rows] + [row[1] for row in cash_rows], dtype=object)
+    if len(currencies):
+        unique_currencies, inverse = np.unique(currencies.astype(str), return_inverse=True)
+        unique_rates = np.asarray(fx(list(unique_currencies), base_currency), dtype=float)
+        rates = unique_rates[inverse]
+        missing_fx = sorted(str(c) for c in unique_currencies[np.isnan(unique_rates)])
+    else:
+        rates = np.empty(0, dtype=float)
+        missing_fx = []
+    position_fx, cash_fx = rates[:count], rates[count:]
+
+    market_value = quantity * price * position_fx
+    cost_basis = total_cost * position_fx
+    unrealized_pnl = market_value - cost_basis
+
+    cash = np.fromiter((row[2] for row in cash_rows), dtype=float, count=len(cash_rows)) * cash_fx
+    total_value = np.nansum(market_value) + np.nansum(cash)
+    weight = market_value / total_value if total_value else np.zeros(count)
+
+    return PortfolioValuation(
+        base_currency=base_currency,
+        account_ids=account_ids,
+        asset_ids=asset_ids,
+        symbols=symbols,
+        quantity=quantity,
+        price=price,
+        fx_rate=position_fx,
+        market_value=market_value,
+        cost_basis=cost_basis,
+        unrealized_pnl=unrealized_pnl,
+        weight=weight,
+        cash_by_account={int(row[0]): float(value) for row, value in zip(cash_rows, cash)},
+        missing_prices=sorted(set(int(a) for a in asset_ids[np.isnan(price)])),
+        missing_fx=missing_fx,
+    )
+
+
+def _overlay_prices(asset_ids: np.ndarray, price: np.ndarray, overrides: Mapping[int, float]) -> np.ndarray:
+    """Replaces prices for the asset ids present in `overrides` without a Python loop over positions."""
+    keys = np.fromiter(overrides.keys(), dtype=np.int64, count=len(overrides))
+    values = np.fromiter(overrides.values(), dtype=float, count=len(overrides))
+    order = np.argsort(keys)
+    keys, values = keys[order], values[order]
+    index = np.clip(np.searchsorted(keys, asset_ids), 0, len(keys) - 1)
+    hit = keys[index] == asset_ids
+    return np.where(hit, values[index], price)
@@ -0,0 +1,304 @@
+# backend/services/valuation_stream.py
+# Live portfolio valuations for Server-Sent Events. Each worker runs one hub:
+# every tick it quotes the union of all watched holdings with a single
+# quote-cache call (each asset once, however many clients watch it), values
+# every watched portfolio from in-memory holdings and fans one serialized
+# delta per portfolio out to that portfolio's subscribers. Clients that fall
+# further behind than their buffer are dropped; EventSource reconnects and
+# starts again from a fresh snapshot.
+from __future__ import annotations
+
+import json
+import logging
+import queue
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from flask import current_app
+from sqlalchemy import select
+
+from .. import db
+from ..models.account import Account
+from ..models.asset import Asset
+from ..models.portfolio import Portfolio
+from ..models.position import Position
+from .quote_cache import get_quote_cache
+from .valuation_service import CASH_COLUMNS, POSITION_COLUMNS, position_refs, value_rows
+
+logger = logging.getLogger(__name__)
+
+TOTAL_FIELDS = ('total_value', 'total_market_value', 'total_cash', 'total_unrealized_pnl')
+DROPPED = object()  # Returned by Subscriber.next_message once the hub has given up on the subscriber
+
+
+class StreamCapacityError(RuntimeError):
+    """Raised when the worker already serves as many streams as stream_capacity allows."""
+
+
+def stream_capacity(config) -> int:
+    """
+    Streams one worker may hold open. Each pins a gunicorn request thread for
+    its whole life, so only VALUATION_STREAM_THREAD_SHARE of GUNICORN_THREADS
+    may be used (at most VALUATION_STREAM_MAX_SUBSCRIBERS); the rest serve the API.
+    """
+    threads = int(config.get('GUNICORN_THREADS', 64) * config.get('VALUATION_STREAM_THREAD_SHARE', 0.5))
+    return max(0, min(config.get('VALUATION_STREAM_MAX_SUBSCRIBERS', 1000), threads))
+
+
+def format_event(event: str, data: dict, event_id: Optional[int] = None) -> str:
+    """One SSE message; ids let a client spot gaps."""
+    head = f'id: {event_id}\n' if event_id is not None else ''
+    return f'{head}event: {event}\ndata: {json.dumps(data, separators=(",", ":"))}\n\n'
+
+
+class Subscriber:
+    """One open stream: a bounded buffer of serialized events for a single portfolio."""
+
+    def __init__(self, portfolio_id: int, buffer_size: int):
+        self.portfolio_id = portfolio_id
+        self.dropped = False
+        self._queue: 'queue.Queue' = queue.Queue(maxsize=buffer_size)
+
+    def offer(self, message: str) -> bool:
+        """Queues a message without blocking the hub; False (and dropped) when the buffer is full."""
+        try:
+            self._queue.put_nowait(message)
+            return True
+        except queue.Full:
+            self.dropped = True
+            return False
+
+    def next_message(self, timeout: float):
+        """The next event, DROPPED once the buffer overflowed, or None after timeout (time for a keep-alive)."""
+        if self.dropped and self._queue.empty():
+            return DROPPED
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return DROPPED if self.dropped else None
+
+
+@dataclass
+class _PortfolioState:
+    base_currency: str
+    position_rows: List[tuple] = field(default_factory=list)
+    cash_rows: List[tuple] = field(default_factory=list)
+    last: Optional[dict] = None     # Last valuation sent, as PortfolioValuation.to_dict()
+    sequence: int = 0
+
+
+def _position_key(position: dict) -> Tuple[int, int]:
+    return position['account_id'], position['asset_id']
+
+
+def valuation_delta(previous: dict, current: dict) -> Optional[dict]:
+    """Totals and positions that changed between two to_dict() valuations; None when nothing did."""
+    delta = {name: current[name] for name in TOTAL_FIELDS if current[name] != previous[name]}
+    before = {_position_key(position): position for position in previous['positions']}
+    after = {_position_key(position): position for position in current['positions']}
+    changed = [position for key, position in after.items() if before.get(key) != position]
+    removed = [list(key) for key in before if key not in after]
+    if changed:
+        delta['positions'] = changed
+    if removed:
+        delta['removed'] = removed
+    for name in ('cash_by_account', 'missing_prices', 'missing_fx'):
+        if current[name] != previous[name]:
+            delta[name] = current[name]
+    return delta or None
+
+
+class ValuationHub:
+    """
+    Per-worker multiplexer of valuation streams. A daemon thread ticks every
+    VALUATION_STREAM_TICK_SECONDS while anyone is subscribed; holdings of the
+    watched portfolios are reloaded together (three queries) every
+    VALUATION_STREAM_HOLDINGS_SECONDS, so ticks in between never touch the database.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        config = app.config
+        self.tick_seconds = config.get('VALUATION_STREAM_TICK_SECONDS', 5)
+        self.holdings_seconds = config.get('VALUATION_STREAM_HOLDINGS_SECONDS', 60)
+        self.buffer_size = config.get('VALUATION_STREAM_BUFFER', 32)
+        self.max_subscribers = stream_capacity(config)
+        self._subscribers: Dict[int, Set[Subscriber]] = defaultdict(set)
+        self._states: Dict[int, _PortfolioState] = {}
+        self._holdings_loaded_at = 0.0
+        self._lock = threading.Lock()           # Guards _subscribers
+        self._tick_lock = threading.RLock()     # Serializes ticks and snapshots, so sequences stay ordered
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    # ---------------------------
+    # Subscriptions
+    # ---------------------------
+    def subscribe(self, portfolio_id: int) -> Subscriber:
+        """Registers a stream whose first event is a full snapshot of the portfolio."""
+        if self.subscriber_count >= self.max_subscribers:
+            raise StreamCapacityError('Too many open valuation streams')
+        subscriber = Subscriber(portfolio_id, self.buffer_size)
+        with self._tick_lock:
+            state = self._states.get(portfolio_id)
+            if state is None or state.last is None:
+                self._load_holdings([portfolio_id])
+                state = self._states[portfolio_id]
+                state.last = self._value(state, self._quote([state]))
+                state.sequence += 1
+            subscriber.offer(format_event('snapshot', state.last, state.sequence))
+            with self._lock:
+                # Checked again under the lock so concurrent subscribes cannot overshoot the cap
+                if sum(len(subscribers) for subscribers in self._subscribers.values()) >= self.max_subscribers:
+                    raise StreamCapacityError('Too many open valuation streams')
+                self._subscribers[portfolio_id].add(subscriber)
+        self._ensure_running()
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(subscriber.portfolio_id)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[subscriber.portfolio_id]
+
+    # ---------------------------
+    # Ticks
+    # ---------------------------
+    def tick(self) -> int:
+        """One round: reload holdings if due, one quote fetch, one delta per portfolio. Returns events sent."""
+        with self._tick_lock:
+            with self._lock:
+                watched = {portfolio_id: set(subscribers) for portfolio_id, subscribers in self._subscribers.items()}
+            if not watched:
+                return 0
+            for portfolio_id in list(self._states):
+                if portfolio_id not in watched:
+                    del self._states[portfolio_id]
+            if time.monotonic() - self._holdings_loaded_at > self.holdings_seconds or \
+                    any(portfolio_id not in self._states for portfolio_id in watched):
+                self._load_holdings(list(watched))
+                self._holdings_loaded_at = time.monotonic()
+
+            states = [self._states[portfolio_id] for portfolio_id in watched if portfolio_id in self._states]
+            prices = self._quote(states)
+            sent = 0
+            for portfolio_id, subscribers in watched.items():
+                state = self._states.get(portfolio_id)
+                if state is None:
+                    continue  # Portfolio deleted
+                current = self._value(state, prices)
+                delta = valuation_delta(state.last, current) if state.last is not None else current
+                state.last = current
+                if delta is None:
+                    continue
+                state.sequence += 1
+                message = format_event('delta', delta, state.sequence)  # Serialized once for every subscriber
+                for subscriber in subscribers:
+                    if subscriber.offer(message):
+                        sent += 1
+                    else:
+                        self.unsubscribe(subscriber)
+            return sent
+
+    def _load_holdings(self, portfolio_ids: List[int]) -> None:
+        """Positions, cash and base currency of every given portfolio in three queries."""
+        bases = dict(db.session.execute(
+            select(Portfolio.id, Portfolio.base_currency).where(Portfolio.id.in_(portfolio_ids))
+        ).all())
+        positions = db.session.execute(
+            select(Account.portfolio_id, *POSITION_COLUMNS)
+            .join(Account, Position.account_id == Account.id)
+            .join(Asset, Position.asset_id == Asset.id)
+            .where(Account.portfolio_id.in_(portfolio_ids), Position.quantity != 0)
+            .order_by(Position.account_id, Position.asset_id)
+        ).all()
+        cash = db.session.execute(
+            select(Account.portfolio_id, *CASH_COLUMNS).where(Account.portfolio_id.in_(portfolio_ids)).order_by(Account.id)
+        ).all()
+
+        for portfolio_id in portfolio_ids:
+            if portfolio_id not in bases:
+                self._states.pop(portfolio_id, None)
+                continue
+            state = self._states.get(portfolio_id)
+            if state is None:
+                state = self._states[portfolio_id] = _PortfolioState(bases[portfolio_id])
+            state.base_currency = bases[portfolio_id]
+            state.position_rows, state.cash_rows = [], []
+        for row in positions:
+            if row[0] in self._states:
+                self._states[row[0]].position_rows.append(tuple(row[1:]))
+        for row in cash:
+            if row[0] in self._states:
+                self._states[row[0]].cash_rows.append(tuple(row[1:]))
+
+    @staticmethod
+    def _quote(states: List[_PortfolioState]) -> Dict[int, float]:
+        """Live prices for every distinct asset held by the given portfolios, in one quote-cache call."""
+        refs = position_refs([row for state in states for row in state.position_rows])
+        if not refs:
+            return {}
+        try:
+            return get_quote_cache().get_prices(refs)
+        except Exception:
+            logger.exception('Quote fetch for valuation streams failed; using stored prices this tick')
+            return {}
+
+    @staticmethod
+    def _value(state: _PortfolioState, prices: Dict[int, float]) -> dict:
+        return value_rows(state.position_rows, state.cash_rows, state.base_currency, prices).to_dict()
+
+    # ---------------------------
+    # Ticker Thread
+    # ---------------------------
+    def _ensure_running(self) -> None:
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, daemon=True, name='valuation-stream')
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.tick_seconds)
+            with self._lock:
+                if not self._subscribers:
+                    self._thread = None
+                    return
+            with self.app.app_context():
+                try:
+                    self.tick()
+                except Exception:
+                    logger.exception('Valuation stream tick failed')
+                finally:
+                    db.session.remove()
+
+
+def stream_events(hub: ValuationHub, subscriber: Subscriber, heartbeat_seconds: float) -> Iterator[str]:
+    """The SSE body for one subscriber; unsubscribes when the client disconnects."""
+    try:
+        yield f'retry: {int(hub.tick_seconds * 1000)}\n\n'
+        while True:
+            message = subscriber.next_message(heartbeat_seconds)
+            if message is DROPPED:
+                yield format_event('dropped', {'reason': 'Client fell behind; reconnect for a fresh snapshot'})
+                return
+            yield message if message is not None else ': keep-alive\n\n'
+    finally:
+        hub.unsubscribe(subscriber)
+
+
+def get_valuation_hub() -> ValuationHub:
+    hub = current_app.extensions.get('valuation_hub')
+    if hub is None:
+        hub = current_app.extensions['valuation_hub'] = ValuationHub(current_app._get_current_object())
+    return hub
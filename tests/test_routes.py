@@ -0,0 +1,419 @@
+import itertools
+import json
+import logging
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import event
+
+from backend import create_app, db
+from backend.models import (
+    Account, Bond, CryptoCurrency, OptionContract, OptionTypeEnum, Portfolio, Position, Stock, Transaction,
+    TransactionTypeEnum, User,
+)
+
+PASSWORD = 'Passw0rd!!'
+_symbols = itertools.count()
+
+
+class TestConfig:
+    TESTING = True
+    SECRET_KEY = 'test'
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+
+@pytest.fixture
+def app():
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def portfolio(app):
+    user = User(username='alice', email='alice@example.com')
+    user.set_password(PASSWORD)
+    portfolio = Portfolio(name='Main', base_currency='USD', user=user)
+    db.session.add_all([user, portfolio])
+    db.session.commit()
+    return portfolio
+
+
+@pytest.fixture
+def client(app, portfolio):
+    client = app.test_client()
+    response = client.post('/api/auth/login', json={'username': 'alice', 'password': PASSWORD})
+    assert response.status_code == 200
+    return client
+
+
+@pytest.fixture
+def count_queries(app):
+    """
+    Returns a function that runs a callable and reports how many SQL statements it
+    issued. The session is reset first so identity-map hits don't hide queries.
+    """
+    def _count(fn):
+        statements = []
+        db.session.remove()
+
+        def _record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', _record)
+        try:
+            result = fn()
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', _record)
+        return result, len(statements)
+    return _count
+
+
+def _grow(portfolio_id, accounts):
+    """Adds accounts holding one asset of each subclass, with a few transactions each."""
+    now = datetime.now(timezone.utc)
+    for _ in range(accounts):
+        n = next(_symbols)
+        account = Account(name=f'Account {n}', account_type='BROKERAGE', currency='USD',
+                          cash_balance=Decimal('100'), portfolio_id=portfolio_id)
+        stock = Stock(symbol=f'STK{n}', currency='USD', sector='Tech')
+        crypto = CryptoCurrency(symbol=f'CRY{n}', currency='USD')
+        bond = Bond(symbol=f'BND{n}', currency='USD', maturity_date=date(2030, 1, 1))
+        db.session.add_all([account, stock, crypto, bond])
+        db.session.flush()
+        option = OptionContract(symbol=f'OPT{n}', currency='USD', underlying_asset_id=stock.id,
+                                option_type=OptionTypeEnum.CALL, strike_price=Decimal('100'),
+                                expiration_date=date(2030, 1, 17))
+        db.session.add(option)
+        db.session.flush()
+        for asset in (stock, crypto, bond, option):
+            db.session.add(Position(account_id=account.id, asset_id=asset.id, quantity=Decimal('10'),
+                                    total_cost=Decimal('1000')))
+            for days_ago in range(3):
+                db.session.add(Transaction(account_id=account.id, asset_id=asset.id,
+                                           transaction_type=TransactionTypeEnum.BUY,
+                                           transaction_time=now - timedelta(days=days_ago), quantity=Decimal('1'),
+                                           price_per_unit=Decimal('100'), currency='USD'))
+    db.session.commit()
+
+
+@pytest.mark.parametrize('path', [
+    '/api/portfolio/{id}/overview',
+    '/api/portfolio/{id}/valuation',
+    '/api/portfolio/{id}/transactions?limit=20',
+])
+def test_portfolio_read_paths_issue_constant_queries(client, portfolio, count_queries, path):
+    portfolio_id = portfolio.id
+    url = path.format(id=portfolio_id)
+    _grow(portfolio_id, 1)
+    client.get(url)  # Warm per-process caches (FX matrix) so only per-request queries are counted
+
+    response, small = count_queries(lambda: client.get(url))
+    assert response.status_code == 200
+
+    _grow(portfolio_id, 10)
+    response, large = count_queries(lambda: client.get(url))
+    assert response.status_code == 200
+
+    assert large == small
+
+
+def test_overview_includes_subclass_details_without_extra_queries(client, portfolio, count_queries):
+    url = f'/api/portfolio/{portfolio.id}/overview'
+    _grow(portfolio.id, 2)
+    client.get(url)
+
+    response, queries = count_queries(lambda: client.get(url))
+    body = response.get_json()
+
+    assert len(body['accounts']) == 2
+    assert len(body['holdings']) == 8
+    details = {holding['asset_type']: holding['details'] for holding in body['holdings']}
+    assert details['BOND']['maturity_date'] == '2030-01-01'
+    assert details['OPTION']['strike_price'] == '100.00000000'
+    assert details['STOCK']['sector'] == 'Tech'
+    # User load, portfolio, accounts, positions joined to assets
+    assert queries <= 4
+
+
+def test_transaction_repr_does_not_load_asset(app, portfolio, count_queries):
+    _grow(portfolio.id, 1)
+    transaction = db.session.query(Transaction).first()
+
+    text, queries = count_queries(lambda: repr(transaction))
+
+    assert queries == 0
+    assert f'asset=#{transaction.asset_id}' in text
+
+
+def test_sql_stats_headers_and_slow_query_log(caplog):
+    class InstrumentedConfig(TestConfig):
+        SQL_STATS_HEADERS = True
+        SQL_SLOW_QUERY_MS = 0  # Log every statement as slow
+
+    app = create_app(InstrumentedConfig)
+    with app.app_context():
+        db.create_all()
+        with caplog.at_level(logging.WARNING, logger='tradewonk.sql.slow'):
+            response = app.test_client().post('/api/auth/login', json={'username': 'nobody', 'password': 'secret-value'})
+        db.session.remove()
+        db.drop_all()
+
+    assert int(response.headers['X-SQL-Query-Count']) >= 1
+    assert float(response.headers['X-SQL-Time-Ms']) >= 0
+    assert 'db;' in response.headers['Server-Timing']
+    entries = [json.loads(record.getMessage()) for record in caplog.records if record.name == 'tradewonk.sql.slow']
+    entries = [entry for entry in entries if entry['path'] == '/api/auth/login']
+    assert entries and 'users' in entries[0]['statement']
+    # Only parameter types are logged, never values
+    assert 'nobody' not in caplog.text
+    assert 'str' in json.dumps(entries[0]['params'])
+
+
+def test_holdings_reflect_backdated_transactions_behind_checkpoints(app, client, portfolio, tmp_path):
+    app.config['PRICE_HISTORY_PATH'] = str(tmp_path)
+    account = Account(name='Checkpointed', account_type='BROKERAGE', currency='USD', portfolio_id=portfolio.id)
+    stock = Stock(symbol='CHK', currency='USD')
+    db.session.add_all([account, stock])
+    db.session.flush()
+
+    def buy(day, quantity):
+        db.session.add(Transaction(account_id=account.id, asset_id=stock.id, transaction_type=TransactionTypeEnum.BUY,
+                                   transaction_time=datetime(*day, tzinfo=timezone.utc), quantity=Decimal(quantity),
+                                   price_per_unit=Decimal('1'), currency='USD'))
+        db.session.commit()
+
+    def held(as_of):
+        response = client.get(f'/api/portfolio/{portfolio.id}/holdings?as_of={as_of}')
+        assert response.status_code == 200
+        return [position['quantity'] for position in response.get_json()['positions']]
+
+    buy((2024, 1, 10), '5')
+    assert client.get(f'/api/portfolio/{portfolio.id}/nav').status_code == 200   # Writes month-end checkpoints
+    assert held('2024-03-15') == [5.0]
+    buy((2024, 1, 20), '2')              # Backdated behind both checkpoints
+    assert held('2024-03-15') == [7.0]
+    assert held('2024-01-15') == [5.0]
+
+
+def test_metrics_require_token_and_count_requests_by_route_template():
+    from prometheus_client import REGISTRY
+
+    from backend.metrics import record_cache_lookup
+
+    class MetricsConfig(TestConfig):
+        METRICS_TOKEN = 'scrape-secret'
+
+    app = create_app(MetricsConfig)
+    with app.app_context():
+        db.create_all()
+        client = app.test_client()
+        status = client.get('/api/portfolio/1/overview').status_code  # Not logged in
+        labels = {'method': 'GET', 'endpoint': '/api/portfolio/<int:portfolio_id>/overview', 'status': str(status)}
+        before = REGISTRY.get_sample_value('tradewonk_http_requests_total', labels)
+        client.get('/api/portfolio/2/overview')
+        client.get('/api/portfolio/3/overview')
+        record_cache_lookup('test', hits=3, misses=1)
+
+        assert client.get('/api/metrics').status_code == 401
+        assert client.get('/api/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+        response = client.get('/api/metrics', headers={'Authorization': 'Bearer scrape-secret'})
+        db.session.remove()
+        db.drop_all()
+
+    assert response.status_code == 200
+    assert REGISTRY.get_sample_value('tradewonk_http_requests_total', labels) == before + 2
+    text = response.get_data(as_text=True)
+    assert 'tradewonk_cache_requests_total{cache="test",result="hit"}' in text
+
+
+def test_metrics_without_token_only_answer_loopback(app):
+    client = app.test_client()
+    assert client.get('/api/metrics').status_code == 200
+    assert client.get('/api/metrics', environ_base={'REMOTE_ADDR': '10.1.2.3'}).status_code == 401
+
+
+def test_realized_gains_report_streams_terms_and_wash_sales(client, portfolio):
+    from backend.services.import_service import build_transaction_row, write_transactions
+
+    account = Account(name='Taxable', account_type='BROKERAGE', currency='USD', portfolio_id=portfolio.id)
+    stock = Stock(symbol='TAX', currency='USD')
+    sold_out = Stock(symbol='OUT', currency='USD')
+    db.session.add_all([account, stock, sold_out])
+    db.session.flush()
+
+    def row(day, transaction_type, quantity, price, asset=stock):
+        return build_transaction_row(account.id, asset.id, {
+            'transaction_time': datetime(*day, tzinfo=timezone.utc), 'transaction_type': transaction_type,
+            'quantity': Decimal(quantity), 'price_per_unit': Decimal(price), 'commission': Decimal('0'),
+            'fees': Decimal('0'), 'currency': 'USD', 'strategy_tag': None, 'description': None,
+        }, 'USD')
+
+    write_transactions(db.session, [
+        row((2024, 2, 29), TransactionTypeEnum.BUY, '10', '100'),
+        row((2026, 1, 5), TransactionTypeEnum.BUY, '10', '200'),
+        row((2026, 2, 1), TransactionTypeEnum.SELL, '15', '120'),
+        row((2026, 2, 20), TransactionTypeEnum.BUY, '3', '110'),  # Repurchase within 30 days of the loss
+        # Both lots bought in the window are the shares sold, not replacements
+        row((2026, 1, 1), TransactionTypeEnum.BUY, '100', '10', sold_out),
+        row((2026, 1, 10), TransactionTypeEnum.BUY, '100', '10', sold_out),
+        row((2026, 1, 20), TransactionTypeEnum.SELL, '200', '8', sold_out),
+    ])
+    db.session.commit()
+
+    response = client.get(f'/api/portfolio/{portfolio.id}/realized-gains?year=2026&format=jsonl')
+    assert response.status_code == 200
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+    assert [(row['quantity'], row['term'], row['gain'], row['wash_sale']) for row in rows] == [
+        ('10.00000000', 'LONG', '200.00000000', False),
+        ('5.00000000', 'SHORT', '-400.00000000', True),
+        ('100.00000000', 'SHORT', '-200.00000000', False),
+        ('100.00000000', 'SHORT', '-200.00000000', False),
+    ]
+
+
+def test_user_cache_skips_users_query_until_password_change_or_logout(client, portfolio):
+    def users_queries():
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            assert client.get('/api/auth/status').status_code == 200
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+        return sum('FROM users' in statement for statement in statements)
+
+    users_queries()  # Fills the cache
+    assert users_queries() == 0
+
+    user = db.session.get(User, portfolio.user_id)
+    user.set_password('N3w-Passw0rd!')
+    db.session.commit()
+    assert users_queries() == 1
+
+    assert client.post('/api/auth/logout').status_code == 200
+    assert client.get('/api/auth/status').status_code != 200
+
+
+def test_login_is_rejected_with_503_when_hashing_pool_is_saturated(app, portfolio):
+    from backend.services.auth_service import PasswordHasher
+
+    app.extensions['password_hasher'] = PasswordHasher(workers=1, max_pending=0)
+    response = app.test_client().post('/api/auth/login', json={'username': 'alice', 'password': PASSWORD})
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+
+
+def test_check_username_answers_available_names_without_a_query(app, portfolio, count_queries):
+    client = app.test_client()
+
+    def check(payload):
+        response = client.post('/api/auth/check-username', json=payload)
+        assert response.status_code == 200
+        return response.get_json()['exists']
+
+    assert check({'username': 'alice'}) is True  # First call builds the filter
+    assert count_queries(lambda: check({'username': 'nobody-here'})) == (False, 0)
+    assert count_queries(lambda: check({'email': 'Nobody@Example.com'})) == (False, 0)
+    assert check({'email': 'ALICE@example.com'}) is True
+
+    response = client.post('/api/auth/register', json={
+        'username': 'newcomer', 'email': 'newcomer@example.com', 'password': PASSWORD,
+    })
+    assert response.status_code == 201
+    assert check({'username': 'newcomer'}) is True
+
+
+def test_check_username_sees_other_workers_registrations_after_catch_up(app, portfolio, count_queries):
+    from sqlalchemy import insert
+
+    from backend.services.username_filter import get_username_filter
+
+    client = app.test_client()
+    app.config['USERNAME_FILTER_CATCHUP_SECONDS'] = 3600
+
+    def check(username):
+        return client.post('/api/auth/check-username', json={'username': username}).get_json()['exists']
+
+    def register_elsewhere(username):
+        # A Core insert bypasses this worker's session hooks, as a registration in another worker would
+        db.session.execute(insert(User).values(username=username, email=f'{username}@example.com',
+                                               password_hash='x', created_at=datetime.now(timezone.utc)))
+        db.session.commit()
+
+    assert check('alice') is True  # Builds the filter
+    register_elsewhere('elsewhere')
+    # Until the next catch-up the name still looks free here, but registering it is refused
+    assert check('elsewhere') is False
+    response = client.post('/api/auth/register', json={
+        'username': 'elsewhere', 'email': 'other@example.com', 'password': PASSWORD,
+    })
+    assert response.status_code == 409
+
+    names = get_username_filter()
+    names.catchup_seconds = 0
+    register_elsewhere('later')
+    assert count_queries(lambda: check('later')) == (True, 2)  # One catch-up read, one users lookup
+    names.catchup_seconds = 3600
+    assert count_queries(lambda: check('still-free')) == (False, 0)
+
+
+def test_valuation_stream_sends_snapshot_shared_deltas_and_drops_slow_clients(app, client, portfolio):
+    from backend.services.valuation_stream import get_valuation_hub
+
+    class Quotes:
+        def __init__(self):
+            self.price, self.calls = 100.0, []
+
+        def get_prices(self, refs):
+            self.calls.append(sorted(ref.asset_id for ref in refs))
+            return {ref.asset_id: self.price for ref in refs}
+
+    _grow(portfolio.id, 1)
+    quotes = app.extensions['quote_cache'] = Quotes()
+    app.config.update(VALUATION_STREAM_TICK_SECONDS=3600, VALUATION_STREAM_BUFFER=2)
+
+    def open_stream():
+        response = client.get(f'/api/portfolio/{portfolio.id}/valuation/stream', buffered=False)
+        assert response.status_code == 200
+        assert response.mimetype == 'text/event-stream'
+        events = (chunk.decode() for chunk in response.response)
+        assert next(events).startswith('retry:')
+        return events
+
+    def parse(message):
+        fields = dict(line.split(': ', 1) for line in message.strip().splitlines())
+        return fields['event'], json.loads(fields['data'])
+
+    first, second = open_stream(), open_stream()
+    kind, snapshot = parse(next(first))
+    assert kind == 'snapshot' and len(snapshot['positions']) == 4
+    assert parse(next(second)) == ('snapshot', snapshot)
+    hub = get_valuation_hub()
+    assert hub.subscriber_count == 2
+
+    quotes.calls.clear()
+    quotes.price = 110.0
+    assert hub.tick() == 2
+    assert len(quotes.calls) == 1 and len(quotes.calls[0]) == 4  # Each asset quoted once for both clients
+    kind, delta = parse(next(first))
+    assert kind == 'delta' and len(delta['positions']) == 4
+    assert delta['total_market_value'] != snapshot['total_market_value']
+    assert parse(next(second)) == ('delta', delta)
+    assert hub.tick() == 0  # Nothing changed, nothing sent
+
+    for price in (120.0, 130.0, 140.0):  # The second client stops reading and overflows its buffer of 2
+        quotes.price = price
+        hub.tick()
+        if price != 140.0:
+            assert parse(next(first))[0] == 'delta'
+    assert hub.subscriber_count == 1
+    assert parse(next(second))[0] == 'delta'
+    assert parse(next(second))[0] == 'delta'
+    assert parse(next(second))[0] == 'dropped'
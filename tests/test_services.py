@@ -0,0 +1,948 @@
+import asyncio
+import io
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+
+import numpy as np
+import pytest
+from sqlalchemy import select
+
+from backend import create_app, db
+from backend.models import Account, Asset, Portfolio, Position, Stock, User
+
+
+class TestConfig:
+    TESTING = True
+    SECRET_KEY = 'test'
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+
+@pytest.fixture
+def app():
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def account(app):
+    user = User(username='bob', email='bob@example.com', password_hash='x')
+    portfolio = Portfolio(name='Main', base_currency='USD', user=user)
+    account = Account(name='Brokerage', account_type='BROKERAGE', currency='USD',
+                      cash_balance=Decimal('0'), portfolio=portfolio)
+    db.session.add_all([user, portfolio, account])
+    db.session.commit()
+    return account
+
+
+def _stock(symbol, price=None, exchange=None, currency='USD'):
+    stock = Stock(symbol=symbol, currency=currency, exchange=exchange,
+                  last_price=Decimal(str(price)) if price is not None else None)
+    db.session.add(stock)
+    db.session.commit()
+    return stock
+
+
+def _import(account, text, **kwargs):
+    from backend.services.import_service import stream_import
+    return list(stream_import(account, io.StringIO(text), **kwargs))
+
+
+# ---------------------------
+# Bulk Import
+# ---------------------------
+def test_bulk_insert_returns_ids_in_row_order(app):
+    from backend.services.import_service import bulk_insert
+
+    rows = [{'symbol': f'B{n}', 'asset_type': 'asset', 'currency': 'USD',
+             'created_at': datetime.now(timezone.utc), 'updated_at': datetime.now(timezone.utc)} for n in range(3)]
+    ids = bulk_insert(db.session, Asset.__table__, rows, return_ids=True)
+    symbols = dict(db.session.execute(select(Asset.id, Asset.symbol)).all())
+    assert [symbols[asset_id] for asset_id in ids] == ['B0', 'B1', 'B2']
+
+
+def test_asset_lookup_resolves_by_exchange_and_rejects_ambiguous_symbols(app):
+    from backend.services.import_service import AssetLookup, RowError
+
+    listed = [_stock('DUAL', exchange='NYSE'), _stock('DUAL', exchange='LSE'), _stock('ONLY')]
+    lookup = AssetLookup(db.session)
+    lookup.prefetch(['DUAL', 'ONLY', 'NOPE'])
+    assert lookup.resolve('ONLY') == listed[2].id
+    assert lookup.resolve('DUAL', 'lse') == listed[1].id
+    with pytest.raises(RowError, match='Ambiguous'):
+        lookup.resolve('DUAL')
+    with pytest.raises(RowError, match='Unknown'):
+        lookup.resolve('NOPE')
+
+
+def test_import_reports_bad_rows_and_writes_the_rest(account):
+    _stock('ACME')
+    events = _import(account, 'date,type,symbol,qty,price\n'
+                               '2024-01-02,BOUGHT,acme,10,5\n'
+                               '2024-01-03,BUY,MISSING,1,1\n'
+                               'not-a-date,BUY,ACME,1,1\n'
+                               '2024-01-04,SOLD,ACME,-4,6\n')
+    assert [event['line'] for event in events if event['event'] == 'error'] == [4, 3]
+    summary = events[-1]
+    assert (summary['status'], summary['rows_imported'], summary['rows_failed']) == ('completed', 2, 2)
+    assert db.session.execute(select(Position.quantity)).scalar_one() == Decimal('6')
+
+
+def test_identical_fills_in_one_statement_import_and_reimport_is_skipped(account):
+    _stock('ACME')
+    statement = ('date,type,symbol,qty,price\n'
+                 '2024-01-02 10:00:00,BUY,ACME,5,10\n'
+                 '2024-01-02 10:00:00,BUY,ACME,5,10\n'
+                 '2024-01-02 11:00:00,BUY,ACME,1,10\n')
+    first = _import(account, statement, batch_size=1)[-1]
+    assert (first['rows_imported'], first['rows_skipped']) == (3, 0)
+    again = _import(account, statement)[-1]
+    assert (again['rows_imported'], again['rows_skipped']) == (0, 3)
+    assert db.session.execute(select(Position.quantity)).scalar_one() == Decimal('11')
+
+
+def test_occurrence_counts_stay_bounded_over_many_distinct_lines(account, monkeypatch):
+    from backend.services import import_service
+
+    largest = []
+    count = import_service._LineOccurrences.count
+
+    def tracked(self, fingerprint, transaction_time):
+        occurrence = count(self, fingerprint, transaction_time)
+        largest.append(len(self.seen))
+        return occurrence
+
+    monkeypatch.setattr(import_service._LineOccurrences, 'count', tracked)
+    _stock('ACME')
+    start = datetime(2024, 1, 2)
+    lines = []
+    for n in range(600):
+        lines.append(f'{start + timedelta(minutes=n):%Y-%m-%d %H:%M:%S},BUY,ACME,{n % 7 + 1},10\n')
+        if n % 50 == 49:
+            lines.append(lines[-1])  # Identical fill straddling a batch boundary
+    summary = _import(account, 'date,type,symbol,qty,price\n' + ''.join(lines), batch_size=50)[-1]
+
+    assert (summary['rows_imported'], summary['rows_skipped']) == (612, 0)
+    assert max(largest) == 1
+
+
+def test_newest_first_statement_matches_sells_after_all_buys_are_written(account):
+    from backend.models import Lot, LotDisposal
+
+    _stock('ACME')
+    events = _import(account, 'date,type,symbol,qty,price\n'
+                              '2024-03-01,SELL,ACME,15,20\n'
+                              '2024-02-01,BUY,ACME,10,12\n'
+                              '2024-01-01,BUY,ACME,10,10\n', batch_size=1)
+    assert not [event for event in events if event['event'] in ('warning', 'error')]
+    assert events[-1]['status'] == 'completed'
+    consumed = dict(db.session.execute(
+        select(Lot.cost_basis_per_unit, LotDisposal.quantity)
+        .join(LotDisposal, LotDisposal.lot_id == Lot.id)
+    ).all())
+    assert consumed == {Decimal('10'): Decimal('10'), Decimal('12'): Decimal('5')}  # FIFO: the January lot first
+    position = db.session.execute(select(Position)).scalar_one()
+    assert (position.quantity, position.total_cost, position.realized_pnl) == (Decimal('5'), Decimal('60'), Decimal('140'))
+
+
+def test_incremental_positions_agree_with_rebuild_and_shortfalls_book_no_gain(account):
+    from backend.services.portfolio_service import rebuild_positions
+
+    _stock('ACME')
+    events = _import(account, 'date,type,symbol,qty,price,commission\n'
+                              '2024-01-01,BUY,ACME,10,10,1\n'
+                              '2024-02-01,SELL,ACME,4,15,2\n'
+                              '2024-03-01,BUY,ACME,5,20,0\n'
+                              '2024-04-01,SELL,ACME,16,30,4\n', batch_size=2)
+    assert [event['line'] for event in events if event['event'] == 'warning'] == [5]
+    position = db.session.execute(select(Position)).scalar_one()
+    # 11 of the 16 sold in April were matched: their proceeds, less 11/16 of the commission, minus their cost
+    april = Decimal('6') * 30 + 5 * 30 - Decimal('4') * 11 / 16 - (Decimal('6') * Decimal('10.1') + 5 * 20)
+    february = Decimal('4') * 15 - 2 - 4 * Decimal('10.1')
+    assert position.quantity == Decimal('-5')
+    assert position.realized_pnl == (february + april).quantize(Decimal('0.00000001'))
+    assert rebuild_positions([account.id], apply=False) == []
+
+
+# ---------------------------
+# Valuation
+# ---------------------------
+def test_value_rows_converts_overrides_and_reports_missing_inputs():
+    from backend.services.valuation_service import value_rows
+
+    positions = [
+        (1, 10, Decimal('2'), Decimal('150'), 'AAA', 'USD', Decimal('100'), None, 'stock'),
+        (1, 11, Decimal('10'), Decimal('80'), 'BBB', 'EUR', Decimal('10'), None, 'stock'),
+        (2, 12, Decimal('5'), Decimal('50'), 'CCC', 'USD', None, None, 'stock'),
+        (2, 13, Decimal('1'), Decimal('10'), 'DDD', 'JPY', Decimal('1000'), None, 'stock'),
+    ]
+    cash = [(1, 'USD', Decimal('100')), (2, 'EUR', Decimal('50'))]
+    rates = {'USD': 1.0, 'EUR': 1.2}
+
+    valuation = value_rows(positions, cash, 'USD', prices={10: 110.0},
+                           fx=lambda currencies, base: [rates.get(c, float('nan')) for c in currencies])
+    result = valuation.to_dict()
+    by_asset = {position['asset_id']: position for position in result['positions']}
+    assert by_asset[10]['market_value'] == 220.0 and by_asset[10]['unrealized_pnl'] == 70.0
+    assert by_asset[11]['market_value'] == 120.0 and by_asset[11]['cost_basis'] == 96.0
+    assert by_asset[12]['market_value'] is None and by_asset[13]['fx_rate'] is None
+    assert result['missing_prices'] == [12] and result['missing_fx'] == ['JPY']
+    assert result['cash_by_account'] == {'1': 100.0, '2': 60.0}
+    assert result['total_value'] == 500.0
+    assert by_asset[10]['weight'] == 0.44
+
+
+def test_value_portfolio_prices_live_from_the_quote_cache(app, account):
+    from backend.services.fx_service import store_rates
+    from backend.services.valuation_service import value_portfolio
+
+    acme, euro = _stock('ACME', price=10), _stock('EURO', price=5, currency='EUR')
+    db.session.add_all([
+        Position(account_id=account.id, asset_id=acme.id, quantity=Decimal('3'), total_cost=Decimal('24')),
+        Position(account_id=account.id, asset_id=euro.id, quantity=Decimal('4'), total_cost=Decimal('20')),
+    ])
+    store_rates([(datetime.now(timezone.utc).date(), 'EUR', 'USD', 1.5)])
+    db.session.commit()
+
+    class Quotes:
+        def get_prices(self, refs):
+            return {ref.asset_id: 12.0 for ref in refs if ref.symbol == 'ACME'}
+
+    app.extensions['quote_cache'] = Quotes()
+    stored = value_portfolio(account.portfolio)
+    live = value_portfolio(account.portfolio, live=True)
+    assert stored.total_market_value == 30.0 + 30.0
+    assert live.total_market_value == 36.0 + 30.0
+    assert live.total_unrealized_pnl == 36.0 + 30.0 - 24.0 - 30.0
+
+
+# ---------------------------
+# FX
+# ---------------------------
+def test_cross_rate_matrix_inverts_and_triangulates_through_pivots():
+    from backend.services.fx_service import CrossRateMatrix
+
+    matrix = CrossRateMatrix.from_quotes(date(2024, 1, 2), [('EUR', 'USD', 1.1), ('USD', 'JPY', 150.0), ('GBP', 'EUR', 1.15)])
+    assert matrix.rate('USD', 'EUR') == pytest.approx(1 / 1.1)
+    assert matrix.rate('EUR', 'JPY') == pytest.approx(1.1 * 150)
+    assert matrix.rate('GBP', 'JPY') == pytest.approx(1.15 * 1.1 * 150)  # Two pivot hops
+    assert np.isnan(matrix.rate('CHF', 'USD'))
+    assert matrix.rates_to(['EUR', 'USD', 'CHF'], 'USD')[:2].tolist() == pytest.approx([1.1, 1.0])
+
+
+def test_fx_cache_keeps_complete_past_days_and_reloads_forward_filled_ones(app):
+    from backend.models import FxRate
+    from backend.services.fx_service import FxRateCache
+
+    app.config['FX_CACHE_TTL_SECONDS'] = 0
+    cache = FxRateCache()
+    day = date(2024, 1, 3)
+    db.session.add(FxRate(rate_date=day - timedelta(days=1), base_currency='EUR', quote_currency='USD', rate=Decimal('1.1')))
+    db.session.commit()
+    assert cache.rate('EUR', 'USD', day) == pytest.approx(1.1)  # Forward-filled from the day before
+
+    # The day's own rate arrives through another worker, which cannot invalidate this cache
+    db.session.add(FxRate(rate_date=day, base_currency='EUR', quote_currency='USD', rate=Decimal('1.2')))
+    db.session.commit()
+    assert cache.rate('EUR', 'USD', day) == pytest.approx(1.2)
+    assert cache.matrix_for(day).complete
+
+    db.session.query(FxRate).filter_by(rate_date=day).update({'rate': Decimal('9')})
+    db.session.commit()
+    assert cache.rate('EUR', 'USD', day) == pytest.approx(1.2)  # Complete past days are cached for good
+
+
+# ---------------------------
+# Market Data
+# ---------------------------
+def test_quote_provider_without_fetch_cannot_be_constructed():
+    from backend.services.market_data_service import AlphaVantageProvider, QuoteProvider
+
+    class Incomplete(QuoteProvider):
+        name = 'incomplete'
+
+    with pytest.raises(TypeError, match='fetch'):
+        Incomplete('http://localhost', None, 60)
+    assert AlphaVantageProvider('http://localhost/', 'key', 60).base_url == 'http://localhost'
+
+
+def test_token_buckets_are_shared_and_never_overissued_across_threads():
+    from concurrent.futures import ThreadPoolExecutor
+
+    from backend.services.market_data_service import TokenBucket, bucket_for
+
+    with ThreadPoolExecutor(16) as pool:
+        buckets = set(map(id, pool.map(lambda _: bucket_for('threaded', 'key', 60), range(64))))
+    assert len(buckets) == 1
+
+    bucket = TokenBucket(0.001, burst=8)  # Effectively no refill during the test
+
+    def take(_):
+        try:
+            asyncio.run(asyncio.wait_for(bucket.acquire(), 0.2))
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    with ThreadPoolExecutor(32) as pool:
+        assert sum(pool.map(take, range(32))) == 8
+
+
+def test_quote_cache_caches_unpriceable_keys_and_survives_a_stuck_leader():
+    from concurrent.futures import Future
+
+    from backend.services.quote_cache import AssetRef, LocalQuoteBackend, QuoteCache
+
+    calls = []
+
+    def fetcher(refs):
+        calls.append([ref.symbol for ref in refs])
+        return {ref.key: 10.0 for ref in refs if ref.symbol == 'GOOD'}
+
+    cache = QuoteCache(LocalQuoteBackend(), fetcher)
+    refs = [AssetRef(1, 'GOOD', None, 'STOCK', 'USD'), AssetRef(2, 'GONE', None, 'STOCK', 'USD')]
+    assert cache.get_prices(refs) == {1: 10.0}
+    assert cache.get_prices(refs) == {1: 10.0}
+    assert calls == [['GOOD', 'GONE']]  # The unpriceable symbol was not refetched
+
+    cache.fill_timeout = 0.01
+    stuck = AssetRef(3, 'SLOW', None, 'STOCK', 'USD')
+    cache._inflight[stuck.key] = Future()  # Another request's fetch that never finishes
+    assert cache.get_prices([stuck]) == {}
+
+
+def test_quote_cache_answers_within_the_fill_timeout_and_caches_the_late_fill():
+    import threading
+    import time
+
+    from backend.services.quote_cache import AssetRef, LocalQuoteBackend, QuoteCache
+
+    release, calls = threading.Event(), []
+
+    def rate_limited(refs):
+        calls.append([ref.symbol for ref in refs])
+        release.wait(5)  # Waiting on a provider's token bucket
+        return {ref.key: 10.0 for ref in refs}
+
+    cache = QuoteCache(LocalQuoteBackend(), rate_limited, fill_timeout=0.05)
+    refs = [AssetRef(1, 'ACME', None, 'STOCK', 'USD')]
+    started = time.monotonic()
+    assert cache.get_prices(refs) == {}  # Falls back to stored prices instead of waiting out the refill
+    assert cache.get_prices(refs) == {}  # Waits on the same fill rather than starting another
+    assert time.monotonic() - started < 1
+
+    release.set()
+    deadline = time.monotonic() + 5
+    while cache._inflight and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert cache.get_prices(refs) == {1: 10.0}
+    assert calls == [['ACME']]
+
+
+# ---------------------------
+# Price History
+# ---------------------------
+def test_price_store_sees_same_length_rewrites_from_another_process_and_stale_old_dirs(tmp_path):
+    from backend.services.price_history import PriceHistoryStore
+
+    days = ['2024-01-01', '2024-01-02', '2024-01-03']
+    reader, writer = PriceHistoryStore(str(tmp_path)), PriceHistoryStore(str(tmp_path))  # Two workers
+    writer.append(1, days, close=[1.0, 2.0, 3.0])
+    assert reader.read(1).close.tolist() == [1.0, 2.0, 3.0]
+
+    (tmp_path / '1.old').mkdir()
+    (tmp_path / '1.old' / 'date.bin').write_bytes(b'')  # Left over from a crashed rewrite
+    writer.append(1, ['2024-01-02'], close=[2.5])        # Corrects a bar: same row count
+    assert reader.read(1).close.tolist() == [1.0, 2.5, 3.0]
+    assert reader.closes_asof([1], ['2024-01-02', '2024-01-10']).tolist() == [[2.5, 3.0]]
+    assert not (tmp_path / '1.old').exists()
+
+
+def test_price_store_append_cuts_columns_left_longer_than_dates_by_a_crash(tmp_path):
+    from backend.services.price_history import PriceHistoryStore
+
+    store = PriceHistoryStore(str(tmp_path))
+    store.append(1, ['2024-01-01', '2024-01-02'], close=[1.0, 2.0], volume=[10.0, 20.0])
+    with open(tmp_path / '1' / 'close.bin', 'ab') as f:
+        f.write(np.array([99.0]).tobytes())  # Crashed after the close column, before volume and date
+    with open(tmp_path / '1' / 'date.bin', 'ab') as f:
+        f.write(b'\x00' * 3)                 # and a torn date write
+
+    store.append(1, ['2024-01-03'], close=[3.0], volume=[30.0])
+    series = store.read(1)
+    assert series.date.astype(str).tolist() == ['2024-01-01', '2024-01-02', '2024-01-03']
+    assert (series.close.tolist(), series.volume.tolist()) == ([1.0, 2.0, 3.0], [10.0, 20.0, 30.0])
+    assert all((tmp_path / '1' / f'{name}.bin').stat().st_size == 24 for name in ('date', 'close', 'volume'))
+
+
+# ---------------------------
+# NAV
+# ---------------------------
+def test_nav_refresh_reads_fx_once_and_flags_unpriced_holdings(app, account, tmp_path):
+    from sqlalchemy import event
+
+    from backend.models import FxRate, Transaction, TransactionTypeEnum
+    from backend.services.nav_service import get_nav_series, refresh_nav
+
+    app.config['PRICE_HISTORY_PATH'] = str(tmp_path)
+    euro, gone = _stock('EURO', price=10, currency='EUR'), _stock('GONE')
+    day = date(2024, 1, 1)
+    db.session.add_all([
+        Transaction(account_id=account.id, asset_id=euro.id, transaction_type=TransactionTypeEnum.BUY, currency='EUR',
+                    transaction_time=datetime(2024, 1, 1, 12, tzinfo=timezone.utc), quantity=Decimal('2'),
+                    price_per_unit=Decimal('10')),
+        Transaction(account_id=account.id, asset_id=gone.id, transaction_type=TransactionTypeEnum.BUY, currency='USD',
+                    transaction_time=datetime(2024, 1, 1, 12, tzinfo=timezone.utc), quantity=Decimal('1'),
+                    price_per_unit=Decimal('5')),
+        FxRate(rate_date=day, base_currency='EUR', quote_currency='USD', rate=Decimal('1.1')),
+        FxRate(rate_date=day + timedelta(days=2), base_currency='EUR', quote_currency='USD', rate=Decimal('1.2')),
+    ])
+    db.session.commit()
+
+    fx_queries = []
+    listener = lambda conn, cursor, statement, *args: fx_queries.append(statement) if 'fx_rates' in statement else None
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        assert refresh_nav(account.portfolio, through=day + timedelta(days=3)) == 4
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    db.session.commit()
+    assert len(fx_queries) == 1
+
+    series = get_nav_series(account.portfolio).to_dict()
+    assert [row['market_value'] for row in series['series']] == [22.0, 22.0, 24.0, 24.0]
+    assert series['missing_prices'] == [gone.id]
+    assert all(row['missing_prices'] == [gone.id] for row in series['series'])
+    assert refresh_nav(account.portfolio, through=day + timedelta(days=3)) == 0
+
+
+
+def test_nav_records_withdrawals_as_negative_flows(app, account, tmp_path):
+    from backend.models import Transaction, TransactionTypeEnum
+    from backend.services.analytics_service import compute_analytics
+    from backend.services.nav_service import get_nav_series, refresh_nav
+
+    app.config['PRICE_HISTORY_PATH'] = str(tmp_path)
+    for day, transaction_type, amount in ((1, TransactionTypeEnum.DEPOSIT, '100'),
+                                          (3, TransactionTypeEnum.WITHDRAWAL, '40')):
+        db.session.add(Transaction(account_id=account.id, transaction_type=transaction_type, currency='USD',
+                                   transaction_time=datetime(2024, 1, day, 12, tzinfo=timezone.utc),
+                                   quantity=Decimal(amount)))
+    db.session.commit()
+    refresh_nav(account.portfolio, through=date(2024, 1, 4))
+    db.session.commit()
+
+    series = get_nav_series(account.portfolio)
+    assert series.net_flow.tolist() == [100.0, 0.0, -40.0, 0.0]
+    assert series.nav.tolist() == [100.0, 100.0, 60.0, 60.0]
+    # Cash that only moves in and out has no performance
+    stats = compute_analytics([account.portfolio]).to_dicts()[0]
+    assert stats['twr'] == pytest.approx(0.0)
+    assert stats['max_drawdown'] == pytest.approx(0.0)
+
+# ---------------------------
+# Analytics
+# ---------------------------
+def test_xirr_solves_known_rates_and_rejects_one_sided_rows():
+    from backend.services.analytics_service import xirr
+
+    cash_flows = np.array([
+        [-100.0, 0.0, 121.0],    # 10% a year over two years
+        [-100.0, 110.0, 0.0],    # 10% over one year, nothing after
+        [-100.0, -50.0, 0.0],    # Money only goes in
+    ])
+    rates = xirr(cash_flows, np.array([0.0, 1.0, 2.0]))
+    assert rates[:2] == pytest.approx([0.1, 0.1], abs=1e-9)
+    assert np.isnan(rates[2])
+
+
+def test_returns_ignore_external_flows():
+    from backend.services.analytics_service import daily_returns, drawdowns, time_weighted_return
+
+    nav = np.array([[100.0, 110.0, 220.0, 198.0]])
+    flows = np.array([[100.0, 0.0, 100.0, 0.0]])     # The second deposit is not performance
+    returns = daily_returns(nav, flows)
+    assert np.isnan(returns[0, 0])
+    assert returns[0, 1:] == pytest.approx([0.1, 220 / 210 - 1, -0.1])
+    assert time_weighted_return(returns)[0] == pytest.approx(1.1 * 220 / 210 * 0.9 - 1)
+    assert drawdowns(returns)[0, -1] == pytest.approx(-0.1)
+
+
+def test_compute_analytics_batches_portfolios_and_solves_mwr(account):
+    from backend.models import PortfolioNav
+    from backend.services.analytics_service import PERIODS_PER_YEAR, compute_analytics
+
+    empty = Portfolio(name='Empty', base_currency='USD', user=account.portfolio.user)
+    db.session.add(empty)
+    day = date(2024, 1, 1)
+    for offset, nav, flow in ((0, 100, 100), (1, 110, 0), (2, 220, 100), (3, 198, 0)):
+        db.session.add(PortfolioNav(portfolio_id=account.portfolio.id, nav_date=day + timedelta(days=offset),
+                                    market_value=Decimal(nav), cash=Decimal('0'), net_flow=Decimal(flow),
+                                    nav=Decimal(nav)))
+    db.session.commit()
+
+    stats = compute_analytics([account.portfolio, empty])
+    main, none = stats.to_dicts()
+    assert main['twr'] == pytest.approx(1.1 * 220 / 210 * 0.9 - 1)
+    assert main['max_drawdown'] == pytest.approx(-0.1)
+    assert none['portfolio_id'] == empty.id and none['twr'] is None and none['mwr'] is None
+
+    # The money-weighted rate discounts the investor's flows (two deposits in, final NAV out) to zero
+    years = np.array([0, 2, 3]) / PERIODS_PER_YEAR
+    npv = np.sum(np.array([-100.0, -100.0, 198.0]) * (1 + stats.mwr[0]) ** -years)
+    assert npv == pytest.approx(0, abs=1e-6)
+    assert main['mwr'] < 0
+
+
+# ---------------------------
+# Transaction Listing
+# ---------------------------
+def test_list_transactions_merges_per_account_scans_across_pages(account):
+    from sqlalchemy import event
+
+    from backend.models import Transaction, TransactionTypeEnum
+    from backend.services.portfolio_service import list_transactions
+
+    other = Account(name='Savings', account_type='BROKERAGE', currency='USD', cash_balance=Decimal('0'),
+                    portfolio=account.portfolio)
+    db.session.add(other)
+    db.session.flush()
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    for i in range(7):
+        for owner in (account, other) if i % 3 else (account,):  # Interleaved, with ties on time
+            db.session.add(Transaction(account_id=owner.id, transaction_type=TransactionTypeEnum.DEPOSIT,
+                                       transaction_time=start + timedelta(hours=i), quantity=Decimal(i),
+                                       currency='USD'))
+    db.session.commit()
+    expected = db.session.execute(
+        select(Transaction.id).order_by(Transaction.transaction_time.desc(), Transaction.id.desc())
+    ).scalars().all()
+
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        seen, cursor = [], None
+        while True:
+            page = list_transactions([account.id, other.id], cursor=cursor, limit=3)
+            seen.extend(transaction.id for transaction, _ in page.rows)
+            if page.next_cursor is None:
+                break
+            cursor = page.next_cursor
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+
+    assert seen == expected
+    listings = [statement for statement in statements if 'FROM transactions' in statement]
+    assert listings and all('UNION ALL' in statement and 'account_id IN' not in statement for statement in listings)
+    assert list_transactions([]).rows == []
+
+
+# ---------------------------
+# Options
+# ---------------------------
+def test_erfc_matches_math_to_double_precision():
+    import math
+
+    from backend.services.greeks_service import erfc, norm_cdf
+
+    xs = np.concatenate([np.linspace(-10, 10, 4001), [-40.0, 26.0, 40.0]])
+    expected = np.array([math.erfc(x) for x in xs])
+    assert np.allclose(erfc(xs), expected, rtol=1e-13, atol=1e-300)
+    assert norm_cdf(np.array([-np.inf, 0.0, np.inf])).tolist() == [0.0, 0.5, 1.0]
+
+
+def test_black_scholes_prices_and_greeks_match_reference_values():
+    from backend.services.greeks_service import black_scholes_price, greeks
+
+    is_call = np.array([True, False])
+    # Hull, Options, Futures and Other Derivatives: S=42, K=40, r=10%, sigma=20%, six months
+    assert black_scholes_price(42.0, 40.0, 0.5, 0.1, 0.2, is_call) == pytest.approx([4.7594, 0.8086], abs=1e-4)
+    assert black_scholes_price(100.0, 100.0, 1.0, 0.05, 0.2, is_call) == pytest.approx([10.450583572, 5.573526022])
+
+    values = greeks(100.0, 100.0, 1.0, 0.05, 0.2, is_call)
+    assert values['delta'] == pytest.approx([0.636830651, -0.363169349])
+    assert values['gamma'] == pytest.approx(0.018762017)
+    assert values['vega'] == pytest.approx(0.375240347)
+    assert values['theta'][0] == pytest.approx(-6.414027546 / 365)
+
+
+def test_implied_volatility_round_trips_and_rejects_arbitrage_prices():
+    from backend.services.greeks_service import black_scholes_price, implied_volatility
+
+    spot = np.full(8, 100.0)
+    strike = np.array([60.0, 90.0, 100.0, 110.0, 150.0, 100.0, 80.0, 120.0])
+    years = np.array([0.05, 0.25, 1.0, 2.0, 0.5, 0.01, 3.0, 0.75])
+    sigma = np.array([0.8, 0.15, 0.2, 0.35, 0.6, 0.05, 1.5, 0.25])
+    is_call = np.array([True, False, True, False, True, False, True, False])
+    prices = black_scholes_price(spot, strike, years, 0.03, sigma, is_call)
+    assert implied_volatility(prices, spot, strike, years, 0.03, is_call) == pytest.approx(sigma, rel=1e-6)
+
+    # Below intrinsic value and above the spot price no volatility fits
+    bad = implied_volatility(np.array([5.0, 101.0]), 100.0, np.array([90.0, 100.0]), 1.0, 0.0,
+                             np.array([True, True]))
+    assert np.isnan(bad).all()
+
+
+def test_refresh_greeks_clears_contracts_that_no_longer_solve(app):
+    from backend.models import OptionContract, OptionTypeEnum
+    from backend.services.greeks_service import refresh_greeks
+
+    underlying = _stock('UND', price=100)
+    good, bad = (
+        OptionContract(symbol=symbol, currency='USD', underlying_asset_id=underlying.id,
+                       option_type=OptionTypeEnum.CALL, strike_price=Decimal('100'),
+                       expiration_date=date(2025, 1, 1), last_price=Decimal(price),
+                       delta=Decimal('0.5'), implied_volatility=Decimal('0.3'))
+        for symbol, price in (('GOOD', '10.45'), ('BAD', '150'))
+    )
+    db.session.add_all([good, bad])
+    db.session.commit()
+
+    result = refresh_greeks(as_of=date(2024, 1, 1), risk_free_rate=0.05)
+    db.session.commit()
+    db.session.expire_all()
+    assert (result.requested, result.updated, result.unsolved) == (2, 1, [bad.id])
+    assert float(good.implied_volatility) == pytest.approx(0.2, abs=1e-3)
+    assert bad.delta is None and bad.implied_volatility is None
+
+
+# ---------------------------
+# Bonds
+# ---------------------------
+def _bond(symbol, maturity, coupon_rate, price):
+    from backend.models import Bond
+
+    bond = Bond(symbol=symbol, currency='USD', maturity_date=maturity,
+                coupon_rate=None if coupon_rate is None else Decimal(coupon_rate), last_price=Decimal(price))
+    db.session.add(bond)
+    db.session.commit()
+    return bond
+
+
+def test_par_bond_yields_its_coupon():
+    from backend.services.bond_service import solve_ytm
+
+    # Ten years of semiannual 5% coupons on exact half-year periods, priced at par
+    years = np.arange(1, 21) / 2.0
+    cash_flows = np.full(20, 2.5)
+    cash_flows[-1] += 100
+    assert solve_ytm(np.array([100.0]), cash_flows[None, :], years[None, :], 2)[0] == pytest.approx(0.05, abs=1e-10)
+
+
+def test_bond_analytics_match_closed_forms_and_finite_differences(app):
+    from backend.services.bond_service import compute_bond_analytics
+
+    as_of = date(2024, 1, 1)
+    par = _bond('PAR', date(2034, 1, 1), '0.05', '100')
+    zero = _bond('ZERO', date(2029, 1, 1), None, '80')
+    accruing = _bond('ACCR', date(2034, 4, 1), '0.06', '100')
+
+    analytics = compute_bond_analytics([par.id, zero.id, accruing.id], as_of=as_of)
+    rows = {row['asset_id']: row for row in analytics.to_dicts()}
+
+    # Bought on a coupon date at par: no accrued interest and a yield equal to the coupon
+    # (day-count years are not exact half years, hence the looser tolerance)
+    assert rows[par.id]['accrued_interest'] == 0
+    assert rows[par.id]['ytm'] == pytest.approx(0.05, abs=1e-4)
+
+    # A zero-coupon bond's Macaulay duration is its maturity
+    t = (date(2029, 1, 1) - as_of).days / 365.0
+    y = rows[zero.id]['ytm']
+    assert y == pytest.approx(2 * ((100 / 80) ** (1 / (2 * t)) - 1))
+    assert rows[zero.id]['macaulay_duration'] == pytest.approx(t)
+    assert rows[zero.id]['modified_duration'] == pytest.approx(t / (1 + y / 2))
+    assert rows[zero.id]['convexity'] == pytest.approx(t * (t + 0.5) / (1 + y / 2) ** 2)
+
+    # Three months into a six-month period: half a coupon has accrued
+    assert rows[accruing.id]['accrued_interest'] == pytest.approx(3.0 * 92 / 183)
+
+    # Duration and convexity agree with finite differences of the price-yield curve
+    dates = (np.datetime64('2024-07') + np.arange(20) * 6).astype('datetime64[D]')
+    years = (dates - np.datetime64(as_of)).astype(np.int64) / 365.0
+    flows = np.full(20, 2.5)
+    flows[-1] += 100
+
+    def price(rate):
+        return float(np.sum(flows * (1 + rate / 2) ** (-2 * years)))
+
+    y, h = rows[par.id]['ytm'], 1e-5
+    p = price(y)
+    assert p == pytest.approx(100)
+    assert rows[par.id]['modified_duration'] == pytest.approx(-(price(y + h) - price(y - h)) / (2 * h * p), rel=1e-6)
+    assert rows[par.id]['convexity'] == pytest.approx((price(y + h) - 2 * p + price(y - h)) / (h * h * p), rel=1e-3)
+
+
+# ---------------------------
+# Corporate Actions
+# ---------------------------
+def test_imported_split_lines_are_rejected_and_the_action_is_applied_once(account):
+    from backend.models import Lot, TransactionTypeEnum
+    from backend.services.corporate_action_service import CorporateActionError, apply_corporate_action
+    from backend.services.portfolio_service import rebuild_positions
+
+    acme = _stock('ACME')
+    events = _import(account, 'date,type,symbol,qty,price\n'
+                              '2024-01-02,BUY,ACME,100,10\n'
+                              '2024-02-01,SPLIT,ACME,100,\n'
+                              '2024-02-01,DIVIDEND_STOCK,ACME,5,\n')
+    assert [event['line'] for event in events if event['event'] == 'error'] == [3, 4]
+    assert 'corporate-action' in events[0]['error']
+
+    split = (acme.id, TransactionTypeEnum.STOCK_SPLIT, Decimal('2'), date(2024, 2, 1))
+    first = apply_corporate_action(*split)
+    db.session.commit()
+    retry = apply_corporate_action(*split)
+    db.session.commit()
+    assert (first.applied, first.positions_affected, first.lots_affected) == (True, 1, 1)
+    assert (retry.applied, retry.action_id) == (False, first.action_id)
+    with pytest.raises(CorporateActionError):
+        apply_corporate_action(acme.id, TransactionTypeEnum.STOCK_SPLIT, Decimal('3'), date(2024, 2, 1))
+    db.session.rollback()
+
+    position = db.session.execute(select(Position)).scalar_one()
+    lot = db.session.execute(select(Lot)).scalar_one()
+    assert position.quantity == lot.quantity_remaining == Decimal('200')
+    assert position.total_cost == lot.quantity_remaining * lot.cost_basis_per_unit == Decimal('1000')
+    assert rebuild_positions(apply=False) == []
+
+
+def test_corporate_action_command_requires_an_exchange_for_ambiguous_symbols(app, account):
+    from backend.models import Lot
+
+    _stock('DUAL', exchange='NYSE')
+    tsx = _stock('DUAL', exchange='TSX')
+    _import(account, 'date,type,symbol,exchange,qty,price\n'
+                     '2024-01-02,BUY,DUAL,NYSE,10,10\n'
+                     '2024-01-02,BUY,DUAL,TSX,10,10\n')
+    runner = app.test_cli_runner()
+    args = ['positions', 'corporate-action', 'DUAL', '--type', 'split', '--ratio', '2', '--date', '2024-02-01']
+
+    ambiguous = runner.invoke(args=args)
+    assert ambiguous.exit_code != 0 and 'Ambiguous symbol DUAL' in ambiguous.output
+    assert runner.invoke(args=args + ['--exchange', 'LSE']).exit_code != 0
+    applied = runner.invoke(args=args + ['--exchange', 'tsx'])
+    assert applied.exit_code == 0, applied.output
+
+    remaining = dict(db.session.execute(select(Lot.asset_id, Lot.quantity_remaining)).all())
+    assert remaining[tsx.id] == Decimal('20') and sorted(remaining.values()) == [Decimal('10'), Decimal('20')]
+
+
+# ---------------------------
+# Asset Search
+# ---------------------------
+def test_asset_search_ranks_exact_then_prefix_then_word_then_substring():
+    from backend.services.asset_search import AssetSearchIndex
+
+    index = AssetSearchIndex([
+        (1, 'XAP', 'Crabapples Ltd', 'NYSE', 'STOCK', 'USD', 50),                # Substring of "crabapples"
+        (2, 'ZZZ', 'Apple Orchards', 'NYSE', 'STOCK', 'USD', 90),                # Word prefix
+        (3, 'APPLE', 'Apple Inc', 'NASDAQ', 'STOCK', 'USD', 1),                 # Exact symbol
+        (4, 'APPLES', 'Apples Ltd', 'LSE', 'STOCK', 'GBP', 5),                  # Symbol prefix
+        (5, 'APPLEB', 'Apple B', 'LSE', 'CRYPTO', 'GBP', 10),                   # Symbol prefix, more widely held
+        (6, 'PINE', 'Pineapple Co', 'NYSE', 'STOCK', 'USD', 100),               # Substring of "pineapple"
+        (7, 'NOPE', 'Nothing', 'NYSE', 'STOCK', 'USD', 1000),
+    ])
+    assert [row['id'] for row in index.search('apple')] == [3, 5, 4, 2, 6, 1]
+    assert [row['id'] for row in index.search('apple', limit=2)] == [3, 5]
+    assert [row['id'] for row in index.search('apple', asset_type='CRYPTO')] == [5]
+    assert index.search('  ') == []
+
+
+def test_asset_search_overlay_follows_commits_and_ignores_rollbacks(app):
+    from backend.services.asset_search import get_asset_search
+
+    search = get_asset_search()
+    acme = _stock('ACME')
+    search.warm()
+    assert [row['id'] for row in search.search('acme')] == [acme.id]
+
+    renamed = Stock(symbol='ACMEX', name='Acme Exploration', currency='USD')
+    db.session.add(renamed)
+    acme.name = 'Acme Corp'
+    db.session.commit()
+    assert [(row['id'], row['name']) for row in search.search('acme')] == [(acme.id, 'Acme Corp'),
+                                                                            (renamed.id, 'Acme Exploration')]
+
+    db.session.add(Stock(symbol='ACMEY', currency='USD'))
+    db.session.flush()
+    db.session.rollback()
+    db.session.delete(renamed)
+    db.session.commit()
+    assert [row['symbol'] for row in search.search('acme')] == ['ACME']
+
+
+def test_asset_search_builds_in_the_background_when_not_warmed(app):
+    import time
+
+    from backend.services.asset_search import get_asset_search
+
+    acme = _stock('ACME')
+    search = get_asset_search()
+    assert search.search('acme') == [] and not search.ready
+    deadline = time.monotonic() + 10
+    while not search.ready and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert [row['id'] for row in search.search('acme')] == [acme.id]
+
+
+# ---------------------------
+# Synthetic Data
+# ---------------------------
+def _synthetic_fingerprint(seed):
+    import hashlib
+
+    from backend.models import Lot, LotDisposal, Transaction
+    from backend.services.synthetic_data import SyntheticSpec, generate_dataset
+
+    spec = SyntheticSpec(seed=seed, users=3, transactions=400, stocks=30, etfs=3, cryptos=3, bonds=4,
+                         option_underlyings=2, years=1, end_date=date(2024, 6, 30), batch_size=100)
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        try:
+            summary = generate_dataset(spec)
+            tables = {
+                'assets': select(Asset.symbol, Asset.asset_type, Asset.currency, Asset.last_price).order_by(Asset.id),
+                'transactions': select(
+                    Transaction.account_id, Transaction.asset_id, Transaction.transaction_type,
+                    Transaction.transaction_time, Transaction.quantity, Transaction.price_per_unit,
+                    Transaction.commission, Transaction.currency,
+                ).order_by(Transaction.id),
+                'lots': select(Lot.buy_transaction_id, Lot.quantity_remaining, Lot.cost_basis_per_unit).order_by(Lot.id),
+                'disposals': select(LotDisposal.lot_id, LotDisposal.quantity).order_by(LotDisposal.id),
+                'positions': select(Position.account_id, Position.asset_id, Position.quantity,
+                                    Position.total_cost).order_by(Position.account_id, Position.asset_id),
+                'cash': select(Account.cash_balance).order_by(Account.id),
+            }
+            checksums = {
+                name: hashlib.sha256(repr(db.session.execute(stmt).all()).encode()).hexdigest()
+                for name, stmt in tables.items()
+            }
+        finally:
+            db.session.remove()
+            db.drop_all()
+    return summary.counts, checksums
+
+
+def test_synthetic_dataset_is_reproducible_from_its_seed():
+    counts, checksums = _synthetic_fingerprint(seed=7)
+    assert counts['transactions'] >= 400 and counts['lots'] > 0
+    assert _synthetic_fingerprint(seed=7) == (counts, checksums)
+    assert _synthetic_fingerprint(seed=8)[1]['transactions'] != checksums['transactions']
+
+
+# ---------------------------
+# Benchmarks
+# ---------------------------
+def _report(**results):
+    return {'results': results}
+
+
+def test_benchmark_thresholds_report_each_breach():
+    from backend.benchmarks import check_thresholds
+
+    report = _report(valuation={'median_ms': 300.0, 'queries': 8},
+                     **{'import': {'median_ms': 900.0, 'queries': 40, 'rows_per_second': 4000.0}})
+    thresholds = {
+        'valuation': {'median_ms': {'max': 250}, 'queries': {'max': 8}},
+        'import': {'rows_per_second': {'min': 5000}, 'peak_memory_kb': {'max': 1}},  # Metric not reported
+        'missing': {'median_ms': {'max': 1}},                                      # Case not run
+    }
+    assert check_thresholds(report, thresholds) == [
+        'valuation.median_ms = 300.0 exceeds max 250',
+        'import.rows_per_second = 4000.0 is below min 5000',
+    ]
+
+
+def test_baseline_comparison_ignores_noise_and_flags_regressions():
+    from backend.benchmarks import compare_to_baseline
+
+    baseline = _report(
+        fast={'median_ms': 2.0, 'peak_memory_kb': 100.0, 'queries': 3},
+        slow={'median_ms': 100.0, 'peak_memory_kb': 2000.0, 'queries': 3},
+        throughput={'median_ms': 100.0, 'rows_per_second': 10000.0, 'queries': 1},
+    )
+    report = _report(
+        fast={'median_ms': 2.9, 'peak_memory_kb': 300.0, 'queries': 3},       # +45% but under the noise floors
+        slow={'median_ms': 130.0, 'peak_memory_kb': 2400.0, 'queries': 4},    # +30% time, +20% memory, one more query
+        throughput={'median_ms': 100.0, 'rows_per_second': 7000.0, 'queries': 1},
+        new_case={'median_ms': 1000.0, 'queries': 99},                        # No baseline to compare with
+    )
+    assert compare_to_baseline(report, baseline, tolerance=0.25) == [
+        'slow.median_ms regressed 30%: 100.0 -> 130.0',
+        'slow.queries increased: 3 -> 4',
+        'throughput.rows_per_second regressed 30%: 10000.0 -> 7000.0',
+    ]
+    assert compare_to_baseline(report, baseline, tolerance=0.5) == ['slow.queries increased: 3 -> 4']
+
+
+def test_measure_times_repeats_and_counts_queries_of_the_last_pass(app):
+    from sqlalchemy import event, text
+
+    from backend.benchmarks import Case, _QueryCounter, measure
+
+    calls = []
+
+    def run():
+        calls.append('run')
+        for _ in range(len(calls)):
+            db.session.execute(text('SELECT 1'))
+        return {'rows': 10}
+
+    counter = _QueryCounter()
+    event.listen(db.engine, 'after_cursor_execute', counter)
+    try:
+        result = measure(Case('demo', run, setup=lambda: calls.append('setup')), repeat=3, counter=counter)
+    finally:
+        event.remove(db.engine, 'after_cursor_execute', counter)
+
+    assert calls.count('setup') == 4 and calls.count('run') == 4       # Warm-up pass plus three timed ones
+    assert result['repeat'] == 3 and result['queries'] == 8            # Last pass ran eight statements
+    assert result['min_ms'] <= result['median_ms'] <= result['max_ms']
+    assert result['rows_per_second'] > 0 and result['rows'] == 10
+
+
+# ---------------------------
+# Password Hashing
+# ---------------------------
+def test_pending_password_hashes_stay_below_the_request_threads(app):
+    import backend.gunicorn_config as gunicorn_config
+    from backend.services.auth_service import get_password_hasher, max_pending_hashes
+
+    assert gunicorn_config.worker_class == 'gthread'
+    assert max_pending_hashes({'PASSWORD_HASH_MAX_PENDING': 16, 'GUNICORN_THREADS': 64}) == 16
+    assert max_pending_hashes({'PASSWORD_HASH_MAX_PENDING': 64, 'GUNICORN_THREADS': 8}) == 3   # 4 threads for streams
+    assert max_pending_hashes({'PASSWORD_HASH_MAX_PENDING': 64, 'GUNICORN_THREADS': 8,
+                               'VALUATION_STREAM_THREAD_SHARE': 0}) == 7
+    assert max_pending_hashes({'PASSWORD_HASH_MAX_PENDING': 4, 'GUNICORN_THREADS': 1}) == 1
+
+    app.config.update(PASSWORD_HASH_MAX_PENDING=100, GUNICORN_THREADS=gunicorn_config.threads)
+    hasher = get_password_hasher()
+    try:
+        assert hasher._slots._value == gunicorn_config.threads // 2 - 1
+    finally:
+        hasher.shutdown()
+
+
+# ---------------------------
+# Valuation Streams
+# ---------------------------
+def test_valuation_streams_get_a_share_of_the_request_threads(app, account):
+    from backend.services.valuation_stream import StreamCapacityError, ValuationHub, stream_capacity
+
+    assert stream_capacity({'GUNICORN_THREADS': 64}) == 32
+    assert stream_capacity({'GUNICORN_THREADS': 64, 'VALUATION_STREAM_MAX_SUBSCRIBERS': 10}) == 10
+    assert stream_capacity({'GUNICORN_THREADS': 10, 'VALUATION_STREAM_THREAD_SHARE': 0.25}) == 2
+
+    app.config.update(GUNICORN_THREADS=4, VALUATION_STREAM_TICK_SECONDS=3600)
+    hub = ValuationHub(app)
+    subscribers = [hub.subscribe(account.portfolio.id) for _ in range(2)]
+    with pytest.raises(StreamCapacityError):
+        hub.subscribe(account.portfolio.id)
+    hub.unsubscribe(subscribers[0])
+    hub.subscribe(account.portfolio.id)